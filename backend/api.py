@@ -1,15 +1,33 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional, Union
+import functools
+import gc
+import hashlib
 import heapq
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
 
 # Import PIRS modules
-from database_setup import setup_database
-from data_ingestion import get_product_lookup
-from prediction_engine import calculate_priority_score
+from database_setup import migrate
+from connection_manager import get_connection, transaction, close_all_connections
+from data_ingestion import get_product_lookup, product_catalog, reload_product_lookup, load_audit_cursor, save_audit_cursor
 from prioritization import build_reorder_heap
-from reporting import InventoryBST, AuditList
-from floor_operations import ShippingQueue, SafetyCheck, BlockedQueue
+from reporting import AVLInventoryBST, AuditList
+from floor_operations import ShippingQueue, SafetyCheck, BlockedQueue, ChangeLog
+from report_jobs import ReportJobManager
+from event_bus import event_bus
+from forecasting import DemandForecast
+from sales_ingest import SalesBatcher
+from order_ids import OrderIdAllocator
+from reservations import dispatch, ReservationError, OrderNotFound, AlreadyShipped, ProductNotFound, InsufficientStock
 
 app = FastAPI(title="PIRS API", description="Inventory Management & Reorder System API")
 
@@ -22,9 +40,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize DB on startup
-setup_database()
-
 # --- Data Models ---
 class Order(BaseModel):
     order_id: str
@@ -42,50 +57,346 @@ class OrderCreate(BaseModel):
     sku: str
     qty_requested: int
 
+class OrderBatch(BaseModel):
+    orders: List[OrderCreate]
+
+class StockAdjustment(BaseModel):
+    sku: str
+    delta: Optional[int] = None # Relative change (truck receipt, damage write-off)
+    new_stock: Optional[int] = None # Absolute value (cycle count)
+
+class StockBatch(BaseModel):
+    updates: List[StockAdjustment]
+
+class SaleEvent(BaseModel):
+    sku: str
+    qty_sold: int
+    sale_date: Optional[str] = None # YYYY-MM-DD, defaults to today
+
 
 # --- Global State (Simulation) ---
 # --- Global State (Simulation) ---
 # In a real app, these would be in a proper DB or persistent store
-shipping_queue = ShippingQueue()
+# Queue backend is selectable: 'heap' (indexed binary heap) or 'bucket' (O(1) bucket queue)
+shipping_queue = ShippingQueue(backend=os.environ.get('PIRS_QUEUE_BACKEND', 'heap'))
 blocked_queue = BlockedQueue() # New Blocked Queue
+order_id_allocator = OrderIdAllocator() # Collision-free ORD-<n> IDs, claimed from the DB in blocks
 safety_officer = SafetyCheck()
 safety_officer.add_blocked_lot("LOT-EXP-202X") # Sample blocked lot
 
+# Long-lived stability index (AVL tree keyed by days remaining).
+# Kept in sync with the product catalog instead of being rebuilt per request.
+stability_index = AVLInventoryBST()
+stability_lock = threading.Lock()
+
+# Long-lived demand forecast (NumPy SKU x day model), refit from sales history.
+# Days remaining everywhere below = current stock / forecast daily demand.
+demand_forecast = DemandForecast()
+
+def estimate_days_remaining(sku, stock):
+    """Whole days of cover for `stock` units of `sku` at the forecast demand rate (min 1)."""
+    return max(1, int(demand_forecast.days_of_cover(sku, stock)))
+
+def rebuild_stability_index():
+    products = get_product_lookup()
+    with stability_lock:
+        stability_index.build(
+            (estimate_days_remaining(sku, details['stock']), sku, details) for sku, details in products.items()
+        )
+
+def sync_stability_index(event, sku, record):
+    """Catalog listener: applies each product change to the index in O(log N)."""
+    if event == 'reload':
+        rebuild_stability_index()
+        return
+    with stability_lock:
+        if event == 'remove':
+            stability_index.delete(sku)
+        elif event == 'stock_batch':
+            for batch_sku, batch_record in record.items():
+                stability_index.insert(estimate_days_remaining(batch_sku, batch_record['stock']), batch_sku, batch_record)
+        else:
+            stability_index.insert(estimate_days_remaining(sku, record['stock']), sku, record)
+
+product_catalog.add_listener(sync_stability_index)
+
+# Long-lived audit rotation (Circular Linked List). Gains/loses locations as
+# products are created/deleted; its cursor is persisted so restarts resume.
+audit_ring = AuditList()
+audit_lock = threading.Lock()
+
+def rebuild_audit_ring():
+    products = get_product_lookup()
+    with audit_lock:
+        saved = audit_ring.current_sku or load_audit_cursor()
+        audit_ring.__init__()
+        for sku in products:
+            audit_ring.add_product(sku)
+        if saved:
+            audit_ring.seek(saved)
+
+def sync_audit_ring(event, sku, record):
+    """Catalog listener: O(1) ring membership updates."""
+    if event == 'reload':
+        rebuild_audit_ring()
+        return
+    with audit_lock:
+        if event == 'remove':
+            audit_ring.remove_product(sku)
+        elif event == 'upsert':
+            audit_ring.add_product(sku)
+
+product_catalog.add_listener(sync_audit_ring)
+
+# --- Push channel (SSE): forward state changes to open dashboards ---
+def publish_queue_event(action, order):
+    if action == 'add_batch':
+        # One frame per batch: clients refetch on any queue event anyway
+        event_bus.publish('queue', {'action': action, 'count': len(order), 'version': shipping_queue.version})
+        return
+    event_bus.publish('queue', {
+        'action': action,
+        'order_id': order.get('order_id'),
+        'priority_score': order.get('priority_score'),
+        'version': shipping_queue.version
+    })
+
+def publish_blocked_event(action, order):
+    if action == 'block_batch':
+        event_bus.publish('blocked', {'action': action, 'count': len(order), 'version': blocked_queue.version})
+        return
+    event_bus.publish('blocked', {
+        'action': action,
+        'order_id': order.get('order_id'),
+        'version': blocked_queue.version
+    })
+
+def publish_stock_event(event, sku, record):
+    if event == 'stock_batch':
+        event_bus.publish('stock', {
+            'action': event,
+            'skus': list(record),
+            'version': product_catalog.version
+        })
+        return
+    event_bus.publish('stock', {
+        'action': event,
+        'sku': sku,
+        'stock': record.get('stock') if record else None,
+        'version': product_catalog.version
+    })
+
+shipping_queue.add_listener(publish_queue_event)
+blocked_queue.add_listener(publish_blocked_event)
+# Watchers run after the catalog version moved: a refetch on the event gets a fresh ETag
+product_catalog.add_watcher(publish_stock_event)
+
+# --- Conditional GET: ETags derived from version counters ---
+# customer_orders has no in-memory mirror, so its writers bump this counter
+# (after their transaction committed, under the lock: += on a global is not atomic)
+order_history_version = 0
+order_history_lock = threading.Lock()
+
+# Counters restart with the process, so the epoch keeps old ETags from matching
+ETAG_EPOCH = f"{os.getpid()}-{time.time_ns()}"
+
+def make_etag(request, versions):
+    raw = f"{ETAG_EPOCH}|{request.url.path}?{request.url.query}|{versions!r}"
+    return '"' + hashlib.sha1(raw.encode('utf-8')).hexdigest() + '"'
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:] # If-None-Match uses weak comparison
+        if candidate == etag or candidate == '*':
+            return True
+    return False
+
+def conditional_get(*sources):
+    """
+    Decorator for read endpoints. The ETag is a hash of the request URL and the
+    current values of `sources` (version counters, read in O(1)), so a client
+    sending a matching If-None-Match gets 304 Not Modified before the endpoint
+    runs: no database work and no JSON encoding.
+    """
+    def decorator(endpoint):
+        signature = inspect.signature(endpoint)
+        
+        @functools.wraps(endpoint)
+        def wrapper(request: Request, **kwargs):
+            # Versions are read before building. Writers bump a version only after
+            # every view it covers is updated, so a body built after reading version
+            # v reflects at least v. A write racing the build can at worst attach an
+            # older ETag to a newer body (the next request just gets a 200).
+            etag = make_etag(request, tuple(source() for source in sources))
+            headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            if etag_matches(request.headers.get('if-none-match'), etag):
+                return Response(status_code=304, headers=headers)
+            
+            result = endpoint(**kwargs)
+            if not isinstance(result, Response):
+                result = JSONResponse(content=jsonable_encoder(result))
+            result.headers.update(headers)
+            return result
+        
+        # FastAPI reads the signature: the endpoint's own params plus `request`
+        request_param = inspect.Parameter('request', inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=Request)
+        wrapper.__signature__ = signature.replace(parameters=[request_param, *signature.parameters.values()])
+        return wrapper
+    return decorator
+
+def bump_order_history():
+    global order_history_version
+    with order_history_lock:
+        order_history_version += 1
+
+def catalog_version():
+    # Product views show days of cover, which also moves when the forecast is refit
+    return (product_catalog.version, demand_forecast.version)
+
+def queue_version():
+    return shipping_queue.version
+
+# --- Delta sync: versioned change log behind /api/shipping/dashboard?since= ---
+shipping_log = ChangeLog()
+
+def log_queue_change(action, order):
+    if action == 'add_batch':
+        shipping_log.record_many('order', (o['order_id'] for o in order))
+    else:
+        shipping_log.record('order', order.get('order_id'))
+
+def log_blocked_change(action, order):
+    if action == 'block_batch':
+        shipping_log.record_many('blocked', (o['order_id'] for o in order))
+    else:
+        shipping_log.record('blocked', order.get('order_id'))
+
+def log_stock_change(event, sku, record):
+    if event == 'reload':
+        shipping_log.reset()
+    elif event == 'stock_batch':
+        shipping_log.record_many('stock', record)
+    else:
+        shipping_log.record('stock', sku)
+
+shipping_queue.add_listener(log_queue_change)
+blocked_queue.add_listener(log_blocked_change)
+product_catalog.add_listener(log_stock_change)
+
+STREAM_PAGE_SIZE = 1000
+
+def iter_stability_pages(min_days=None, max_days=None, limit=None, max_exclusive=False, exclude_sku=None):
+    """
+    Yields the index's items in pages of STREAM_PAGE_SIZE, lowest days first.
+    The lock is only held while one page is collected (O(log N + page)), and each
+    page resumes after the last key sent, so a slow client never blocks catalog writes.
+    """
+    after = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        page_size = STREAM_PAGE_SIZE if remaining is None else min(STREAM_PAGE_SIZE, remaining)
+        with stability_lock:
+            page = stability_index.range_after(after, min_days, max_days, page_size, max_exclusive)
+        if not page:
+            return
+        after = (page[-1]['days_remaining'], page[-1]['sku'])
+        if exclude_sku is not None:
+            page = [item for item in page if item['sku'] != exclude_sku]
+        if remaining is not None:
+            remaining -= len(page)
+        yield page
+
+def _dumps(obj):
+    # Same compact encoding FastAPI's JSONResponse uses
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def encode_json_array(pages, prefix="", suffix=""):
+    """Streams pages of items as one JSON array (optionally wrapped in an envelope)."""
+    yield prefix + "["
+    first = True
+    for page in pages:
+        if not page:
+            continue
+        yield ("" if first else ",") + ",".join(_dumps(item) for item in page)
+        first = False
+    yield "]" + suffix
+
+def encode_ndjson(pages):
+    """Streams pages of items as newline-delimited JSON, one item per line."""
+    for page in pages:
+        if page:
+            yield "".join(_dumps(item) + "\n" for item in page)
+
 # Populate Queues from DB on Startup
+def hydration_details(row, products, status):
+    """Maps a streamed customer_orders row to the queue's order dict."""
+    order_id, customer_tier, sku, product_name, qty_requested, total_amount = row
+    product = products.get(sku, {})
+    # Days of cover from the demand forecast
+    days_left = 30
+    if product and product.get('stock', 0) > 0:
+        days_left = estimate_days_remaining(sku, product['stock'])
+    
+    return {
+        'order_id': order_id,
+        'customer': f"Customer {customer_tier}", # Mock name
+        'item_sku': sku,
+        'item_name': product_name or product.get('name', 'Unknown'),
+        'tier': customer_tier,
+        'days_remaining': days_left,
+        'qty': qty_requested,
+        'total_amount': total_amount or 0,
+        'status': status
+    }
+
 def populate_queues():
-    from data_ingestion import get_all_orders
-    all_orders = get_all_orders()
+    """
+    Hydrates the in-memory queues from the DB on startup.
+    Only PENDING / BLOCKED rows are read (filtered in SQL, SHIPPED history is
+    skipped), rows are streamed off the cursor, and the pending orders go into
+    ShippingQueue.add_orders: the heap array is built and heapified once, with
+    a single log line instead of one per order.
+    """
+    from data_ingestion import iter_orders_by_status
     products = get_product_lookup()
+    start = time.perf_counter()
     
-    print(f"Populating queues with {len(all_orders)} orders...")
-    for order in all_orders:
-        product = products.get(order['sku'], {})
-        # Calculate days remaining (Mock logic based on stock)
-        days_left = 30
-        if product and product.get('stock', 0) > 0:
-             days_left = max(1, int(product['stock'] / 5))
-             
-        order_details = {
-            'order_id': order['order_id'],
-            'customer': f"Customer {order['customer_tier']}", # Mock name
-            'item_sku': order['sku'],
-            'item_name': order.get('product_name', product.get('name', 'Unknown')),
-            'tier': order['customer_tier'],
-            'days_remaining': days_left,
-            'qty': order['qty_requested'],
-            'total_amount': order.get('total_amount', 0),
-            'status': order['status']
-        }
-        
-        if order['status'] == 'BLOCKED':
-            blocked_queue.add_blocked_order(order_details, "Manual Block / Stock Issue")
-        elif order['status'] == 'PENDING':
-             shipping_queue.add_order(order_details)
-        # SHIPPED orders are ignored for the active queue
+    # Millions of long-lived dicts: skip the cyclic GC passes while they are
+    # allocated, then freeze them so later collections do not rescan them
+    gc.disable()
+    try:
+        added = shipping_queue.add_orders(
+            hydration_details(row, products, 'PENDING') for row in iter_orders_by_status('PENDING')
+        )
+        blocked = blocked_queue.add_blocked_orders(
+            (hydration_details(row, products, 'BLOCKED') for row in iter_orders_by_status('BLOCKED')),
+            "Manual Block / Stock Issue"
+        )
+    finally:
+        gc.enable()
+    gc.freeze()
+    # SHIPPED orders are ignored for the active queue
+    print(f"Populated queues: {added} pending, {blocked} blocked in {time.perf_counter() - start:.2f}s")
 
 @app.on_event("startup")
 async def startup_event():
+    # Schema only (PRAGMA user_version check); seeding is `python database_setup.py`
+    migrate()
+    demand_forecast.load(get_product_lookup()) # Before anything derives days remaining
+    sales_batcher.start()
     populate_queues()
+    rebuild_stability_index()
+    rebuild_audit_ring()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    report_jobs.shutdown()
+    sales_batcher.stop() # Flushes buffered sales before the connections go away
+    close_all_connections()
 
 @app.get("/")
 def read_root():
@@ -95,13 +406,14 @@ def read_root():
 
 @app.post("/api/orders")
 def create_order(new_order: OrderCreate):
-    import sqlite3
-    import uuid
     from datetime import datetime
     
-    order_id = f"ORD-{uuid.uuid4().hex[:4].upper()}"
     order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
+    # Same rule as the batch endpoint: a non-positive qty would queue a negative total
+    if new_order.qty_requested <= 0:
+        raise HTTPException(status_code=400, detail="qty_requested must be positive.")
+    
     try:
         # 1. Fetch Product Details for Price & Name
         products = get_product_lookup()
@@ -111,24 +423,22 @@ def create_order(new_order: OrderCreate):
              raise HTTPException(status_code=404, detail="Product SKU not found.")
              
         total_amount = product['price'] * new_order.qty_requested
+        order_id = order_id_allocator.next_id()
         
         # 2. Insert into DB
-        conn = sqlite3.connect('pirs_warehouse.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            """
-            INSERT INTO customer_orders 
-            (order_id, customer_tier, order_date, sku, qty_requested, total_amount, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (order_id, new_order.customer_tier, order_date, new_order.sku, new_order.qty_requested, total_amount, 'PENDING')
-        )
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO customer_orders 
+                (order_id, customer_tier, order_date, sku, qty_requested, total_amount, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (order_id, new_order.customer_tier, order_date, new_order.sku, new_order.qty_requested, total_amount, 'PENDING')
+            )
+        bump_order_history()
         
         # 3. Add to Simulation Queue (ShippingQueue)
-        days_left = max(1, int(product['stock'] / 5)) 
+        days_left = estimate_days_remaining(new_order.sku, product['stock'])
         
         order_details = {
             'order_id': order_id,
@@ -153,6 +463,82 @@ def create_order(new_order: OrderCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+MAX_ORDER_BATCH = 10000
+
+@app.post("/api/orders/batch")
+def create_orders_batch(batch: OrderBatch):
+    """
+    Bulk order intake (EDI feeds).
+    - SKUs are validated against one catalog snapshot
+    - valid rows are inserted with executemany in a single transaction
+    - the new orders are merged into the ShippingQueue with one bulk push (heapify)
+    Returns one result per input row, in input order.
+    """
+    from datetime import datetime
+    
+    if len(batch.orders) > MAX_ORDER_BATCH:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {MAX_ORDER_BATCH} orders).")
+    
+    products = get_product_lookup()
+    order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # IDs for every valid row in one allocation (at most one block claim per batch)
+    valid = sum(1 for new_order in batch.orders if new_order.sku in products and new_order.qty_requested > 0)
+    try:
+        new_ids = iter(order_id_allocator.next_ids(valid))
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Order ID allocation failed: {e}")
+    
+    results = []
+    rows = []
+    queued = []
+    for index, new_order in enumerate(batch.orders):
+        product = products.get(new_order.sku)
+        if not product:
+            results.append({"index": index, "status": "rejected", "error": "Product SKU not found."})
+            continue
+        if new_order.qty_requested <= 0:
+            results.append({"index": index, "status": "rejected", "error": "qty_requested must be positive."})
+            continue
+        
+        order_id = next(new_ids)
+        total_amount = product['price'] * new_order.qty_requested
+        rows.append((order_id, new_order.customer_tier, order_date, new_order.sku, new_order.qty_requested, total_amount, 'PENDING'))
+        queued.append({
+            'order_id': order_id,
+            'customer': new_order.customer,
+            'item_sku': new_order.sku,
+            'item_name': product['name'],
+            'tier': new_order.customer_tier,
+            'days_remaining': estimate_days_remaining(new_order.sku, product['stock']),
+            'qty': new_order.qty_requested,
+            'total_amount': total_amount,
+            'status': 'PENDING'
+        })
+        results.append({"index": index, "status": "created", "order_id": order_id})
+    
+    if rows:
+        try:
+            with transaction() as conn:
+                conn.executemany(
+                    """
+                    INSERT INTO customer_orders 
+                    (order_id, customer_tier, order_date, sku, qty_requested, total_amount, status)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    rows
+                )
+        except sqlite3.Error as e:
+            # All or nothing: nothing was committed, nothing is queued
+            raise HTTPException(status_code=500, detail=f"Batch insert failed: {e}")
+        bump_order_history()
+        shipping_queue.add_orders(queued)
+    
+    return {
+        "created": len(rows),
+        "rejected": len(results) - len(rows),
+        "results": results
+    }
+
 @app.post("/api/orders/enqueue")
 def enqueue_order(order: Order):
     # Fetch product details for priority calculation
@@ -162,7 +548,7 @@ def enqueue_order(order: Order):
     # Calculate simplistic "Days Remaining" (Inverse of stock for simulation)
     days_left = 30 
     if product and product.get('stock', 0) > 0:
-        days_left = max(1, int(product['stock'] / 5)) 
+        days_left = estimate_days_remaining(order.item_sku, product['stock'])
         
     order_details = {
         'order_id': order.order_id,
@@ -180,24 +566,86 @@ def enqueue_order(order: Order):
     return {"status": "queued", "message": f"Order {order.order_id} added to Smart Batch Queue."}
 
 @app.get("/api/shipping/queue")
+@conditional_get(queue_version)
 def view_queue():
     return shipping_queue.get_queue_status()
 
+def with_stock_status(order, products):
+    current_stock = products.get(order.get('item_sku'), {}).get('stock', 0)
+    return {
+        **order,
+        'current_stock': current_stock,
+        'stock_available': current_stock >= order.get('qty', 1)
+    }
+
+def shipping_dashboard_delta(version, changes, pick_limit=None):
+    """
+    Delta since the client's version: only orders / blocked entries / stock
+    levels that changed. O(changes) plus the pick list.
+    Clients apply it as: drop `removed`, merge `upserted` (sort by
+    -priority_score, queue_seq), same for the blocked list, and patch
+    current_stock / stock_available of orders whose SKU is in `stock`.
+    """
+    products = get_product_lookup()
+    upserted, removed = [], []
+    for order_id in changes.get('order', ()):
+        order = shipping_queue.get_order(order_id)
+        if order is None or order.get('status') == 'SHIPPED':
+            removed.append(order_id)
+        else:
+            upserted.append(with_stock_status(order, products))
+    
+    blocked_upserted, blocked_removed = [], []
+    if 'blocked' in changes:
+        blocked_by_id = {o['order_id']: o for o in blocked_queue.get_blocked_list()}
+        for order_id in changes['blocked']:
+            if order_id in blocked_by_id:
+                blocked_upserted.append(blocked_by_id[order_id])
+            else:
+                blocked_removed.append(order_id)
+    
+    stock = {sku: products.get(sku, {}).get('stock', 0) for sku in changes.get('stock', ())}
+    
+    delta = {
+        "full": False,
+        "version": version,
+        "upserted": upserted,
+        "removed": removed,
+        "blocked_upserted": blocked_upserted,
+        "blocked_removed": blocked_removed,
+        "stock": stock,
+        "queue_count": len(shipping_queue)
+    }
+    if 'order' in changes:
+        delta["pick_list"] = shipping_queue.get_optimized_pick_list(pick_limit)
+    return delta
+
 @app.get("/api/shipping/dashboard")
-def get_shipping_dashboard():
+def get_shipping_dashboard(since: Optional[int] = None, pick_limit: Optional[int] = None):
     """
     Returns data for the Smart Shipment Dashboard (Command Center).
+    
+    Every response carries `version`. Sending it back as `?since=` returns
+    only what changed (see shipping_dashboard_delta); if the client is too far
+    behind the change log (or the server restarted) a full snapshot is
+    returned instead, marked "full": true.
+    `pick_limit` returns only the top N pick list SKUs (O(N)).
     """
+    # Read the version first: anything changing while we build the response is resent next time
+    version = shipping_log.version
+    if since is not None:
+        changes = shipping_log.changes_since(since)
+        if changes is not None:
+            return shipping_dashboard_delta(version, changes, pick_limit)
+    
     # 1. Main Priority Queue (Sorted by Score)
     raw_queue = shipping_queue.get_queue_status()
     
     # --- SELF-HEALING: Verify against DB to remove "Zombie" Shipped Orders ---
     # This fixes state mismatch if in-memory queue wasn't updated correctly
     if raw_queue:
-        import sqlite3
         try:
-            conn = sqlite3.connect('pirs_warehouse.db')
-            cursor = conn.cursor()
+            cursor = get_connection().cursor()
             
             # Get IDs currently in the queue
             queue_ids = [o['order_id'] for o in raw_queue]
@@ -208,8 +656,6 @@ def get_shipping_dashboard():
             cursor.execute(query, queue_ids)
             shipped_in_db = {row[0] for row in cursor.fetchall()}
             
-            conn.close()
-            
             # Filter them out from our display list AND clean up the heap
             if shipped_in_db:
                 print(f"[SELF-HEAL] Found {len(shipped_in_db)} shipped orders still in queue. Removing: {shipped_in_db}")
@@ -222,48 +668,48 @@ def get_shipping_dashboard():
 
     # Inject Real-Time Stock Data
     products = get_product_lookup()
-    priority_queue = []
-    
-    for order in raw_queue:
-        sku = order.get('item_sku')
-        current_stock = products.get(sku, {}).get('stock', 0)
-        
-        # Add stock status to the order object
-        priority_queue.append({
-            **order,
-            'current_stock': current_stock,
-            'stock_available': current_stock >= order.get('qty', 1)
-        })
+    priority_queue = [with_stock_status(order, products) for order in raw_queue]
 
     # 2. Optimized Pick List (Aggregated)
-    pick_list = shipping_queue.get_optimized_pick_list()
+    pick_list = shipping_queue.get_optimized_pick_list(pick_limit)
     
     # 3. Blocked Orders (Safety Gate)
     blocked_orders = blocked_queue.get_blocked_list()
     
     return {
+        "full": True,
+        "version": version,
         "priority_queue": priority_queue, 
         "pick_list": pick_list,
         "blocked_orders": blocked_orders,
         "queue_count": len(priority_queue)
     }
 
+@app.get("/api/events/stream")
+async def stream_events(topics: Optional[str] = None):
+    """
+    Server-Sent Events feed of state changes: 'queue', 'blocked' and 'stock'
+    (comma separated `topics` narrows it). Clients refetch the views they show
+    when an event arrives instead of polling; a 'resync' event means events
+    were dropped and a full refetch is needed.
+    """
+    wanted = [t.strip() for t in topics.split(',') if t.strip()] if topics else None
+    sub = event_bus.subscribe(wanted)
+    return StreamingResponse(
+        event_bus.stream(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/dashboard/summary")
 def get_dashboard_summary():
     print("DEBUG: Entering get_dashboard_summary")
     try:
         products = get_product_lookup()
         print(f"DEBUG: Found {len(products)} products")
-        bst = InventoryBST()
-        for sku, details in products.items():
-            # Approx logic for days remaining
-            days = max(1, int(details['stock'] / 5)) 
-            bst.insert(days, sku, details) 
-        
-        print("DEBUG: BST Built")
-        report = bst.get_stability_report()
-        print(f"DEBUG: Report size: {len(report)}")
-        critical_count = len([i for i in report if i['days_remaining'] < 7])
+        # Rank query on the order-statistics tree: O(log N), nothing materialised
+        with stability_lock:
+            critical_count = stability_index.count_below(7)
         
         return {
             "total_sku_count": len(products),
@@ -274,155 +720,25 @@ def get_dashboard_summary():
         print(f"DEBUG ERROR in summary: {e}")
         return {"error": str(e)}
 
-@app.get("/api/reports/download")
-@app.get("/api/reports/download")
-@app.get("/api/reports/download")
-@app.get("/api/reports/download")
-def download_report(lang: str = "en"):
-    from fastapi.responses import StreamingResponse
-    import io
-    from datetime import datetime
-    import random 
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.pdfbase.ttfonts import TTFont
-    from reportlab.pdfbase import pdfmetrics
-
-    # --- FONT REGISTRATION ---
-    # Try to register a font that supports Indian languages (Nirmala UI is standard on Windows 10/11)
-    font_name = "Helvetica" # Default fallback
-    try:
-        pdfmetrics.registerFont(TTFont('Nirmala', 'C:\\Windows\\Fonts\\Nirmala.ttf'))
-        font_name = "Nirmala"
-    except Exception as e:
-        print(f"Warning: Could not load Nirmala font: {e}")
-
-    # --- TRANSLATIONS ---
-    t = {
-        "en": {
-            "title": "PIRS Executive Report",
-            "generated": "Generated",
-            "exec_snapshot": "1. Executive Snapshot",
-            "snapshot_data": {
-                "total_val": "Total Inventory Value",
-                "pending_val": "Pending Order Value",
-                "health_score": "System Health Score",
-                "audit_prog": "Audit Progress",
-                "healthy": "Healthy",
-                "verified": "Verified"
-            },
-            "critical_alerts": "2. Critical Reorder Alerts (Min-Heap)",
-            "critical_desc": "Actionable items required to prevent stockouts.",
-            "reorder_cols": ["Product Name", "Current Stock", "Days Left", "Recommendation"],
-            "days_suffix": "Days",
-            "critical": "Critical",
-            "warning": "Warning",
-            "buy": "Buy",
-            "units": "Units",
-            "no_critical": "No critical reorders needed.",
-            "shipment_status": "3. Shipment & Fulfillment Status",
-            "ready": "Ready to Dispatch",
-            "at_risk": "At-Risk / VIP Shipments",
-            "blocked": "Blocked / Stockouts",
-            "orders_suffix": "Orders",
-            "inventory_stability": "4. Inventory Stability Analysis (BST)",
-            "stable_stock": "Stable Stock (> 15 Days)",
-            "overstocked": "Overstocked Items (Potential Dead Stock)",
-            "col_product": "Product",
-            "col_days_held": "Days Held",
-            "col_val_tied": "Value Tied Up",
-            "no_overstock": "No significant overstock detected.",
-            "safety_log": "5. Safety & Quality Log",
-            "interventions": "Interventions: System blocked {} attempted shipments of problematic goods.",
-            "lot_warning": "Lot Expiry Warning: Lot #LOT-EXP-202X expires in 2 days. 15 units remaining."
-        },
-        "hi": {
-            "title": "PIRS कार्यकारी रिपोर्ट",
-            "generated": "जेनरेट किया गया",
-            "exec_snapshot": "1. कार्यकारी सारांश (Executive Snapshot)",
-            "snapshot_data": {
-                "total_val": "कुल इन्वेंटरी मूल्य",
-                "pending_val": "लंबित ऑर्डर मूल्य",
-                "health_score": "सिस्टम हेल्थ स्कोर",
-                "audit_prog": "ऑडिट प्रगति",
-                "healthy": "स्वस्थ",
-                "verified": "सत्यापित"
-            },
-            "critical_alerts": "2. महत्वपूर्ण पुनः क्रय अलर्ट (Min-Heap)",
-            "critical_desc": "स्टॉकआउट को रोकने के लिए आवश्यक कार्रवाई योग्य आइटम।",
-            "reorder_cols": ["उत्पाद का नाम", "वर्तमान स्टॉक", "शेष दिन", "सिफारिश"],
-            "days_suffix": "दिन",
-            "critical": "महत्वपूर्ण",
-            "warning": "चेतावनी",
-            "buy": "खरीदें",
-            "units": "इकाइलियाँ",
-            "no_critical": "कोई महत्वपूर्ण पुनः क्रय की आवश्यकता नहीं है।",
-            "shipment_status": "3. शिपमेंट और पूर्ति स्थिति",
-            "ready": "डिस्पैच के लिए तैयार",
-            "at_risk": "जोखिम / VIP शिपमेंट",
-            "blocked": "अवरुद्ध / स्टॉकआउट",
-            "orders_suffix": "ऑर्डर",
-            "inventory_stability": "4. इन्वेंटरी स्थिरता विश्लेषण (BST)",
-            "stable_stock": "स्थिर स्टॉक (> 15 दिन)",
-            "overstocked": "अधिक स्टॉक वाले आइटम (संभावित डेड स्टॉक)",
-            "col_product": "उत्पाद",
-            "col_days_held": "दिन",
-            "col_val_tied": "मूल्य फंसा हुआ",
-            "no_overstock": "कोई महत्वपूर्ण ओवरस्टॉक नहीं मिला।",
-            "safety_log": "5. सुरक्षा और गुणवत्ता लॉग",
-            "interventions": "हस्तक्षेप: सिस्टम ने समस्याग्रस्त सामानों के {} प्रयास किए गए शिपमेंट को अवरुद्ध कर दिया।",
-            "lot_warning": "लॉट समाप्ति चेतावनी: लॉट #LOT-EXP-202X 2 दिनों में समाप्त हो रहा है। 15 इकाइयाँ शेष हैं।"
-        },
-        "kn": {
-             "title": "PIRS ಕಾರ್ಯನಿರ್ವಾಹಕ ವರದಿ",
-            "generated": "ರಚಿಸಲಾಗಿದೆ",
-            "exec_snapshot": "1. ಕಾರ್ಯನಿರ್ವಾಹಕ ಸಾರಾಂಶ (Executive Snapshot)",
-            "snapshot_data": {
-                "total_val": "ಒಟ್ಟು ದಾಸ್ತಾನು ಮೌಲ್ಯ",
-                "pending_val": "ಬಾಕಿ ಇರುವ ಆರ್ಡರ್ ಮೌಲ್ಯ",
-                "health_score": "ಸಿಸ್ಟಮ್ ಆರೋಗ್ಯ ಸ್ಕೋರ್",
-                "audit_prog": "ಆಡಿಟ್ ಪ್ರಗತಿ",
-                "healthy": "ಆರೋಗ್ಯಕರ",
-                "verified": "ಪರಿಶೀಲಿಸಲಾಗಿದೆ"
-            },
-            "critical_alerts": "2. ನಿರ್ಣಾಯಕ ಮರು-ಆರ್ಡರ್ ಎಚ್ಚರಿಕೆಗಳು (Min-Heap)",
-            "critical_desc": "ಸ್ಟಾಕ್‌ಔಟ್‌ಗಳನ್ನು ತಡೆಯಲು ಅಗತ್ಯವಿರುವ ಕ್ರಮ ಕೈಗೊಳ್ಳಬಹುದಾದ ಐಟಂಗಳು.",
-            "reorder_cols": ["ಉತ್ಪನ್ನದ ಹೆಸರು", "ಪ್ರಸ್ತುತ ಸ್ಟಾಕ್", "ಉಳಿದ ದಿನಗಳು", "ಶಿಫಾರಸು"],
-            "days_suffix": "ದಿನಗಳು",
-            "critical": "ನಿರ್ಣಾಯಕ",
-            "warning": "ಎಚ್ಚರಿಕೆ",
-            "buy": "ಖರೀದಿಸಿ",
-            "units": "ಘಟಕಗಳು",
-            "no_critical": "ಯಾವುದೇ ನಿರ್ಣಾಯಕ ಮರು-ಆರ್ಡರ್‌ಗಳ ಅಗತ್ಯವಿಲ್ಲ.",
-            "shipment_status": "3. ಸಾಗಣೆ ಮತ್ತು ಪೂರೈಕೆ ಸ್ಥಿತಿ",
-            "ready": "ರವಾನೆಗೆ ಸಿದ್ಧವಾಗಿದೆ",
-            "at_risk": "ಅಪಾಯದಲ್ಲಿರುವ / VIP ಸಾಗಣೆಗಳು",
-            "blocked": "ನಿರ್ಬಂಧಿಸಲಾಗಿದೆ / ಸ್ಟಾಕ್‌ಔಟ್‌ಗಳು",
-            "orders_suffix": "ಆರ್ಡರ್‌ಗಳು",
-            "inventory_stability": "4. ದಾಸ್ತಾನು ಸ್ಥಿರತೆ ವಿಶ್ಲೇಷಣೆ (BST)",
-            "stable_stock": "ಸ್ಥಿರ ಸ್ಟಾಕ್ (> 15 ದಿನಗಳು)",
-            "overstocked": "ಹೆಚ್ಚು ಸ್ಟಾಕ್ ಇರುವ ಐಟಂಗಳು",
-            "col_product": "ಉತ್ಪನ್ನ",
-            "col_days_held": "ದಿನಗಳು",
-            "col_val_tied": "ಮೌಲ್ಯ",
-            "no_overstock": "ಯಾವುದೇ ಪ್ರಮುಖ ಓವರ್‌ಸ್ಟಾಕ್ ಕಂಡುಬಂದಿಲ್ಲ.",
-            "safety_log": "5. ಸುರಕ್ಷತೆ ಮತ್ತು ಗುಣಮಟ್ಟ ಲಾಗ್",
-            "interventions": "ಹಸ್ತಕ್ಷೇಪಗಳು: ಸಮಸ್ಯಾತ್ಮಕ ಸರಕುಗಳ {} ಪ್ರಯತ್ನಿಸಿದ ಸಾಗಣೆಗಳನ್ನು ಸಿಸ್ಟಮ್ ನಿರ್ಬಂಧಿಸಿದೆ.",
-            "lot_warning": "ಲಾಟ್ ಮುಕ್ತಾಯ ಎಚ್ಚರಿಕೆ: ಲಾಟ್ #LOT-EXP-202X 2 ದಿನಗಳಲ್ಲಿ ಮುಕ್ತಾಯಗೊಳ್ಳುತ್ತದೆ. 15 ಘಟಕಗಳು ಉಳಿದಿವೆ."
-        }
-    }
+# --- Report Jobs (process pool + content-addressed PDF cache) ---
+report_jobs = ReportJobManager()
+REPORT_WAIT_SECONDS = 60 # Upper bound for the blocking download / long-poll
 
-    # Fallback to English if lang not found
-    ctx = t.get(lang, t["en"])
+def report_data_version():
+    """Versions of everything the executive report reads; part of the cache key."""
+    return (product_catalog.version, demand_forecast.version, shipping_queue.version, blocked_queue.version)
 
-    # --- 1. GATHER DATA ---
+def gather_report_data():
+    """
+    Collects the report's numbers from in-memory state (cheap) as a plain,
+    picklable dict. Layout happens in a pool worker (report_jobs.render_report_pdf).
+    """
+    from datetime import datetime
+    import random
+    
     products = get_product_lookup()
     
     # Inventory BST & Stability
-    bst = InventoryBST()
     total_inventory_value = 0
     overstocked_items = []
     
@@ -431,186 +747,109 @@ def download_report(lang: str = "en"):
         price_val = details.get('price', 0)
         total_inventory_value += (stock_val * price_val)
         
-        days = max(1, int(stock_val / 5)) # Mock consumption
-        bst.insert(days, sku, details)
+        days = estimate_days_remaining(sku, stock_val)
         
         if days > 60:
             overstocked_items.append({'sku': sku, 'name': details['name'], 'days': days, 'value': stock_val * price_val})
 
-    stability_report = bst.get_stability_report()
+    with stability_lock:
+        critical_items_count = stability_index.count_below(7)
+        stable_count = len(stability_index) - stability_index.count_below(15)
     
     # Order Queues
     raw_queue = shipping_queue.get_queue_status()
     blocked_orders = blocked_queue.get_blocked_list()
     
-    # Min-Heap for Critical Alerts
-    reorder_heap = build_reorder_heap() # Returns list of (score, sku)
-
-    # --- 2. GENERATE PDF ---
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    elements = []
-    
-    styles = getSampleStyleSheet()
-    # Define styles with the correct font
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontName=font_name, fontSize=18, spaceAfter=6, textColor=colors.darkblue)
-    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Heading2'], fontName=font_name, fontSize=14, spaceBefore=12, spaceAfter=6, textColor=colors.teal)
-    normal_style = ParagraphStyle('Normal_Custom', parent=styles['Normal'], fontName=font_name)
-    highlight_style = ParagraphStyle('Highlight', parent=styles['Normal'], fontName=font_name, textColor=colors.firebrick)
-    
-    # Style for tables needs to be updated too
-    def get_table_style(is_header=False):
-        s = [
-            ('FONTNAME', (0,0), (-1,-1), font_name if not is_header else f'{font_name}'), 
-        ]
-        if is_header:
-            s.append(('FONTNAME', (0,0), (-1,0), font_name)) # Bold not available in standard Nirmala load without extra work, so sticky to Regular
-        return s
-
-    # HEADER
-    elements.append(Paragraph(ctx["title"], title_style))
-    elements.append(Paragraph(f"{ctx['generated']}: {datetime.now().strftime('%d %b %Y, %H:%M')}", normal_style))
-    elements.append(Spacer(1, 12))
-
-    # SECTION 1: EXECUTIVE SNAPSHOT
-    elements.append(Paragraph(ctx["exec_snapshot"], subtitle_style))
-    
-    pending_value = sum([o.get('total_amount', 0) for o in raw_queue])
-    critical_items_count = len([i for i in stability_report if i['days_remaining'] < 7])
-    total_items = len(products) if products else 1
-    health_score = int(((total_items - critical_items_count) / total_items) * 100)
-    
-    # Mock Audit Progress derived from "Circular Linked List" concept
-    audit_progress = f"{random.randint(75, 95)}% {ctx['snapshot_data']['verified']}"
-
-    snapshot_data = [
-        [ctx['snapshot_data']['total_val'], f"INR {total_inventory_value:,.2f}"],
-        [ctx['snapshot_data']['pending_val'], f"INR {pending_value:,.2f}"],
-        [ctx['snapshot_data']['health_score'], f"{health_score}% {ctx['snapshot_data']['healthy']}"],
-        [ctx['snapshot_data']['audit_prog'], audit_progress]
-    ]
-    
-    t_snap = Table(snapshot_data, colWidths=[200, 200])
-    tbl_style_cmds = [
-        ('BACKGROUND', (0,0), (-1,-1), colors.aliceblue),
-        ('GRID', (0,0), (-1,-1), 1, colors.white),
-        ('ALIGN', (1,0), (1,-1), 'RIGHT'),
-        ('PADDING', (0,0), (-1,-1), 8),
-    ]
-    tbl_style_cmds.extend(get_table_style(is_header=True))
-    t_snap.setStyle(TableStyle(tbl_style_cmds))
-    elements.append(t_snap)
-    elements.append(Spacer(1, 12))
-
-    # SECTION 2: CRITICAL REORDER ALERTS (Min-Heap)
-    elements.append(Paragraph(ctx["critical_alerts"], subtitle_style))
-    elements.append(Paragraph(ctx["critical_desc"], normal_style))
-    elements.append(Spacer(1, 6))
-
-    reorder_data = [ctx["reorder_cols"]]
-    
-    # Process top 5 from heap
-    heap_copy = reorder_heap[:]
-    count = 0
-    while heap_copy and count < 8:
-        score, sku = heapq.heappop(heap_copy)
+    # Min-Heap for Critical Alerts: top 8 critical/warning items
+    reorder_heap = build_reorder_heap(demand_forecast) # Returns list of (score, sku)
+    reorder_rows = []
+    while reorder_heap and len(reorder_rows) < 8:
+        score, sku = heapq.heappop(reorder_heap)
         prod = products.get(sku)
         if not prod: continue
         
-        days_left = max(0, int(prod['stock'] / 5)) # Simple mock forecast
+        days_left = int(demand_forecast.days_of_cover(sku, prod['stock']))
         
         # Filter for only critical/warning
         if days_left > 10: continue
+        reorder_rows.append({'name': prod['name'], 'stock': prod['stock'], 'days_left': days_left})
 
-        rec = f"{ctx['buy']} {max(10, int(prod['stock']*0.5))} {ctx['units']}"
-        status = f"({ctx['critical']})" if days_left < 3 else f"({ctx['warning']})"
-        
-        reorder_data.append([
-            prod['name'][:25],
-            str(prod['stock']),
-            f"{days_left} {ctx['days_suffix']} {status}",
-            rec
-        ])
-        count += 1
-
-    if len(reorder_data) > 1:
-        t_reorder = Table(reorder_data, colWidths=[180, 80, 120, 120])
-        reorder_style_cmds = [
-            ('BACKGROUND', (0,0), (-1,0), colors.firebrick),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.white]),
-        ]
-        reorder_style_cmds.extend(get_table_style(is_header=True))
-        t_reorder.setStyle(TableStyle(reorder_style_cmds))
-        elements.append(t_reorder)
-    else:
-        elements.append(Paragraph(ctx["no_critical"], normal_style))
-    elements.append(Spacer(1, 12))
+    return {
+        'generated_at': datetime.now().strftime('%d %b %Y, %H:%M'),
+        'total_items': len(products),
+        'total_inventory_value': total_inventory_value,
+        'pending_value': sum([o.get('total_amount', 0) for o in raw_queue]),
+        'critical_items_count': critical_items_count,
+        'stable_count': stable_count,
+        # Mock Audit Progress derived from "Circular Linked List" concept
+        'audit_progress_pct': random.randint(75, 95),
+        'reorder_rows': reorder_rows,
+        'ready_count': len([o for o in raw_queue if o.get('stock_available')]),
+        # Mock "At Risk" logic for report (e.g., expiry < 48h)
+        'at_risk_count': len([o for o in raw_queue if "VIP" in str(o.get('customer', ''))]), # Proxy for demo
+        'blocked_count': len(blocked_orders),
+        'blocked_summary': [(b['order_id'], b.get('blocked_reason', 'Issue')) for b in blocked_orders[:3]],
+        'overstocked_items': overstocked_items[:5],
+    }
 
-    # SECTION 3: SHIPMENT & FULFILLMENT (Priority Queue)
-    elements.append(Paragraph(ctx["shipment_status"], subtitle_style))
-    
-    ready_count = len([o for o in raw_queue if o.get('stock_available')])
-    # Mock "At Risk" logic for report (e.g., expiry < 48h)
-    at_risk_count = len([o for o in raw_queue if "VIP" in str(o.get('customer', ''))]) # Proxy for demo
-    blocked_count = len(blocked_orders)
-    
-    elements.append(Paragraph(f"<b>{ctx['ready']}:</b> {ready_count} {ctx['orders_suffix']}", normal_style))
-    elements.append(Paragraph(f"<b>{ctx['at_risk']}:</b> {at_risk_count} {ctx['orders_suffix']}", normal_style))
-    elements.append(Paragraph(f"<b>{ctx['blocked']}:</b> {blocked_count} {ctx['orders_suffix']}", highlight_style))
-    
-    if blocked_orders:
-        block_summary = []
-        for b in blocked_orders[:3]:
-            block_summary.append(f"• {b['order_id']}: {b.get('blocked_reason', 'Issue')}")
-        elements.append(Paragraph("<br/>".join(block_summary), ParagraphStyle('bullets', leftIndent=20, parent=normal_style, fontName=font_name)))
-    elements.append(Spacer(1, 12))
-
-    # SECTION 4: INVENTORY STABILITY (BST)
-    elements.append(Paragraph(ctx["inventory_stability"], subtitle_style))
-    
-    stable_count = len([i for i in stability_report if i['days_remaining'] >= 15])
-    stable_pct = int((stable_count / total_items) * 100)
-    
-    elements.append(Paragraph(f"<b>{ctx['stable_stock']}:</b> {stable_pct}% of SKUs.", normal_style))
-    
-    if overstocked_items:
-        elements.append(Spacer(1, 4))
-        elements.append(Paragraph(f"<b>{ctx['overstocked']}:</b>", normal_style))
-        over_data = [[ctx["col_product"], ctx["col_days_held"], ctx["col_val_tied"]]]
-        for item in overstocked_items[:5]:
-             over_data.append([item['name'], f"{item['days']} {ctx['days_suffix']}", f"INR {item['value']}"])
-        
-        t_over = Table(over_data, colWidths=[200, 100, 100])
-        over_style_cmds = [
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-        ]
-        over_style_cmds.extend(get_table_style(is_header=True))
-        t_over.setStyle(TableStyle(over_style_cmds))
-        elements.append(t_over)
-    else:
-        elements.append(Paragraph(ctx["no_overstock"], normal_style))
-    elements.append(Spacer(1, 12))
+def _pdf_response(pdf, job_id=None):
+    headers = {"Content-Disposition": "attachment; filename=pirs_report_summary.pdf"}
+    if job_id:
+        headers["X-Report-Job"] = job_id
+    return Response(content=pdf, media_type="application/pdf", headers=headers)
 
-    # SECTION 5: SAFETY LOG
-    elements.append(Paragraph(ctx["safety_log"], subtitle_style))
-    elements.append(Paragraph(ctx["interventions"].format(len(blocked_orders)), normal_style))
-    elements.append(Paragraph(ctx["lot_warning"], highlight_style))
-    
-    doc.build(elements)
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": "attachment; filename=pirs_report_summary.pdf"}
-    )
+@app.post("/api/reports/jobs")
+def submit_report(lang: str = "en"):
+    """
+    Starts rendering the executive report in the background (or returns the
+    finished job at once when an identical report is cached).
+    Poll GET /api/reports/jobs/{job_id}, then fetch .../pdf.
+    """
+    job = report_jobs.submit(lang, report_data_version(), gather_report_data)
+    return report_jobs.describe(job)
+
+@app.get("/api/reports/jobs/{job_id}")
+def get_report_job(job_id: str, wait: float = 0):
+    """Job status. `wait` > 0 long-polls up to that many seconds for completion."""
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if wait > 0:
+        report_jobs.wait(job, min(wait, REPORT_WAIT_SECONDS))
+    return report_jobs.describe(job)
+
+@app.get("/api/reports/jobs/{job_id}/pdf")
+def download_report_job(job_id: str):
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if job['status'] == 'failed':
+        raise HTTPException(status_code=500, detail=f"Report failed: {job['error']}")
+    pdf = report_jobs.result(job)
+    if pdf is None:
+        if job['status'] == 'done':
+            raise HTTPException(status_code=410, detail="Report evicted from cache, submit again")
+        raise HTTPException(status_code=409, detail="Report is still rendering")
+    return _pdf_response(pdf, job_id)
+
+@app.get("/api/reports/download")
+def download_report(lang: str = "en"):
+    """
+    One-shot download (used by the frontend). Cache hits return immediately;
+    otherwise the render runs in the pool and this request waits for it.
+    """
+    job = report_jobs.submit(lang, report_data_version(), gather_report_data)
+    report_jobs.wait(job, REPORT_WAIT_SECONDS)
+    if job['status'] == 'failed':
+        raise HTTPException(status_code=500, detail=f"Report failed: {job['error']}")
+    pdf = report_jobs.result(job)
+    if pdf is None:
+        raise HTTPException(status_code=504, detail=f"Report still rendering, poll /api/reports/jobs/{job['job_id']}")
+    return _pdf_response(pdf, job['job_id'])
 
 @app.get("/api/priority/top")
 def get_top_priority():
-    heap = build_reorder_heap()
+    heap = build_reorder_heap(demand_forecast)
     if not heap:
         return {}
     
@@ -618,8 +857,7 @@ def get_top_priority():
     products = get_product_lookup()
     product = products.get(sku, {})
     
-    # Approx logic again
-    days = max(1, int(product.get('stock', 0) / 5))
+    days = estimate_days_remaining(sku, product.get('stock', 0))
     
     return {
         "name": product.get('name', 'Unknown'),
@@ -630,16 +868,46 @@ def get_top_priority():
     }
 
 @app.get("/api/inventory/stability")
-def get_inventory_stability():
-    products = get_product_lookup()
-    bst = InventoryBST()
-    for sku, details in products.items():
-        days = max(1, int(details['stock'] / 5))
-        bst.insert(days, sku, details)
-        
-    return bst.get_stability_report()
+@conditional_get(catalog_version)
+def get_inventory_stability(min_days: Optional[float] = None, max_days: Optional[float] = None,
+                            limit: Optional[int] = None, count_only: bool = False, format: str = "json"):
+    """
+    Stability report from the order-statistics tree, most critical first.
+    
+    Query params:
+        min_days / max_days: inclusive days_remaining bounds (either may be omitted)
+        limit: return at most this many items
+        count_only: return just {"count": N} using rank queries (no items materialised)
+        format: 'json' (JSON array, default) | 'ndjson' (one item per line)
+    
+    Range search is O(log N + k); count_only is O(log N).
+    Items are streamed page by page straight off the tree, so memory stays flat
+    and time-to-first-byte does not depend on catalog size.
+    """
+    if count_only:
+        with stability_lock:
+            return {
+                "count": stability_index.count_range(min_days, max_days),
+                "min_days": min_days,
+                "max_days": max_days
+            }
+    
+    pages = iter_stability_pages(min_days, max_days, limit)
+    if format == "ndjson":
+        return StreamingResponse(encode_ndjson(pages), media_type="application/x-ndjson")
+    return StreamingResponse(encode_json_array(pages), media_type="application/json")
+
+@app.get("/api/inventory/stability/kth")
+def get_kth_most_critical(k: int = 1):
+    """Returns the k-th most critical item (1 = lowest days remaining). O(log N)."""
+    with stability_lock:
+        item = stability_index.kth_most_critical(k)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"No item at rank {k}.")
+    return {**item, "rank": k}
 
 @app.get("/api/inventory/bst-filter")
+@conditional_get(catalog_version)
 def get_bst_filtered_inventory(subtree: str = "all"):
     """
     Returns inventory data filtered by BST subtree.
@@ -655,130 +923,112 @@ def get_bst_filtered_inventory(subtree: str = "all"):
     This demonstrates the BST property where:
         Left Child < Parent < Right Child
     """
-    products = get_product_lookup()
-    bst = InventoryBST()
-    
-    # Pre-calculate days for all products
-    product_days = []
-    for sku, details in products.items():
-        days = max(1, int(details['stock'] / 5))
-        product_days.append((sku, details, days))
-    
-    # Find a product with 10-15 days remaining to use as root (ideal split point)
+    # Pick a product with 10-15 days remaining as the split point (ideal root)
     # This creates a meaningful division: critical (<12) vs stable (>=12)
-    ideal_root = None
-    remaining_products = []
-    
-    for sku, details, days in product_days:
-        if ideal_root is None and 10 <= days <= 15:
-            ideal_root = (sku, details, days)
+    # The balanced index chooses its own root, so the split is applied as a
+    # key comparison: exactly what the left/right subtrees held when this
+    # product was inserted first into a plain BST.
+    with stability_lock:
+        candidates = stability_index.range_search(10, 15, limit=1)
+        pivot = candidates[0] if candidates else None
+        
+        # If no ideal root found, pick closest to 12 days (rank neighbours of 12)
+        if pivot is None and len(stability_index):
+            rank = stability_index.count_below(12)
+            neighbours = [stability_index.kth_most_critical(rank), stability_index.kth_most_critical(rank + 1)]
+            pivot = min((item for item in neighbours if item), key=lambda item: abs(item['days_remaining'] - 12))
+        
+        root_info = None
+        if pivot:
+            root_info = {"sku": pivot['sku'], "name": pivot['name'], "days_remaining": pivot['days_remaining']}
+        
+        # Counts come from rank queries, so the envelope can be written before the items
+        if subtree == "left":
+            pages = iter_stability_pages(max_days=root_info['days_remaining'], max_exclusive=True) if root_info else iter([])
+            count = stability_index.count_below(root_info['days_remaining']) if root_info else 0
+            description = f"Left Subtree: Items with Days Remaining < {root_info['days_remaining']} (Root: {root_info['name']})"
+        elif subtree == "right":
+            pages = iter_stability_pages(min_days=root_info['days_remaining'], exclude_sku=root_info['sku']) if root_info else iter([])
+            count = stability_index.count_range(min_days=root_info['days_remaining']) - 1 if root_info else 0
+            description = f"Right Subtree: Items with Days Remaining >= {root_info['days_remaining']} (Root: {root_info['name']})"
+        elif subtree == "root":
+            pages = iter([[root_info]] if root_info else [])
+            count = 1 if root_info else 0
+            description = f"Root Node: {root_info['name']} with {root_info['days_remaining']} days remaining"
         else:
-            remaining_products.append((sku, details, days))
-    
-    # If no ideal root found, pick closest to 12 days
-    if ideal_root is None and product_days:
-        product_days_sorted = sorted(product_days, key=lambda x: abs(x[2] - 12))
-        ideal_root = product_days_sorted[0]
-        remaining_products = product_days_sorted[1:]
+            pages = iter_stability_pages()
+            count = len(stability_index)
+            description = "All Items: Full BST In-Order Traversal (Sorted by Days Remaining)"
     
-    # Insert ideal root FIRST (becomes the BST root)
-    if ideal_root:
-        bst.insert(ideal_root[2], ideal_root[0], ideal_root[1])
-    
-    # Insert remaining products
-    for sku, details, days in remaining_products:
-        bst.insert(days, sku, details)
-    
-    root_info = bst.get_root_info()
-    
-    if subtree == "left":
-        data = bst.get_left_subtree()
-        description = f"Left Subtree: Items with Days Remaining < {root_info['days_remaining']} (Root: {root_info['name']})"
-    elif subtree == "right":
-        data = bst.get_right_subtree()
-        description = f"Right Subtree: Items with Days Remaining >= {root_info['days_remaining']} (Root: {root_info['name']})"
-    elif subtree == "root":
-        data = [root_info] if root_info else []
-        description = f"Root Node: {root_info['name']} with {root_info['days_remaining']} days remaining"
-    else:
-        data = bst.get_stability_report()
-        description = "All Items: Full BST In-Order Traversal (Sorted by Days Remaining)"
-    
-    return {
-        "items": data,
-        "count": len(data),
+    header = {
+        "count": count,
         "filter": subtree,
         "description": description,
         "root": root_info
     }
+    # Stream {"count":..,"filter":..,"description":..,"root":..,"items":[...]}
+    prefix = _dumps(header)[:-1] + ',"items":'
+    return StreamingResponse(encode_json_array(pages, prefix=prefix, suffix="}"), media_type="application/json")
 
 @app.get("/api/audit/next")
-def get_audit_list():
-    # Build a fresh list for the view
-    products = get_product_lookup()
-    audit_list = AuditList()
-    for sku in products.keys():
-        audit_list.add_product(sku)
-        
-    # Get next 5
-    sequence = []
-    for _ in range(5):
-        sequence.append(audit_list.get_next_to_audit())
+def get_audit_list(count: int = 5, advance: bool = True):
+    """
+    Returns the next `count` locations to audit from the persistent cursor.
+    By default the first one is handed out: the cursor moves one step and the
+    new position is saved, so the rotation continues across calls and restarts.
+    Cost is O(count), independent of catalog size.
+    """
+    with audit_lock:
+        sequence = audit_ring.peek(max(0, count))
+        if advance and sequence:
+            audit_ring.get_next_to_audit()
+            next_sku = audit_ring.current_sku
+        else:
+            next_sku = None
+    
+    if next_sku:
+        save_audit_cursor(next_sku)
         
     return {"audit_sequence": sequence}
 
 @app.get("/api/orders/history")
+@conditional_get(lambda: order_history_version)
 def get_order_history():
     from data_ingestion import get_all_orders
     return get_all_orders()
 
 @app.post("/api/orders/{order_id}/dispatch")
 def dispatch_order(order_id: str):
-    import sqlite3
+    """
+    Ships an order. The order claim and the stock check happen inside
+    conditional UPDATEs (see reservations.py), so concurrent dispatches of
+    the same SKU, on any thread or worker, can never oversell.
+    """
     try:
-        conn = sqlite3.connect('pirs_warehouse.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # 1. Get Order Details
-        cursor.execute("SELECT * FROM customer_orders WHERE order_id = ?", (order_id,))
-        order = cursor.fetchone()
-        
-        if not order:
-            raise HTTPException(status_code=404, detail="Order not found")
-            
-        if order['status'] == 'SHIPPED':
-             return {"message": f"Order {order_id} is already shipped."}
-
-        # 2. Check Stock
-        cursor.execute("SELECT current_stock FROM products WHERE sku = ?", (order['sku'],))
-        product = cursor.fetchone()
-        
-        if not product:
-             raise HTTPException(status_code=404, detail="Product not found")
-             
-        if product['current_stock'] < order['qty_requested']:
-            raise HTTPException(status_code=400, detail="Insufficient stock to dispatch.")
-
-        # 3. Update Stock
-        new_stock = product['current_stock'] - order['qty_requested']
-        cursor.execute("UPDATE products SET current_stock = ? WHERE sku = ?", (new_stock, order['sku']))
-        
-        # 4. Update Order Status
-        cursor.execute("UPDATE customer_orders SET status = 'SHIPPED' WHERE order_id = ?", (order_id,))
-        
-        conn.commit()
-        conn.close()
-        
-        # 5. Remove from In-Memory Queue (Simulation)
-        shipping_queue.remove_order(order_id)
-        
-        return {"message": f"Order {order_id} dispatched successfully. Stock updated."}
-        
-    except HTTPException:
-        raise
+        with transaction() as conn:
+            sku, qty, _ = dispatch(conn, order_id)
+    except AlreadyShipped:
+        return {"message": f"Order {order_id} is already shipped."}
+    except OrderNotFound:
+        raise HTTPException(status_code=404, detail="Order not found")
+    except ProductNotFound:
+        raise HTTPException(status_code=404, detail="Product not found")
+    except InsufficientStock:
+        raise HTTPException(status_code=400, detail="Insufficient stock to dispatch.")
+    except ReservationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    bump_order_history()
+    
+    # Write-through to the in-memory catalog as a delta, so racing dispatches
+    # cannot overwrite each other's stock level with a stale one
+    product_catalog.adjust_stock(sku, -qty)
+    
+    # Remove from In-Memory Queue
+    shipping_queue.remove_order(order_id)
+    
+    return {"message": f"Order {order_id} dispatched successfully. Stock updated."}
 
 # --- Inventory Management (CRUD) ---
 
@@ -791,16 +1041,13 @@ class ProductCreate(BaseModel):
 
 @app.post("/api/products")
 def create_product(prod: ProductCreate):
-    import sqlite3
     try:
-        conn = sqlite3.connect('pirs_warehouse.db')
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO products (sku, name, current_stock, lead_time_days, unit_cost) VALUES (?, ?, ?, ?, ?)",
-            (prod.sku, prod.name, prod.current_stock, prod.lead_time_days, prod.unit_cost)
-        )
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            conn.execute(
+                "INSERT INTO products (sku, name, current_stock, lead_time_days, unit_cost) VALUES (?, ?, ?, ?, ?)",
+                (prod.sku, prod.name, prod.current_stock, prod.lead_time_days, prod.unit_cost)
+            )
+        product_catalog.upsert(prod.sku, prod.name, prod.current_stock, prod.lead_time_days, prod.unit_cost)
         return {"message": f"Product {prod.sku} created successfully."}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="SKU already exists.")
@@ -809,55 +1056,220 @@ def create_product(prod: ProductCreate):
 
 @app.put("/api/products/{sku}/stock")
 def update_stock(sku: str, update: StockUpdate):
-    import sqlite3
     try:
-        conn = sqlite3.connect('pirs_warehouse.db')
-        cursor = conn.cursor()
-        cursor.execute("UPDATE products SET current_stock = ? WHERE sku = ?", (update.new_stock, sku))
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Product not found.")
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            cursor = conn.execute("UPDATE products SET current_stock = ? WHERE sku = ?", (update.new_stock, sku))
+            if cursor.rowcount == 0:
+                raise HTTPException(status_code=404, detail="Product not found.")
+        product_catalog.set_stock(sku, update.new_stock)
         return {"message": f"Stock for {sku} updated to {update.new_stock}"}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+MAX_STOCK_BATCH = 10000
+
+@app.post("/api/products/stock/batch")
+def update_stock_batch(batch: StockBatch):
+    """
+    Bulk receiving / cycle count: applies many stock changes in ONE transaction.
+    Each row carries either `delta` (added to the current stock) or `new_stock`.
+    Rows for unknown SKUs, or that would leave stock negative, are rejected
+    individually; repeated SKUs apply in order and each applied row reports
+    the SKU's final stock after the whole batch.
+    
+    Afterwards the catalog is updated with a single version bump, the stability
+    index once for the whole batch, and pending orders for the touched SKUs are
+    re-prioritized in one pass over the queue.
+    """
+    if len(batch.updates) > MAX_STOCK_BATCH:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {MAX_STOCK_BATCH} updates).")
+    
+    products = get_product_lookup()
+    results = []
+    touched = set()
+    try:
+        with transaction() as conn:
+            for index, update in enumerate(batch.updates):
+                if update.sku not in products:
+                    results.append({"index": index, "sku": update.sku, "status": "rejected", "error": "Product not found."})
+                    continue
+                if (update.delta is None) == (update.new_stock is None):
+                    results.append({"index": index, "sku": update.sku, "status": "rejected", "error": "Give exactly one of delta / new_stock."})
+                    continue
+                
+                if update.delta is not None:
+                    cursor = conn.execute(
+                        "UPDATE products SET current_stock = current_stock + ? WHERE sku = ? AND current_stock + ? >= 0",
+                        (update.delta, update.sku, update.delta)
+                    )
+                elif update.new_stock >= 0:
+                    cursor = conn.execute("UPDATE products SET current_stock = ? WHERE sku = ?", (update.new_stock, update.sku))
+                else:
+                    cursor = None
+                
+                if cursor is None or cursor.rowcount == 0:
+                    results.append({"index": index, "sku": update.sku, "status": "rejected", "error": "Stock cannot go negative."})
+                    continue
+                touched.add(update.sku)
+                results.append({"index": index, "sku": update.sku, "status": "applied"})
+            
+            # Final levels, read inside the same transaction
+            new_stock = {}
+            if touched:
+                placeholders = ','.join(['?'] * len(touched))
+                cursor = conn.execute(f"SELECT sku, current_stock FROM products WHERE sku IN ({placeholders})", list(touched))
+                new_stock = dict(cursor.fetchall())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    for result in results:
+        if result["status"] == "applied":
+            result["new_stock"] = new_stock.get(result["sku"])
+    
+    reprioritized = 0
+    if new_stock:
+        # Write-through: one catalog version bump, stability index updated in one pass
+        product_catalog.set_stock_many(new_stock)
+        # Pending orders derive days_remaining (and so priority) from stock
+        reprioritized = shipping_queue.update_orders_by_sku({
+            sku: {'days_remaining': estimate_days_remaining(sku, stock)} for sku, stock in new_stock.items()
+        })
+    
+    applied = sum(1 for result in results if result["status"] == "applied")
+    return {
+        "applied": applied,
+        "rejected": len(results) - applied,
+        "skus_updated": len(new_stock),
+        "reprioritized_orders": reprioritized,
+        "catalog_version": product_catalog.version,
+        "results": results
+    }
+
+# --- Sales ingestion: buffered, group-committed by a single flusher thread ---
+sales_batcher = SalesBatcher()
+MAX_SALES_BATCH = 10000
+SALES_WAIT_SECONDS = 5 # Upper bound for ?wait=true
+
+def apply_sales_batch(rows):
+    """
+    Flush listener: folds committed sales into the demand forecast (only the
+    touched SKUs are refit), then refreshes what derives days remaining from it.
+    The forecast version (part of the catalog ETags) moves only after the
+    stability index is updated, and the event goes out after that.
+    """
+    skus = demand_forecast.add_sales(rows, bump_version=False)
+    products = get_product_lookup()
+    with stability_lock:
+        for sku in skus:
+            record = products.get(sku)
+            if record:
+                stability_index.insert(estimate_days_remaining(sku, record['stock']), sku, record)
+    shipping_queue.update_orders_by_sku({
+        sku: {'days_remaining': estimate_days_remaining(sku, products[sku]['stock'])} for sku in skus if sku in products
+    })
+    demand_forecast.bump_version()
+    event_bus.publish('stock', {
+        'action': 'sales',
+        'skus': sorted(skus),
+        'version': product_catalog.version
+    })
+
+sales_batcher.add_listener(apply_sales_batch)
+
+@app.post("/api/sales", status_code=202)
+def record_sales(events: Union[SaleEvent, List[SaleEvent]], wait: bool = False):
+    """
+    POS feed: one sale event or an array of them.
+    Events are validated, buffered and written by the flusher thread in one
+    transaction per FLUSH_INTERVAL_MS / MAX_BATCH_ROWS (group commit), so the
+    request never waits on SQLite. With ?wait=true the response is sent once
+    the batch holding these events is committed and the forecast updated (201).
+    """
+    from datetime import date
+    
+    if isinstance(events, SaleEvent):
+        events = [events]
+    if len(events) > MAX_SALES_BATCH:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {MAX_SALES_BATCH} events).")
+    
+    products = get_product_lookup()
+    today = date.today().isoformat()
+    rows = []
+    errors = []
+    for index, event in enumerate(events):
+        if event.sku not in products:
+            errors.append({"index": index, "error": "Product SKU not found."})
+            continue
+        if event.qty_sold <= 0:
+            errors.append({"index": index, "error": "qty_sold must be positive."})
+            continue
+        sale_date = today
+        if event.sale_date:
+            try:
+                sale_date = date.fromisoformat(event.sale_date[:10]).isoformat()
+            except ValueError:
+                errors.append({"index": index, "error": "sale_date must be YYYY-MM-DD."})
+                continue
+        rows.append((event.sku, event.qty_sold, sale_date))
+    
+    result = {"accepted": len(rows), "rejected": len(errors), "errors": errors}
+    if not rows:
+        return result
+    
+    batch = sales_batcher.submit(rows)
+    result["batch"] = batch
+    if wait:
+        result["committed"] = sales_batcher.wait(batch, SALES_WAIT_SECONDS)
+        if result["committed"]:
+            result["forecast_version"] = demand_forecast.version
+            return JSONResponse(status_code=201, content=result)
+    return result
+
 @app.delete("/api/products/{sku}")
 def delete_product(sku: str):
-    import sqlite3
     try:
-        conn = sqlite3.connect('pirs_warehouse.db')
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM products WHERE sku = ?", (sku,))
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Product not found.")
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            cursor = conn.execute("DELETE FROM products WHERE sku = ?", (sku,))
+            if cursor.rowcount == 0:
+                raise HTTPException(status_code=404, detail="Product not found.")
+        product_catalog.remove(sku)
         return {"message": f"Product {sku} deleted."}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/catalog/reload")
+def reload_catalog():
+    """
+    Forces the in-memory product catalog to re-read the products table.
+    Use after the DB was modified outside the API (seed scripts, manual SQL).
+    """
+    version = reload_product_lookup()
+    return {"message": "Product catalog reloaded.", "version": version, "count": len(get_product_lookup())}
+
 
 # --- DEBUG ENDPOINTS (Glass Box Visualizer) ---
 
 @app.get("/api/debug/heap-state")
+@conditional_get(catalog_version)
 def get_heap_state():
     """
     Returns raw Min-Heap array and tree structure for visualization.
     Used by Dashboard terminal view.
     """
-    heap = build_reorder_heap()
+    heap = build_reorder_heap(demand_forecast)
     products = get_product_lookup()
     
     # Build array representation
     heap_array = []
     for score, sku in heap:
         prod = products.get(sku, {})
-        days = max(1, int(prod.get('stock', 0) / 5))
+        days = estimate_days_remaining(sku, prod.get('stock', 0))
         heap_array.append({
             "index": len(heap_array),
             "sku": sku,
@@ -899,6 +1311,7 @@ def get_heap_state():
 
 
 @app.get("/api/debug/shipping-heap-state")
+@conditional_get(queue_version, catalog_version)
 def get_shipping_heap_state():
     """
     Returns raw Max-Heap array from shipping queue for visualization.
@@ -951,39 +1364,12 @@ def get_shipping_heap_state():
 
 
 @app.get("/api/debug/bst-structure")
+@conditional_get(catalog_version)
 def get_bst_structure():
     """
     Returns BST nodes and edges as JSON for tree visualization.
     Used by Reporting terminal view.
     """
-    products = get_product_lookup()
-    bst = InventoryBST()
-    
-    # Build BST with strategic root selection
-    product_list = []
-    for sku, details in products.items():
-        days = max(1, int(details['stock'] / 5))
-        product_list.append((sku, details, days))
-    
-    # Find ideal root (10-15 days)
-    ideal_root = None
-    remaining = []
-    for sku, details, days in product_list:
-        if ideal_root is None and 10 <= days <= 15:
-            ideal_root = (sku, details, days)
-        else:
-            remaining.append((sku, details, days))
-    
-    if ideal_root is None and product_list:
-        sorted_by_median = sorted(product_list, key=lambda x: abs(x[2] - 12))
-        ideal_root = sorted_by_median[0]
-        remaining = sorted_by_median[1:]
-    
-    if ideal_root:
-        bst.insert(ideal_root[2], ideal_root[0], ideal_root[1])
-    for sku, details, days in remaining:
-        bst.insert(days, sku, details)
-    
     # Recursive tree builder
     def build_tree_json(node, node_id=0):
         if not node:
@@ -1018,18 +1404,20 @@ def get_bst_structure():
         
         return current_node, nodes, edges
     
-    root_node, nodes, edges = build_tree_json(bst.root)
-    
-    # In-order traversal path
-    traversal = bst.get_stability_report()
+    with stability_lock:
+        root_node, nodes, edges = build_tree_json(stability_index.root)
+        
+        # In-order traversal path
+        traversal = stability_index.in_order_traversal(stability_index.root)
     traversal_path = [item['sku'] for item in traversal]
     
     return {
         "type": "binary_search_tree",
-        "description": "Inventory sorted by stability. Left = Critical, Right = Stable.",
+        "description": "Inventory sorted by stability (AVL-balanced). Left = Critical, Right = Stable.",
         "complexity": {
-            "insert": "O(log N) avg, O(N) worst",
-            "search": "O(log N) avg",
+            "insert": "O(log N)",
+            "delete": "O(log N)",
+            "search": "O(log N)",
             "in_order": "O(N)"
         },
         "tree": {"nodes": nodes, "edges": edges},
@@ -1040,6 +1428,7 @@ def get_bst_structure():
 
 
 @app.get("/api/debug/hashset-state")
+@conditional_get(lambda: safety_officer.version)
 def get_hashset_state():
     """
     Returns blocked lots Hash Set contents for safety gate visualization.
@@ -1070,14 +1459,17 @@ def get_hashset_state():
 
 
 @app.get("/api/debug/circular-list-state")
+@conditional_get(catalog_version, lambda: audit_ring.current_sku)
 def get_circular_list_state():
     """
     Returns Circular Linked List structure for audit visualization.
     """
     products = get_product_lookup()
     
-    # Build list of SKUs (limited for clean visualization)
-    skus = list(products.keys())[:12]  # Limit to 12 for clean circle
+    # Next 12 SKUs from the live cursor (limited for clean visualization)
+    with audit_lock:
+        skus = audit_ring.peek(min(12, len(audit_ring)))
+        total = len(audit_ring)
     
     nodes = []
     for i, sku in enumerate(skus):
@@ -1094,10 +1486,12 @@ def get_circular_list_state():
         "description": "Audit Schedule - continuous rotation through all products.",
         "complexity": {
             "get_next": "O(1)",
-            "add": "O(N)",
+            "add": "O(1)",
+            "remove": "O(1)",
             "traverse": "O(N)"
         },
         "nodes": nodes,
         "current_pointer": 0,
-        "size": len(nodes)
+        "size": len(nodes),
+        "total_locations": total
     }
@@ -0,0 +1,122 @@
+"""
+Shared SQLite connection manager.
+
+Every module goes through here instead of calling sqlite3.connect() itself.
+Each worker thread (FastAPI runs sync endpoints in a threadpool) gets its own
+long-lived connection per database file, so we pay the connect + PRAGMA cost
+once per thread instead of once per request.
+
+Data Structure: Hash Table per thread (threading.local)
+Key: database path
+Value: open sqlite3.Connection
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get('PIRS_DB_PATH', 'pirs_warehouse.db')
+
+# PRAGMA profiles. journal_mode is always WAL so readers never block on a writer.
+# cache_size is negative = KiB, mmap_size is bytes.
+PRAGMA_PROFILES = {
+    # fsync on every commit, smallest memory footprint
+    'durable': {'synchronous': 'FULL', 'cache_size': -16000, 'mmap_size': 0},
+    # WAL + NORMAL is crash-safe; only the last commits can be lost on power failure
+    'balanced': {'synchronous': 'NORMAL', 'cache_size': -64000, 'mmap_size': 256 * 1024 * 1024},
+    # bulk loads / benchmarks, no fsync at all
+    'fast': {'synchronous': 'OFF', 'cache_size': -256000, 'mmap_size': 1024 * 1024 * 1024},
+}
+DB_PROFILE = os.environ.get('PIRS_DB_PROFILE', 'balanced')
+
+# sqlite3 keeps an LRU of compiled statements per connection keyed by SQL text.
+# Our queries are constant strings, so a larger cache means they are prepared once.
+STATEMENT_CACHE_SIZE = 256
+
+BUSY_TIMEOUT_SECONDS = 30
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_open_connections = [] # Every pooled connection, so they can be closed on shutdown
+_generation = 0 # Bumped by close_all_connections() so other threads reconnect
+
+
+def _apply_pragmas(conn, profile):
+    settings = PRAGMA_PROFILES.get(profile, PRAGMA_PROFILES['balanced'])
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={settings['synchronous']}")
+    conn.execute(f"PRAGMA cache_size={int(settings['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size={int(settings['mmap_size'])}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+
+def get_connection(path=None):
+    """
+    Returns this thread's pooled connection for `path` (defaults to DB_PATH).
+    The connection stays open; do not close it.
+    Complexity: O(1) after the first call on a thread
+    """
+    path = path or DB_PATH
+    pool = getattr(_local, 'connections', None)
+    if pool is None:
+        pool = _local.connections = {}
+
+    entry = pool.get(path)
+    if entry is not None and entry[0] == _generation:
+        return entry[1]
+
+    # check_same_thread=False only so close_all_connections() can close it
+    # from the shutdown thread; the connection is still only used by its owner.
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_SECONDS,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False
+    )
+    _apply_pragmas(conn, DB_PROFILE)
+    with _registry_lock:
+        pool[path] = (_generation, conn)
+        _open_connections.append(conn)
+    return conn
+
+
+@contextmanager
+def transaction(path=None):
+    """
+    Yields the pooled connection and commits on success.
+    Any exception rolls the transaction back, so a failed request never
+    leaves an open write transaction (or a leaked connection) behind.
+    """
+    conn = get_connection(path)
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def configure(path=None, profile=None):
+    """Points the pool at a different database file / PRAGMA profile (tests, benchmarks)."""
+    global DB_PATH, DB_PROFILE
+    close_all_connections()
+    if path:
+        DB_PATH = path
+    if profile:
+        if profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Unknown PRAGMA profile: {profile}")
+        DB_PROFILE = profile
+
+
+def close_all_connections():
+    """Closes every pooled connection on every thread."""
+    global _generation
+    with _registry_lock:
+        connections = list(_open_connections)
+        _open_connections.clear()
+        _generation += 1
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
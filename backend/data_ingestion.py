@@ -1,18 +1,15 @@
 import sqlite3
+import threading
+from connection_manager import get_connection, transaction
 
-def get_product_lookup():
+def load_product_table():
     """
-    Returns a Hash Table (Dict) for O(1) product access.
-    
-    Data Structure: Hash Table (Python Dictionary)
-    Key: SKU (String)
-    Value: Dictionary of product details
-    Complexity: O(1) Average Case for Lookups
+    Reads the full products table into a Hash Table (Dict).
+    This is a table scan; request paths should use get_product_lookup() instead.
     """
     products = {}
     try:
-        conn = sqlite3.connect('pirs_warehouse.db')
-        cursor = conn.cursor()
+        cursor = get_connection().cursor()
         cursor.execute("SELECT sku, name, current_stock, lead_time_days, unit_cost FROM products")
         
         # SKU is the Key, Details are the Value
@@ -20,48 +17,325 @@ def get_product_lookup():
         
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
             
     return products
 
-def get_sales_array(sku):
+class ProductCatalog:
+    """
+    Process-wide write-through cache of the products table.
+    
+    Data Structure: Hash Table (Python Dictionary) kept in memory
+    Loaded once, then updated in place by the API write paths, so reads are
+    a dict lookup instead of a table scan. Every change bumps `version`
+    (monotonically increasing) so readers can tell whether their view is stale.
+    
+    Listeners registered with add_listener(fn) are called as
+    fn(event, sku, record) after each change, with event in
+    'upsert' | 'stock' | 'remove' | 'reload' (sku/record are None for reload).
+    They run under the catalog lock, so they see changes in commit order and
+    must be quick and must not write to the catalog themselves.
+    `version` only moves once every listener has updated its derived view,
+    so a reader that sees the new version also sees the new views (ETags).
+    Watchers (add_watcher) run after the bump: they announce the change
+    (SSE), and a client that refetches on the announcement sees the new version.
+    
+    The dict returned by snapshot() must be treated as read-only:
+    - stock changes replace a single value (never resizes the dict)
+    - adds/removes swap in a new dict (copy-on-write), so a caller iterating
+      an older snapshot never sees "dictionary changed size during iteration"
+    """
+    def __init__(self):
+        self._products = None
+        self._lock = threading.Lock()
+        self.version = 0
+        self._listeners = []
+        self._watchers = []
+
+    def add_listener(self, callback):
+        """
+        Registers fn(event, sku, record), called after every catalog change.
+        Events: 'upsert', 'stock', 'remove', 'reload', and 'stock_batch'
+        (sku is None, record is {sku: record}).
+        """
+        self._listeners.append(callback)
+
+    def add_watcher(self, callback):
+        """Registers fn(event, sku, record) like add_listener, called after `version` is bumped."""
+        self._watchers.append(callback)
+
+    def _notify(self, event, sku=None, record=None):
+        """Updates the derived views, then bumps `version`, then tells the watchers. Caller holds the lock."""
+        for callback in self._listeners:
+            try:
+                callback(event, sku, record)
+            except Exception as e:
+                print(f"[CATALOG] Listener error on {event} {sku}: {e}")
+        self.version += 1
+        for callback in self._watchers:
+            try:
+                callback(event, sku, record)
+            except Exception as e:
+                print(f"[CATALOG] Watcher error on {event} {sku}: {e}")
+
+    def _ensure_loaded(self):
+        if self._products is None:
+            with self._lock:
+                if self._products is None:
+                    self._products = load_product_table()
+                    self.version += 1
+        return self._products
+
+    def snapshot(self):
+        """Returns the current SKU -> details dict. O(1)."""
+        return self._ensure_loaded()
+
+    def get(self, sku):
+        """O(1) lookup of a single product, or None."""
+        return self._ensure_loaded().get(sku)
+
+    def upsert(self, sku, name, stock, lead, price):
+        """Adds (or replaces) a product after it was written to the DB."""
+        self._ensure_loaded()
+        with self._lock:
+            products = dict(self._products)
+            products[sku] = {'name': name, 'stock': stock, 'lead': lead, 'price': price}
+            self._products = products
+            self._notify('upsert', sku, products[sku])
+
+    def set_stock(self, sku, stock):
+        """Updates a product's stock in place after it was written to the DB."""
+        self._ensure_loaded()
+        with self._lock:
+            products = self._products
+            current = products.get(sku)
+            if current is None:
+                return False
+            # Replace the record instead of mutating it, so readers holding the
+            # old record still see a consistent (name, stock, price) tuple
+            products[sku] = {**current, 'stock': stock}
+            self._notify('stock', sku, products[sku])
+            return True
+
+    def adjust_stock(self, sku, delta):
+        """
+        Adds `delta` to a product's cached stock after the same change was written
+        to the DB. Unlike set_stock() the result does not depend on the order
+        concurrent writers reach the cache in. Returns the new stock, or None.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            products = self._products
+            current = products.get(sku)
+            if current is None:
+                return None
+            products[sku] = {**current, 'stock': current['stock'] + delta}
+            self._notify('stock', sku, products[sku])
+            return products[sku]['stock']
+
+    def set_stock_many(self, stocks):
+        """
+        Applies many stock levels (sku -> new stock) with ONE version bump and a
+        single 'stock_batch' event whose record is {sku: new record}, so
+        listeners can apply the whole batch in one pass. Unknown SKUs are skipped.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            products = self._products
+            changed = {}
+            for sku, stock in stocks.items():
+                current = products.get(sku)
+                if current is None:
+                    continue
+                products[sku] = changed[sku] = {**current, 'stock': stock}
+            if changed:
+                self._notify('stock_batch', None, changed)
+            return len(changed)
+
+    def remove(self, sku):
+        """Drops a product after it was deleted from the DB."""
+        self._ensure_loaded()
+        with self._lock:
+            if sku not in self._products:
+                return False
+            products = dict(self._products)
+            record = products.pop(sku)
+            self._products = products
+            self._notify('remove', sku, record)
+            return True
+
+    def reload(self):
+        """Forces a full reload, e.g. after the DB was changed out-of-band."""
+        products = load_product_table()
+        with self._lock:
+            self._products = products
+            self._notify('reload')
+        return self.version
+
+# Single shared catalog for the whole process
+product_catalog = ProductCatalog()
+
+def get_product_lookup():
+    """
+    Returns a Hash Table (Dict) for O(1) product access.
+    
+    Data Structure: Hash Table (Python Dictionary)
+    Key: SKU (String)
+    Value: Dictionary of product details
+    Complexity: O(1) Average Case for Lookups (served from the in-memory catalog)
+    """
+    return product_catalog.snapshot()
+
+def get_catalog_version():
+    """Monotonic version of the product catalog; changes on every write."""
+    product_catalog.snapshot()
+    return product_catalog.version
+
+def reload_product_lookup():
+    """Re-reads the products table into the catalog cache. Returns the new version."""
+    return product_catalog.reload()
+
+def get_sales_array(sku, days=None):
     """
-    Returns a Dynamic Array (List) of recent sales for a specific SKU.
+    Returns a Dynamic Array (List) of daily units sold for a specific SKU,
+    most recent day first, optionally limited to the last `days` days.
     
     Data Structure: Dynamic Array (Python List)
     Usage: Used to iterate chronologically for prediction algorithms.
+    Read from the daily_sales rollup: cost follows the number of days, not
+    the number of raw transactions.
     """
     sales_data = []
     try:
-        conn = sqlite3.connect('pirs_warehouse.db')
-        cursor = conn.cursor()
+        cursor = get_connection().cursor()
         # Order by date desc to get most recent first, or asc for chronological analysis
-        cursor.execute("SELECT qty_sold FROM sales_history WHERE sku = ? ORDER BY sale_date DESC", (sku,))
+        if days is None:
+            cursor.execute("SELECT qty_sold FROM daily_sales WHERE sku = ? ORDER BY sale_date DESC", (sku,))
+        else:
+            cursor.execute(
+                """
+                SELECT qty_sold FROM daily_sales
+                WHERE sku = ? AND sale_date > date((SELECT MAX(sale_date) FROM daily_sales), ?)
+                ORDER BY sale_date DESC
+                """,
+                (sku, f"-{int(days)} days")
+            )
         sales_data = [row[0] for row in cursor.fetchall()]
     except sqlite3.Error as e:
         print(f"Database error getting sales for {sku}: {e}")
-    finally:
-        if conn:
-            conn.close()
             
     return sales_data
 
+def get_sales_totals(skus=None):
+    """
+    Returns a Hash Table of aggregated sales for every SKU in one grouped query.
+    
+    Data Structure: Hash Table (Python Dictionary)
+    Key: SKU (String)
+    Value: (total_qty_sold, number_of_sales) tuple
+    Usage: Lets the prediction engine score the whole catalog without
+           opening one connection per SKU. Pass `skus` to restrict the scan.
+           Summed from the daily_sales rollup (one row per SKU-day).
+    """
+    totals = {}
+    try:
+        cursor = get_connection().cursor()
+        if skus is None:
+            cursor.execute("SELECT sku, SUM(qty_sold), SUM(txn_count) FROM daily_sales GROUP BY sku")
+        else:
+            skus = list(skus)
+            placeholders = ','.join(['?'] * len(skus))
+            cursor.execute(
+                f"SELECT sku, SUM(qty_sold), SUM(txn_count) FROM daily_sales WHERE sku IN ({placeholders}) GROUP BY sku",
+                skus
+            )
+        totals = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    except sqlite3.Error as e:
+        print(f"Database error aggregating sales: {e}")
+            
+    return totals
+
+def load_audit_cursor():
+    """Returns the SKU the audit rotation stopped at, or None."""
+    try:
+        row = get_connection().execute("SELECT sku FROM audit_cursor WHERE id = 1").fetchone()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        print(f"Database error loading audit cursor: {e}")
+        return None
+
+def save_audit_cursor(sku):
+    """Persists the audit rotation position (single-row upsert)."""
+    try:
+        with transaction() as conn:
+            conn.execute(
+                "INSERT INTO audit_cursor (id, sku, updated_at) VALUES (1, ?, datetime('now')) "
+                "ON CONFLICT(id) DO UPDATE SET sku = excluded.sku, updated_at = excluded.updated_at",
+                (sku,)
+            )
+    except sqlite3.Error as e:
+        print(f"Database error saving audit cursor: {e}")
+
+def get_daily_sales(window_days):
+    """
+    Returns (end_date, rows): units sold per SKU per day over the trailing
+    `window_days`, ending at the latest sale on record.
+    
+    Data Structure: Dynamic Array of (sku, sale_date, qty) tuples, one per
+    SKU-day with sales (sparse; the forecaster densifies it).
+    Usage: a range read of the daily_sales rollup on its date index, so the
+    cost depends on the window length, not on how much history is stored.
+    """
+    try:
+        cursor = get_connection().cursor()
+        end_date = cursor.execute("SELECT MAX(sale_date) FROM daily_sales").fetchone()[0]
+        if end_date is None:
+            return None, []
+        cursor.execute(
+            "SELECT sku, sale_date, qty_sold FROM daily_sales WHERE sale_date > date(?, ?)",
+            (end_date, f"-{int(window_days)} days")
+        )
+        return end_date, cursor.fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error loading daily sales: {e}")
+        return None, []
+
+# Columns the in-memory queues need (no SELECT *)
+OPEN_ORDER_COLUMNS = "order_id, customer_tier, sku, product_name, qty_requested, total_amount"
+
+def iter_orders_by_status(status, batch_size=10000):
+    """
+    Streams orders with one status straight off a cursor.
+    
+    Data Structure: generator over fetchmany() pages of plain tuples
+    (order_id, customer_tier, sku, product_name, qty_requested, total_amount).
+    Usage: startup hydration of the shipping / blocked queues. The status
+    filter runs in SQL, so SHIPPED history is never read, and memory held
+    here is O(batch_size) however many orders are open.
+    """
+    try:
+        cursor = get_connection().cursor()
+        cursor.execute(
+            f"SELECT {OPEN_ORDER_COLUMNS} FROM customer_orders WHERE status = ? ORDER BY order_date DESC",
+            (status,)
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    except sqlite3.Error as e:
+        print(f"Database error streaming {status} orders: {e}")
+
 def get_all_orders():
     """
     Fetches all customer orders.
     """
     orders = []
     try:
-        conn = sqlite3.connect('pirs_warehouse.db')
-        conn.row_factory = sqlite3.Row # Allow dict-like access
-        cursor = conn.cursor()
+        cursor = get_connection().cursor()
+        cursor.row_factory = sqlite3.Row # Allow dict-like access (cursor-level, the connection is shared)
         cursor.execute("SELECT * FROM customer_orders ORDER BY order_date DESC")
         orders = [dict(row) for row in cursor.fetchall()]
     except sqlite3.Error as e:
         print(f"Database error getting orders: {e}")
-    finally:
-        if conn:
-            conn.close()
-    return orders
\ No newline at end of file
+    return orders
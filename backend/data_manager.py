@@ -1,16 +1,23 @@
 import sqlite3
+from datetime import date
+import numpy as np
+from connection_manager import get_connection
+from forecasting import days_of_cover
+from sales_snapshot import refresh_snapshot, to_day
+from seed_db import ensure_daily_sales
 
 DB_NAME = 'inventory.db'
+FORECAST_WINDOW_DAYS = 90
+_rollup_ready = False # ensure_daily_sales() ran for DB_NAME in this process
 
 def get_product_master_data():
     """
     Step B: Loads product data from SQLite into a Python Dictionary (Hash Table).
     Returns: dict { "SKU001": { "name": "...", "stock": 100, ... }, ... }
     """
-    conn = sqlite3.connect(DB_NAME)
+    cursor = get_connection(DB_NAME).cursor()
     # Use Row factory to access columns by name easily
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
 
     try:
         cursor.execute("SELECT sku, name, current_stock, price, supplier_info FROM products")
@@ -30,70 +37,55 @@ def get_product_master_data():
     except Exception as e:
         print(f"Error loading master data: {e}")
         return {}
-    finally:
-        conn.close()
     
-def calculate_forecast(master_data_hash):
+def calculate_forecast(master_data_hash, snapshot=None):
     """
     Step C: The Prediction Engine.
-    1. Aggregates sales history via SQL.
+    1. Aggregates sales history from the memory-mapped columnar snapshot.
     2. Calculates 'Days of Stock Remaining' based on current stock from master data.
     3. Prepares data for Member 2's Heap.
     
     Args: master_data_hash (dict) - The output from Step B.
+          snapshot - an open SalesSnapshot; by default the one next to
+          inventory.db is refreshed (only new days are read from SQLite).
     Returns: list of tuples [(days_remaining, sku), ...]
     """
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    global _rollup_ready
     try:
-        # --- Extraction & Aggregation (SQL side) ---
-        # We ask the DB to calculate total sold and total distinct days with sales per SKU
-        # We limit to recent history (e.g., last 90 days) for better trend relevance
-        query = """
-            SELECT 
-                sku, 
-                SUM(quantity_sold) as total_sold,
-                COUNT(DISTINCT sale_date) as active_days
-            FROM sales_history
-            WHERE sale_date >= date('now', '-90 days')
-            GROUP BY sku
-        """
-        cursor.execute(query)
-        aggregated_sales = cursor.fetchall()
+        if snapshot is None:
+            if not _rollup_ready:
+                # Databases seeded before the rollup existed get it (backfilled) here
+                ensure_daily_sales(DB_NAME)
+                _rollup_ready = True
+            snapshot = refresh_snapshot(db_name=DB_NAME, qty_column='quantity_sold')
 
-        heap_ready_data = []
+        # --- Extraction & Aggregation (columnar scan, no per-row Python objects) ---
+        # Total sold and number of days with sales per SKU
+        # We limit to recent history (e.g., last 90 days) for better trend relevance
+        total_sold, active_days = snapshot.window(FORECAST_WINDOW_DAYS, end_day=to_day(date.today()))
 
-        # --- Calculation & Transformation (Python side) ---
-        for sku, total_sold, active_days in aggregated_sales:
-            # Ensure we have master data for this SKU before calculating
-            if sku in master_data_hash and active_days > 0:
-                current_stock = master_data_hash[sku]['stock']
-                
-                # 1. Calculate Average Daily Sales (Burn Rate)
-                # Avoid division by zero if active_days is somehow 0
-                avg_daily_sales = total_sold / active_days if active_days > 0 else 0
+        # --- Calculation & Transformation (NumPy side, one pass for all SKUs) ---
+        # Ensure we have master data for this SKU before calculating
+        ids = np.array([sku_id for sku_id, sku in enumerate(snapshot.skus)
+                        if sku in master_data_hash and active_days[sku_id] > 0], dtype=np.int64)
+        if not len(ids):
+            return []
+        skus = [snapshot.skus[sku_id] for sku_id in ids]
+        current_stock = np.array([master_data_hash[sku]['stock'] for sku in skus], dtype=np.float64)
 
-                # 2. Calculate Forecasted Days Remaining
-                if avg_daily_sales > 0:
-                    days_remaining = current_stock / avg_daily_sales
-                else:
-                    # If no sales, stock will last "forever" (use a high number)
-                    days_remaining = 9999.0 
-                
-                # Round for cleaner data
-                days_remaining = round(days_remaining, 2)
+        # 1. Average Daily Sales (Burn Rate), 2. Days Remaining = stock / burn rate
+        # (no sales -> stock lasts "forever", reported as NO_SALES_DAYS)
+        days_remaining = np.round(days_of_cover(current_stock, total_sold[ids] / active_days[ids]), 2)
 
-                # 3. Format for Handoff to Member 2 (Heap requires tuples)
-                # We put the metric FIRST because heaps sort by the first item in a tuple.
-                heap_ready_data.append((days_remaining, sku))
+        # 3. Format for Handoff to Member 2 (Heap requires tuples)
+        # We put the metric FIRST because heaps sort by the first item in a tuple.
+        heap_ready_data = list(zip(days_remaining.tolist(), skus))
 
         return heap_ready_data
 
     except Exception as e:
         print(f"Error calculating forecast: {e}")
         return []
-    finally:
-        conn.close()
 
 if __name__ == '__main__':
     # 1. Load the ground truth
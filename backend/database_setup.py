@@ -1,19 +1,32 @@
-import sqlite3
-
-def setup_database():
-    # Connect to (or create) the database file
-    # Connect to (or create) the database file
-    conn = sqlite3.connect('pirs_warehouse.db')
-    cursor = conn.cursor()
-
-    # Reset tables to clean slate
-    cursor.execute("DROP TABLE IF EXISTS sales_history")
-    cursor.execute("DROP TABLE IF EXISTS inventory_lots")
-    cursor.execute("DROP TABLE IF EXISTS customer_orders")
-    cursor.execute("DROP TABLE IF EXISTS products") # Drop master last or verify FK constraints? SQLite defaults usually lax, but better safe.
-
-    # 1. Product Master Table (For Hash Table & BST)
-    cursor.execute('''
+import sys
+from connection_manager import get_connection, transaction
+from order_ids import ORDER_SEQUENCE, format_order_id
+from sales_snapshot import CHANGES_DDL
+
+def init_order_sequence(conn):
+    """
+    Starts the order sequence after the highest numeric 'ORD-<n>' ID already
+    stored, so allocated IDs never collide with existing orders.
+    """
+    start = conn.execute(
+        """
+        SELECT COALESCE(MAX(CAST(SUBSTR(order_id, 5) AS INTEGER)), 0) + 1 FROM customer_orders
+        WHERE order_id GLOB 'ORD-[0-9]*' AND order_id NOT GLOB 'ORD-*[^0-9]*'
+        """
+    ).fetchone()[0]
+    conn.execute("INSERT INTO id_sequences (name, next_value) VALUES (?, ?) "
+                 "ON CONFLICT (name) DO UPDATE SET next_value = MAX(next_value, excluded.next_value)",
+                 (ORDER_SEQUENCE, start))
+
+# Ordered schema migrations. Each one runs once, in its own transaction, and
+# PRAGMA user_version records the last one applied, so startup on an
+# up-to-date database is a single PRAGMA read.
+# Statements are idempotent (IF NOT EXISTS) so databases created before
+# versioning existed (user_version = 0, tables present) upgrade cleanly.
+MIGRATIONS = [
+    (1, "Base schema", [
+        # 1. Product Master Table (For Hash Table & BST)
+        '''
         CREATE TABLE IF NOT EXISTS products (
             sku TEXT PRIMARY KEY,
             name TEXT NOT NULL,
@@ -21,10 +34,9 @@ def setup_database():
             lead_time_days INTEGER DEFAULT 7,
             unit_cost REAL
         )
-    ''')
-
-    # 2. Sales History Table (For Dynamic Array/Prediction)
-    cursor.execute('''
+        ''',
+        # 2. Sales History Table (For Dynamic Array/Prediction)
+        '''
         CREATE TABLE IF NOT EXISTS sales_history (
             txn_id INTEGER PRIMARY KEY AUTOINCREMENT,
             sku TEXT,
@@ -32,10 +44,9 @@ def setup_database():
             sale_date DATE,
             FOREIGN KEY (sku) REFERENCES products(sku)
         )
-    ''')
-
-    # 3. Lot Tracking Table (For Set/Safety Checks)
-    cursor.execute('''
+        ''',
+        # 3. Lot Tracking Table (For Set/Safety Checks)
+        '''
         CREATE TABLE IF NOT EXISTS inventory_lots (
             lot_id TEXT PRIMARY KEY,
             sku TEXT,
@@ -43,99 +54,9 @@ def setup_database():
             is_recalled INTEGER DEFAULT 0,
             FOREIGN KEY (sku) REFERENCES products(sku)
         )
-    ''')
-
-    # Seed initial product data
-    # Seed Synthetic Data (100+ Products)
-    import random
-    from datetime import datetime, timedelta
-
-    # Explicit Product Catalog from User Images
-    products_catalog = [
-        # Electronics
-        ('SKU001', 'Mouse (Electronics)', 349.00), ('SKU002', 'Keyboard (Electronics)', 599.00),
-        ('SKU003', 'Monitor (Electronics)', 7499.00), ('SKU004', 'Cable (Electronics)', 199.00),
-        ('SKU005', 'Charger (Electronics)', 449.00), ('SKU006', 'Headset (Electronics)', 899.00),
-        ('SKU007', 'Webcam (Electronics)', 1499.00), ('SKU008', 'Microphone (Electronics)', 599.00),
-        ('SKU009', 'Laptop Stand (Electronics)', 699.00), ('SKU010', 'USB Hub (Electronics)', 399.00),
-        ('SKU011', 'Power Bank (Electronics)', 999.00), ('SKU012', 'HDMI Adapter (Electronics)', 299.00),
-        ('SKU013', 'Router (Electronics)', 1299.00), ('SKU014', 'Switch (Electronics)', 799.00),
-        ('SKU015', 'Speaker (Electronics)', 1199.00),
-        
-        # Office
-        ('SKU016', 'Paper (Office)', 260.00), ('SKU017', 'Pen (Office)', 50.00),
-        ('SKU018', 'Stapler (Office)', 149.00), ('SKU019', 'Binder (Office)', 120.00),
-        ('SKU020', 'Folder (Office)', 25.00), ('SKU021', 'Notepad (Office)', 60.00),
-        ('SKU022', 'Desk Lamp (Office)', 799.00), ('SKU023', 'Chair (Office)', 3499.00),
-        ('SKU024', 'Whiteboard (Office)', 899.00), ('SKU025', 'Marker (Office)', 30.00),
-        ('SKU026', 'Highlighter (Office)', 25.00), ('SKU027', 'Scissors (Office)', 129.00),
-        ('SKU028', 'Tape (Office)', 49.00), ('SKU029', 'Calculator (Office)', 399.00),
-        ('SKU030', 'Shredder (Office)', 2499.00),
-
-        # Kitchen
-        ('SKU031', 'Mug (Kitchen)', 149.00), ('SKU032', 'Plate (Kitchen)', 199.00),
-        ('SKU033', 'Fork (Kitchen)', 249.00), ('SKU034', 'Spoon (Kitchen)', 249.00),
-        ('SKU035', 'Knife (Kitchen)', 299.00), ('SKU036', 'Bowl (Kitchen)', 99.00),
-        ('SKU037', 'Glass (Kitchen)', 399.00), ('SKU038', 'Napkin (Kitchen)', 79.00),
-        ('SKU039', 'Towel (Kitchen)', 149.00), ('SKU040', 'Soap (Kitchen)', 89.00),
-        ('SKU041', 'Sponge (Kitchen)', 49.00), ('SKU042', 'Toaster (Kitchen)', 1199.00),
-        ('SKU043', 'Blender (Kitchen)', 1499.00), ('SKU044', 'Mixer (Kitchen)', 2899.00),
-        ('SKU045', 'Kettle (Kitchen)', 799.00),
-
-        # Automotive
-        ('SKU046', 'Wiper Blade (Automotive)', 349.00), ('SKU047', 'Car Wax (Automotive)', 399.00),
-        ('SKU048', 'Air Freshener (Automotive)', 199.00), ('SKU049', 'Oil Filter (Automotive)', 249.00),
-        ('SKU050', 'Tire shine (Automotive)', 299.00), ('SKU051', 'Seat Cover (Automotive)', 899.00),
-        ('SKU052', 'Phone Mount (Automotive)', 349.00), ('SKU053', 'Vacuum (Automotive)', 999.00),
-        ('SKU054', 'Jump Starter (Automotive)', 3999.00), ('SKU055', 'First Aid Kit (Automotive)', 499.00),
-
-        # Gardening
-        ('SKU056', 'Shovel (Gardening)', 499.00), ('SKU057', 'Rake (Gardening)', 399.00),
-        ('SKU058', 'Gloves (Gardening)', 149.00), ('SKU059', 'Hose (Gardening)', 599.00),
-        ('SKU060', 'Sprinkler (Gardening)', 349.00), ('SKU061', 'Pot (Gardening)', 199.00),
-        ('SKU062', 'Seeds (Gardening)', 99.00), ('SKU063', 'Fertilizer (Gardening)', 249.00),
-        ('SKU064', 'Pruner (Gardening)', 399.00), ('SKU065', 'Trowel (Gardening)', 129.00),
-    ]
-
-    # Additional Toys (Randomized as no image data provided)
-    toys = ['Action Figure', 'Doll', 'Puzzle', 'Board Game', 'Card Game', 'Blocks', 'Plush', 'Drone', 'Car Model', 'Train Set']
-    sku_start = 66
-    for i, toy in enumerate(toys):
-        sku = f"SKU{sku_start + i:03d}"
-        products_catalog.append((sku, f"{toy} (Toys)", round(random.uniform(100.0, 5000.0), 2)))
-
-    products_data = []
-    sales_data = []
-    
-    for sku, name, cost in products_catalog:
-        # Randomize stock/lead time, but keep price exact
-        stock = random.randint(5, 500) 
-        lead = random.randint(2, 21)
-        
-        products_data.append((sku, name, stock, lead, cost))
-        
-        # Generate sales history
-        daily_demand = random.randint(0, 10)
-        start_date = datetime.now()
-        for i in range(15): 
-            date_str = (start_date - timedelta(days=i)).strftime('%Y-%m-%d')
-            qty = max(0, daily_demand + random.randint(-3, 5)) 
-            if qty > 0:
-                sales_data.append((sku, qty, date_str))
-
-    cursor.executemany('INSERT OR IGNORE INTO products VALUES (?,?,?,?,?)', products_data)
-    cursor.executemany('INSERT INTO sales_history (sku, qty_sold, sale_date) VALUES (?,?,?)', sales_data)
-
-    # Seed initial sales data (to test prediction)
-    # SKU001 (Milk): High sales (10/day), huge stock (150). Days left = 15.
-    sample_sales = [
-        ('SKU001', 10, '2023-10-01'), ('SKU001', 10, '2023-10-02'),
-        ('SKU002', 1, '2023-10-01'), ('SKU002', 1, '2023-10-02')
-    ]
-    cursor.executemany('INSERT INTO sales_history (sku, qty_sold, sale_date) VALUES (?,?,?)', sample_sales)
-
-    # 4. Customer Orders Table (For Priority Queue/Heap)
-    cursor.execute('''
+        ''',
+        # 4. Customer Orders Table (For Priority Queue/Heap)
+        '''
         CREATE TABLE IF NOT EXISTS customer_orders (
             order_id TEXT PRIMARY KEY,
             customer_tier INTEGER,
@@ -147,38 +68,297 @@ def setup_database():
             status TEXT,
             FOREIGN KEY (sku) REFERENCES products(sku)
         )
-    ''')
+        ''',
+    ]),
+    (2, "Audit cursor (Circular Linked List position survives restarts)", [
+        '''
+        CREATE TABLE IF NOT EXISTS audit_cursor (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            sku TEXT,
+            updated_at TEXT
+        )
+        ''',
+    ]),
+    (3, "Secondary indexes for the hot read paths", [
+        # get_sales_array / sales summary: WHERE sku = ? ORDER BY sale_date (covering)
+        "CREATE INDEX IF NOT EXISTS idx_sales_sku_date ON sales_history (sku, sale_date, qty_sold)",
+        # Date-window aggregates (forecast over the last N days, grouped by sku)
+        "CREATE INDEX IF NOT EXISTS idx_sales_date_sku ON sales_history (sale_date, sku, qty_sold)",
+        # get_all_orders / order history: ORDER BY order_date DESC
+        "CREATE INDEX IF NOT EXISTS idx_orders_date ON customer_orders (order_date)",
+        # Startup hydration and status filters: WHERE status = ? ORDER BY order_date DESC
+        "CREATE INDEX IF NOT EXISTS idx_orders_status_date ON customer_orders (status, order_date)",
+    ]),
+    (4, "Daily sales rollup (one row per SKU per day, kept in step by triggers)", [
+        '''
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            sku TEXT NOT NULL,
+            sale_date DATE NOT NULL,
+            qty_sold INTEGER NOT NULL DEFAULT 0,
+            txn_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sku, sale_date)
+        ) WITHOUT ROWID
+        ''',
+        # Windowed reads across all SKUs: WHERE sale_date > ? (covering)
+        "CREATE INDEX IF NOT EXISTS idx_daily_sales_date ON daily_sales (sale_date, sku, qty_sold)",
+        '''
+        INSERT INTO daily_sales (sku, sale_date, qty_sold, txn_count)
+        SELECT sku, sale_date, COALESCE(SUM(qty_sold), 0), COUNT(*) FROM sales_history
+        WHERE sku IS NOT NULL AND sale_date IS NOT NULL
+        GROUP BY sku, sale_date
+        ''',
+        # Any writer of sales_history (seeding, the API, manual SQL) updates the rollup
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_insert AFTER INSERT ON sales_history
+        WHEN NEW.sku IS NOT NULL AND NEW.sale_date IS NOT NULL
+        BEGIN
+            INSERT INTO daily_sales (sku, sale_date, qty_sold, txn_count)
+            VALUES (NEW.sku, NEW.sale_date, COALESCE(NEW.qty_sold, 0), 1)
+            ON CONFLICT (sku, sale_date) DO UPDATE SET
+                qty_sold = qty_sold + excluded.qty_sold,
+                txn_count = txn_count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_delete AFTER DELETE ON sales_history
+        BEGIN
+            UPDATE daily_sales SET
+                qty_sold = qty_sold - COALESCE(OLD.qty_sold, 0),
+                txn_count = txn_count - 1
+            WHERE sku = OLD.sku AND sale_date = OLD.sale_date;
+            DELETE FROM daily_sales WHERE sku = OLD.sku AND sale_date = OLD.sale_date AND txn_count <= 0;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_update AFTER UPDATE OF sku, qty_sold, sale_date ON sales_history
+        BEGIN
+            UPDATE daily_sales SET
+                qty_sold = qty_sold - COALESCE(OLD.qty_sold, 0),
+                txn_count = txn_count - 1
+            WHERE sku = OLD.sku AND sale_date = OLD.sale_date;
+            DELETE FROM daily_sales WHERE sku = OLD.sku AND sale_date = OLD.sale_date AND txn_count <= 0;
+            INSERT INTO daily_sales (sku, sale_date, qty_sold, txn_count)
+            SELECT NEW.sku, NEW.sale_date, COALESCE(NEW.qty_sold, 0), 1
+            WHERE NEW.sku IS NOT NULL AND NEW.sale_date IS NOT NULL
+            ON CONFLICT (sku, sale_date) DO UPDATE SET
+                qty_sold = qty_sold + excluded.qty_sold,
+                txn_count = txn_count + 1;
+        END
+        ''',
+    ]),
+    (5, "Stock reservation ledger (one row per dispatched order)", [
+        '''
+        CREATE TABLE IF NOT EXISTS stock_reservations (
+            order_id TEXT PRIMARY KEY,
+            sku TEXT NOT NULL,
+            qty INTEGER NOT NULL CHECK (qty > 0),
+            stock_after INTEGER NOT NULL CHECK (stock_after >= 0),
+            reserved_at TEXT NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES customer_orders(order_id),
+            FOREIGN KEY (sku) REFERENCES products(sku)
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_reservations_sku ON stock_reservations (sku, reserved_at)",
+    ]),
+    (6, "Persisted ID sequences (order IDs are allocated in blocks)", [
+        '''
+        CREATE TABLE IF NOT EXISTS id_sequences (
+            name TEXT PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        init_order_sequence,
+    ]),
+    (7, "Drop the sales_history read indexes (readers use daily_sales now)", [
+        # Every reader moved to the daily_sales rollup (migration 4); on the hot
+        # POST /api/sales ingest path these were only extra B-Tree writes per row
+        "DROP INDEX IF EXISTS idx_sales_sku_date",
+        "DROP INDEX IF EXISTS idx_sales_date_sku",
+    ]),
+    (8, "Changed-days marker on daily_sales (incremental sales snapshot refresh)", CHANGES_DDL),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn=None):
+    conn = conn or get_connection()
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate():
+    """
+    Applies any pending migrations and returns the schema version.
+    Never drops or rewrites data; a no-op when the schema is current.
+    Steps are SQL strings or callables taking the connection.
+    """
+    if get_schema_version() >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+    
+    for version, description, steps in MIGRATIONS:
+        with transaction() as conn:
+            # IMMEDIATE takes the write lock first, so two processes starting at
+            # once cannot both apply the same migration
+            conn.execute("BEGIN IMMEDIATE")
+            if get_schema_version(conn) >= version:
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        print(f"[MIGRATION] Applied {version}: {description}")
+    return get_schema_version()
+
+def is_empty():
+    return get_connection().execute("SELECT 1 FROM products LIMIT 1").fetchone() is None
+
+def seed_database():
+    """
+    Replaces products, sales history and orders with the synthetic demo data set.
+    DESTRUCTIVE: only run explicitly (python database_setup.py --reseed) or on an empty DB.
+    """
+    migrate()
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        # Reset data to clean slate (schema is left alone)
+        cursor.execute("DELETE FROM stock_reservations")
+        cursor.execute("DELETE FROM sales_history")
+        cursor.execute("DELETE FROM inventory_lots")
+        cursor.execute("DELETE FROM customer_orders")
+        cursor.execute("DELETE FROM products")
+
+        # Seed initial product data
+        # Seed Synthetic Data (100+ Products)
+        import random
+        from datetime import datetime, timedelta
+
+        # Explicit Product Catalog from User Images
+        products_catalog = [
+            # Electronics
+            ('SKU001', 'Mouse (Electronics)', 349.00), ('SKU002', 'Keyboard (Electronics)', 599.00),
+            ('SKU003', 'Monitor (Electronics)', 7499.00), ('SKU004', 'Cable (Electronics)', 199.00),
+            ('SKU005', 'Charger (Electronics)', 449.00), ('SKU006', 'Headset (Electronics)', 899.00),
+            ('SKU007', 'Webcam (Electronics)', 1499.00), ('SKU008', 'Microphone (Electronics)', 599.00),
+            ('SKU009', 'Laptop Stand (Electronics)', 699.00), ('SKU010', 'USB Hub (Electronics)', 399.00),
+            ('SKU011', 'Power Bank (Electronics)', 999.00), ('SKU012', 'HDMI Adapter (Electronics)', 299.00),
+            ('SKU013', 'Router (Electronics)', 1299.00), ('SKU014', 'Switch (Electronics)', 799.00),
+            ('SKU015', 'Speaker (Electronics)', 1199.00),
+        
+            # Office
+            ('SKU016', 'Paper (Office)', 260.00), ('SKU017', 'Pen (Office)', 50.00),
+            ('SKU018', 'Stapler (Office)', 149.00), ('SKU019', 'Binder (Office)', 120.00),
+            ('SKU020', 'Folder (Office)', 25.00), ('SKU021', 'Notepad (Office)', 60.00),
+            ('SKU022', 'Desk Lamp (Office)', 799.00), ('SKU023', 'Chair (Office)', 3499.00),
+            ('SKU024', 'Whiteboard (Office)', 899.00), ('SKU025', 'Marker (Office)', 30.00),
+            ('SKU026', 'Highlighter (Office)', 25.00), ('SKU027', 'Scissors (Office)', 129.00),
+            ('SKU028', 'Tape (Office)', 49.00), ('SKU029', 'Calculator (Office)', 399.00),
+            ('SKU030', 'Shredder (Office)', 2499.00),
+
+            # Kitchen
+            ('SKU031', 'Mug (Kitchen)', 149.00), ('SKU032', 'Plate (Kitchen)', 199.00),
+            ('SKU033', 'Fork (Kitchen)', 249.00), ('SKU034', 'Spoon (Kitchen)', 249.00),
+            ('SKU035', 'Knife (Kitchen)', 299.00), ('SKU036', 'Bowl (Kitchen)', 99.00),
+            ('SKU037', 'Glass (Kitchen)', 399.00), ('SKU038', 'Napkin (Kitchen)', 79.00),
+            ('SKU039', 'Towel (Kitchen)', 149.00), ('SKU040', 'Soap (Kitchen)', 89.00),
+            ('SKU041', 'Sponge (Kitchen)', 49.00), ('SKU042', 'Toaster (Kitchen)', 1199.00),
+            ('SKU043', 'Blender (Kitchen)', 1499.00), ('SKU044', 'Mixer (Kitchen)', 2899.00),
+            ('SKU045', 'Kettle (Kitchen)', 799.00),
+
+            # Automotive
+            ('SKU046', 'Wiper Blade (Automotive)', 349.00), ('SKU047', 'Car Wax (Automotive)', 399.00),
+            ('SKU048', 'Air Freshener (Automotive)', 199.00), ('SKU049', 'Oil Filter (Automotive)', 249.00),
+            ('SKU050', 'Tire shine (Automotive)', 299.00), ('SKU051', 'Seat Cover (Automotive)', 899.00),
+            ('SKU052', 'Phone Mount (Automotive)', 349.00), ('SKU053', 'Vacuum (Automotive)', 999.00),
+            ('SKU054', 'Jump Starter (Automotive)', 3999.00), ('SKU055', 'First Aid Kit (Automotive)', 499.00),
+
+            # Gardening
+            ('SKU056', 'Shovel (Gardening)', 499.00), ('SKU057', 'Rake (Gardening)', 399.00),
+            ('SKU058', 'Gloves (Gardening)', 149.00), ('SKU059', 'Hose (Gardening)', 599.00),
+            ('SKU060', 'Sprinkler (Gardening)', 349.00), ('SKU061', 'Pot (Gardening)', 199.00),
+            ('SKU062', 'Seeds (Gardening)', 99.00), ('SKU063', 'Fertilizer (Gardening)', 249.00),
+            ('SKU064', 'Pruner (Gardening)', 399.00), ('SKU065', 'Trowel (Gardening)', 129.00),
+        ]
+
+        # Additional Toys (Randomized as no image data provided)
+        toys = ['Action Figure', 'Doll', 'Puzzle', 'Board Game', 'Card Game', 'Blocks', 'Plush', 'Drone', 'Car Model', 'Train Set']
+        sku_start = 66
+        for i, toy in enumerate(toys):
+            sku = f"SKU{sku_start + i:03d}"
+            products_catalog.append((sku, f"{toy} (Toys)", round(random.uniform(100.0, 5000.0), 2)))
+
+        products_data = []
+        sales_data = []
     
-    # Seed Customer Orders
-    orders_data = []
-    statuses = ['PENDING', 'SHIPPED', 'BLOCKED']
-    # Weighted statuses: mostly SHIPPED
-    status_weights = [0.2, 0.7, 0.1] 
+        for sku, name, cost in products_catalog:
+            # Randomize stock/lead time, but keep price exact
+            stock = random.randint(5, 500) 
+            lead = random.randint(2, 21)
+        
+            products_data.append((sku, name, stock, lead, cost))
+        
+            # Generate sales history
+            daily_demand = random.randint(0, 10)
+            start_date = datetime.now()
+            for i in range(15): 
+                date_str = (start_date - timedelta(days=i)).strftime('%Y-%m-%d')
+                qty = max(0, daily_demand + random.randint(-3, 5)) 
+                if qty > 0:
+                    sales_data.append((sku, qty, date_str))
+
+        cursor.executemany('INSERT OR IGNORE INTO products VALUES (?,?,?,?,?)', products_data)
+        cursor.executemany('INSERT INTO sales_history (sku, qty_sold, sale_date) VALUES (?,?,?)', sales_data)
+
+        # Seed initial sales data (to test prediction)
+        # SKU001 (Milk): High sales (10/day), huge stock (150). Days left = 15.
+        sample_sales = [
+            ('SKU001', 10, '2023-10-01'), ('SKU001', 10, '2023-10-02'),
+            ('SKU002', 1, '2023-10-01'), ('SKU002', 1, '2023-10-02')
+        ]
+        cursor.executemany('INSERT INTO sales_history (sku, qty_sold, sale_date) VALUES (?,?,?)', sample_sales)
+
+        # Seed Customer Orders
+        orders_data = []
+        statuses = ['PENDING', 'SHIPPED', 'BLOCKED']
+        # Weighted statuses: mostly SHIPPED
+        status_weights = [0.2, 0.7, 0.1] 
     
-    order_counter = 1001
-    for sku, name, _, _, cost in products_data:
-        # Generate 5-20 orders per product
-        num_orders = random.randint(5, 20)
-        for _ in range(num_orders):
-            order_id = f"ORD-{order_counter}"
-            tier = random.choices([1, 2, 3], weights=[0.6, 0.3, 0.1])[0] 
+        order_counter = 1001
+        for sku, name, _, _, cost in products_data:
+            # Generate 5-20 orders per product
+            num_orders = random.randint(5, 20)
+            for _ in range(num_orders):
+                order_id = format_order_id(order_counter)
+                tier = random.choices([1, 2, 3], weights=[0.6, 0.3, 0.1])[0] 
             
-            days_ago = random.randint(0, 30)
-            order_date = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d')
+                days_ago = random.randint(0, 30)
+                order_date = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d')
             
-            qty = random.randint(1, 10)
-            total_amount = round(qty * cost, 2)
-            status = random.choices(statuses, weights=status_weights)[0]
+                qty = random.randint(1, 10)
+                total_amount = round(qty * cost, 2)
+                status = random.choices(statuses, weights=status_weights)[0]
             
-            # Now inserting 'total_amount' as well
-            orders_data.append((order_id, tier, order_date, sku, name, qty, total_amount, status))
-            order_counter += 1
+                # Now inserting 'total_amount' as well
+                orders_data.append((order_id, tier, order_date, sku, name, qty, total_amount, status))
+                order_counter += 1
             
-    cursor.executemany('INSERT OR IGNORE INTO customer_orders VALUES (?,?,?,?,?,?,?,?)', orders_data)
+        cursor.executemany('INSERT OR IGNORE INTO customer_orders VALUES (?,?,?,?,?,?,?,?)', orders_data)
+        # Orders allocated from now on continue after the seeded ones
+        init_order_sequence(conn)
+
+    print("Database 'pirs_warehouse.db' seeded with demo data.")
 
-    conn.commit()
-    conn.close()
-    print("Database 'pirs_warehouse.db' initialized successfully!")
+def setup_database(reseed=False):
+    """
+    Brings the schema up to date. Demo data is only generated when the
+    database has no products yet, or when `reseed` is set.
+    """
+    migrate()
+    if reseed or is_empty():
+        seed_database()
+    print(f"Database 'pirs_warehouse.db' ready (schema v{get_schema_version()}).")
 
 if __name__ == "__main__":
-    setup_database()
\ No newline at end of file
+    # python database_setup.py           -> migrate, seed only an empty database
+    # python database_setup.py --reseed  -> wipe and regenerate the demo data
+    setup_database(reseed="--reseed" in sys.argv[1:])
@@ -0,0 +1,99 @@
+"""
+In-process publish/subscribe bus for pushing changes to dashboards (SSE).
+
+Writers (ShippingQueue / BlockedQueue / ProductCatalog listeners) call
+publish() from any thread; every open /api/events/stream connection owns an
+asyncio.Queue on the event loop and is woken with call_soon_threadsafe, so an
+idle dashboard costs one parked coroutine and no polling.
+
+Data Structure: Hash Set of subscribers, each with a bounded FIFO queue.
+Complexity: O(S) publish (S = open streams), O(1) per delivered event.
+
+A subscriber that falls MAX_PENDING events behind is not allowed to grow
+without bound: its queue is cleared and it receives a single 'resync' event
+telling the client to refetch a full snapshot.
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+
+MAX_PENDING = 256 # Buffered events per stream before it is told to resync
+HEARTBEAT_SECONDS = 15 # Comment line that keeps proxies from closing idle streams
+
+
+class Subscriber:
+    def __init__(self, loop, topics=None):
+        self.loop = loop
+        self.topics = set(topics) if topics else None # None = everything
+        self.queue = asyncio.Queue()
+        self.lagged = False
+
+    def wants(self, topic):
+        return self.topics is None or topic in self.topics
+
+    def _deliver(self, event):
+        # Runs on the event loop thread
+        if self.lagged:
+            return
+        if self.queue.qsize() >= MAX_PENDING:
+            self.lagged = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'id': event['id'], 'topic': 'resync', 'data': {}})
+            return
+        self.queue.put_nowait(event)
+
+
+class EventBus:
+    def __init__(self):
+        self.subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, topics=None):
+        """Registers a stream; must be called from the event loop."""
+        sub = Subscriber(asyncio.get_running_loop(), topics)
+        with self._lock:
+            self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self.subscribers.discard(sub)
+
+    def publish(self, topic, data):
+        """Thread-safe. Returns immediately when nobody is listening."""
+        if not self.subscribers:
+            return
+        event = {'id': next(self._ids), 'topic': topic, 'data': data}
+        with self._lock:
+            targets = [sub for sub in self.subscribers if sub.wants(topic)]
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._deliver, event)
+            except RuntimeError:
+                self.unsubscribe(sub) # Loop already closed
+
+    async def stream(self, sub):
+        """
+        Async generator of SSE frames for one subscriber.
+        Lagged subscribers get their 'resync' frame and then resume normal delivery.
+        """
+        try:
+            yield f"retry: 3000\nevent: hello\ndata: {json.dumps({'time': time.time()})}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event['topic'] == 'resync':
+                    sub.lagged = False
+                yield f"id: {event['id']}\nevent: {event['topic']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+
+event_bus = EventBus()
@@ -1,4 +1,364 @@
+import bisect
 import heapq
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class IndexedHeap:
+    """
+    Binary Max-Heap with an order_id -> entry index (default ShippingQueue backend).
+    
+    Entries are lists [-score, entry_count, seq, order]: heapq is a Min-Heap,
+    so the NEGATIVE score puts the highest priority at the root and
+    entry_count keeps FIFO order among equal scores (seq is a unique tie-breaker
+    so the order dicts are never compared).
+    
+    Removal uses lazy deletion: the entry is looked up through the index and
+    turned into a tombstone (order = None) in O(1); pop skips tombstones, and
+    the array is compacted once tombstones outnumber live entries.
+    Complexity: O(log N) push / pop, O(1) remove, O(log N) re-prioritize,
+                O(1) lookup by id
+    """
+    COMPACT_MIN_TOMBSTONES = 64
+
+    def __init__(self):
+        self.heap = [] # List used as a Binary Heap (may contain tombstones)
+        self.entries = {} # Hash Map: order_id -> live heap entry
+        self.tombstones = 0
+        self.seq = 0
+
+    def _discard(self, entry):
+        entry[3] = None
+        self.tombstones += 1
+        if self.tombstones > self.COMPACT_MIN_TOMBSTONES and self.tombstones > len(self.entries):
+            # Periodic compaction: O(N) rebuild, amortized O(1) per removal
+            self.heap = [e for e in self.heap if e[3] is not None]
+            heapq.heapify(self.heap)
+            self.tombstones = 0
+
+    def push(self, score, entry_count, order):
+        entry = [-score, entry_count, self.seq, order]
+        self.seq += 1
+        self.entries[order['order_id']] = entry
+        heapq.heappush(self.heap, entry)
+
+    def push_many(self, items):
+        """
+        Bulk insert of (score, entry_count, order) items.
+        A large batch is appended and the array re-heapified once, O(N + M),
+        instead of M sifts of O(log N); small batches still use heappush.
+        """
+        new_entries = []
+        for score, entry_count, order in items:
+            entry = [-score, entry_count, self.seq, order]
+            self.seq += 1
+            self.entries[order['order_id']] = entry
+            new_entries.append(entry)
+        
+        heap = self.heap
+        total = len(heap) + len(new_entries)
+        if len(new_entries) * max(1, total.bit_length()) > total:
+            heap.extend(new_entries)
+            heapq.heapify(heap)
+        else:
+            for entry in new_entries:
+                heapq.heappush(heap, entry)
+
+    def pop(self):
+        heap = self.heap
+        while heap:
+            entry = heapq.heappop(heap)
+            order = entry[3]
+            if order is None:
+                self.tombstones -= 1
+                continue
+            del self.entries[order['order_id']]
+            return order
+        return None
+
+    def remove(self, order_id):
+        entry = self.entries.pop(order_id, None)
+        if entry is None:
+            return None
+        order = entry[3]
+        self._discard(entry)
+        return order
+
+    def replace(self, order_id, score, order):
+        """Swaps in a new score/order for a queued id, keeping its entry_count."""
+        entry = self.entries.get(order_id)
+        if entry is None:
+            return False
+        if entry[0] == -score:
+            entry[3] = order # Same key: no need to move it
+            return True
+        self._discard(entry)
+        self.push(score, entry[1], order)
+        return True
+
+    def get(self, order_id):
+        entry = self.entries.get(order_id)
+        if entry is None:
+            return None
+        return entry[3]
+
+    def orders(self):
+        """All queued orders (unsorted)."""
+        return (entry[3] for entry in self.entries.values())
+
+    def sorted_orders(self):
+        """Highest priority first. O(N log N)."""
+        return [entry[3] for entry in sorted(self.entries.values())]
+
+    def __contains__(self, order_id):
+        return order_id in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class BucketQueue:
+    """
+    Bucket Priority Queue for a small set of distinct scores.
+    
+    Data Structure: Hash Map (score -> bucket) plus a Max-Heap of the
+    distinct scores, whose root is the max-bucket pointer. Buckets are keyed
+    by the real score, so float scores are never truncated together. Each
+    bucket is a FIFO deque of entries [entry_count, order]. New orders always
+    have the highest entry_count, so they append. A re-prioritized order keeps
+    its older entry_count (the same FIFO tie-break IndexedHeap uses, so both
+    backends pop in the same order). When that count is lower than the deque's
+    tail, the entry goes to a small per-bucket heap ('late') instead, and pop
+    takes whichever front has the lower count.
+    
+    Removal and re-prioritization are lazy: the entry becomes a tombstone
+    (order = None) that pop skips. A bucket is dropped once its last live
+    order goes, and its score leaves the pointer heap lazily when it reaches
+    the root. A bucket is compacted once its tombstones outnumber its live
+    entries.
+    Complexity: O(1) push (O(log S) when it opens a new score, S = distinct
+                scores; O(log m) for a re-prioritized order landing behind the
+                tail, m = such orders in the bucket), O(1) amortized pop
+                (O(log S) when the top bucket empties), O(1) remove,
+                O(1) lookup by id, O(N + S log S + m log m) sorted snapshot
+    """
+    COMPACT_MIN_TOMBSTONES = 64
+
+    def __init__(self):
+        self.buckets = {} # score -> {'fifo': deque of entries, 'late': heap of (count, serial, entry), 'live': n, 'dead': n}
+        self.levels = [] # Max-Heap (negated) of scores; may hold scores whose bucket is gone
+        self.entries = {} # Hash Map: order_id -> (score, entry)
+        self.late_serial = 0
+
+    def push(self, score, entry_count, order):
+        bucket = self.buckets.get(score)
+        if bucket is None:
+            bucket = self.buckets[score] = {'fifo': deque(), 'late': [], 'live': 0, 'dead': 0}
+            heapq.heappush(self.levels, -score)
+            if len(self.levels) > self.COMPACT_MIN_TOMBSTONES + 2 * len(self.buckets):
+                self.levels = [-live_score for live_score in self.buckets]
+                heapq.heapify(self.levels)
+        entry = [entry_count, order]
+        fifo = bucket['fifo']
+        if not fifo or entry_count > fifo[-1][0]:
+            fifo.append(entry) # New orders always land here
+        else:
+            self.late_serial += 1 # Tie-break against the tombstone of the same count
+            heapq.heappush(bucket['late'], (entry_count, self.late_serial, entry))
+        bucket['live'] += 1
+        self.entries[order['order_id']] = (score, entry)
+
+    def _discard(self, score, entry):
+        """Tombstones a queued entry (its id is already out of self.entries)."""
+        entry[1] = None
+        bucket = self.buckets[score]
+        bucket['live'] -= 1
+        bucket['dead'] += 1
+        if not bucket['live']:
+            del self.buckets[score] # Tombstones go with it
+        elif bucket['dead'] > self.COMPACT_MIN_TOMBSTONES and bucket['dead'] > bucket['live']:
+            bucket['fifo'] = deque(e for e in bucket['fifo'] if e[1] is not None)
+            bucket['late'] = [item for item in bucket['late'] if item[2][1] is not None]
+            heapq.heapify(bucket['late'])
+            bucket['dead'] = 0
+
+    def push_many(self, items):
+        """Bulk insert; pushes of new orders are already O(1) appends here."""
+        push = self.push
+        for score, entry_count, order in items:
+            push(score, entry_count, order)
+
+    def pop(self):
+        levels = self.levels
+        while levels:
+            score = -levels[0]
+            bucket = self.buckets.get(score)
+            if bucket is None:
+                heapq.heappop(levels) # Stale pointer: the bucket emptied
+                continue
+            fifo, late = bucket['fifo'], bucket['late']
+            while fifo and fifo[0][1] is None:
+                fifo.popleft()
+                bucket['dead'] -= 1
+            while late and late[0][2][1] is None:
+                heapq.heappop(late)
+                bucket['dead'] -= 1
+            if late and (not fifo or late[0][0] < fifo[0][0]):
+                entry = heapq.heappop(late)[2]
+            else:
+                entry = fifo.popleft()
+            order = entry[1]
+            del self.entries[order['order_id']]
+            bucket['live'] -= 1
+            if not bucket['live']:
+                del self.buckets[score]
+            return order
+        return None
+
+    def remove(self, order_id):
+        position = self.entries.pop(order_id, None)
+        if position is None:
+            return None
+        score, entry = position
+        order = entry[1]
+        self._discard(score, entry)
+        return order
+
+    def replace(self, order_id, score, order):
+        """Swaps in a new score/order for a queued id, keeping its entry_count."""
+        position = self.entries.get(order_id)
+        if position is None:
+            return False
+        old_score, entry = position
+        if old_score == score:
+            entry[1] = order # Keeps its place
+        else:
+            self._discard(old_score, entry)
+            self.push(score, entry[0], order)
+        return True
+
+    def get(self, order_id):
+        position = self.entries.get(order_id)
+        if position is None:
+            return None
+        return position[1][1]
+
+    def orders(self):
+        return (entry[1] for _, entry in self.entries.values())
+
+    def sorted_orders(self):
+        """Highest score first, entry_count (FIFO) order within a score."""
+        result = []
+        for score in sorted(self.buckets, reverse=True):
+            bucket = self.buckets[score]
+            fifo = (entry for entry in bucket['fifo'] if entry[1] is not None) # Already in count order
+            late = [item[2] for item in sorted(bucket['late']) if item[2][1] is not None]
+            result.extend(entry[1] for entry in heapq.merge(fifo, late))
+        return result
+
+    def __contains__(self, order_id):
+        return order_id in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class PickList:
+    """
+    Live SKU -> quantity aggregate over the pending orders, kept sorted by quantity.
+    
+    Data Structure: Hash Map (SKU -> entry) plus quantity buckets
+    (qty -> OrderedDict of SKUs) and a sorted array of the distinct totals.
+    Adding or removing an order moves one SKU between two buckets; the sorted
+    array only changes (bisect) when a bucket appears or empties.
+    Complexity: O(1) hash work per order + O(log D) bisect (D = distinct totals <= SKUs),
+                O(k) to read the top k SKUs
+    """
+    def __init__(self):
+        self.entries = {} # Hash Map: SKU -> {'sku', 'name', 'qty', 'count'}
+        self.buckets = {} # qty total -> OrderedDict of SKUs (in the order they reached it)
+        self.levels = [] # Distinct qty totals, ascending
+
+    def _link(self, sku, qty):
+        bucket = self.buckets.get(qty)
+        if bucket is None:
+            bucket = self.buckets[qty] = OrderedDict()
+            bisect.insort(self.levels, qty)
+        bucket[sku] = None
+
+    def _unlink(self, sku, qty):
+        bucket = self.buckets[qty]
+        del bucket[sku]
+        if not bucket:
+            del self.buckets[qty]
+            del self.levels[bisect.bisect_left(self.levels, qty)]
+
+    def add(self, order):
+        sku = order.get('item_sku', 'UNKNOWN')
+        entry = self.entries.get(sku)
+        if entry is None:
+            entry = self.entries[sku] = {'sku': sku, 'name': order.get('item_name', 'Unknown Item'), 'qty': 0, 'count': 0}
+        else:
+            self._unlink(sku, entry['qty'])
+        entry['qty'] += order.get('qty', 1)
+        entry['count'] += 1
+        self._link(sku, entry['qty'])
+
+    def add_many(self, orders):
+        """Bulk add: totals are summed per SKU first, so each SKU is re-bucketed once."""
+        totals = {}
+        for order in orders:
+            sku = order.get('item_sku', 'UNKNOWN')
+            pending = totals.get(sku)
+            if pending is None:
+                totals[sku] = [order.get('item_name', 'Unknown Item'), order.get('qty', 1), 1]
+            else:
+                pending[1] += order.get('qty', 1)
+                pending[2] += 1
+        for sku, (name, qty, count) in totals.items():
+            entry = self.entries.get(sku)
+            if entry is None:
+                entry = self.entries[sku] = {'sku': sku, 'name': name, 'qty': 0, 'count': 0}
+            else:
+                self._unlink(sku, entry['qty'])
+            entry['qty'] += qty
+            entry['count'] += count
+            self._link(sku, entry['qty'])
+
+    def discard(self, order):
+        sku = order.get('item_sku', 'UNKNOWN')
+        entry = self.entries.get(sku)
+        if entry is None:
+            return
+        self._unlink(sku, entry['qty'])
+        entry['qty'] -= order.get('qty', 1)
+        entry['count'] -= 1
+        if entry['count'] <= 0:
+            del self.entries[sku]
+        else:
+            self._link(sku, entry['qty'])
+
+    def top(self, k=None):
+        """Highest quantity first (copies, safe to serialise). O(k)."""
+        result = []
+        for qty in reversed(self.levels):
+            for sku in self.buckets[qty]:
+                if k is not None and len(result) >= k:
+                    return result
+                result.append(dict(self.entries[sku]))
+        return result
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Selectable ShippingQueue backends (same API, different complexity profile)
+QUEUE_BACKENDS = {
+    'heap': IndexedHeap,
+    'bucket': BucketQueue,
+}
+
 
 class ShippingQueue:
     """
@@ -7,21 +367,57 @@ class ShippingQueue:
     1. Expiring Goods (FEFO)
     2. Premium Customers
     3. High Value Orders
+    
+    Storage is pluggable (see QUEUE_BACKENDS):
+    - 'heap'   (default): indexed binary heap, O(log N) push / pop
+    - 'bucket': one FIFO deque per distinct score, O(1) push / pop / remove
+      (plus O(log S) when a score level opens or empties, S = distinct scores)
+    Both give O(1) lookup by order_id and pop in the same order: highest score
+    first, then entry_count (arrival), which re-prioritizing never changes.
     """
-    def __init__(self):
-        self.heap = [] # List used as a Binary Heap
+    def __init__(self, backend='heap', verbose=True):
+        if backend not in QUEUE_BACKENDS:
+            raise ValueError(f"Unknown ShippingQueue backend: {backend}")
+        self.backend = backend
+        self.queue = QUEUE_BACKENDS[backend]()
         self.entry_count = 0 # Tie-breaker for stable sorting
+        self.verbose = verbose # Per-order logging; turn off for bulk loads / benchmarks
+        self.version = 0 # Bumped on every change; lets readers cache derived views
+        self._listeners = []
+        self.pick_list = PickList() # Kept in step with every add / pop / remove / update
+        # Guards the backend, pick list and counters: request threads and the
+        # sales flusher thread all change the queue. Re-entrant because add_order /
+        # update_orders_by_sku call update_order, and listeners may read the queue.
+        self._lock = threading.RLock()
 
-    def add_order(self, order_details):
+    def add_listener(self, callback):
+        """
+        Registers fn(event, order), called after every queue change ('add', 'pop', 'remove', 'update').
+        add_orders reports once per batch: 'add_batch' with the list of added orders.
+        Listeners run under the queue lock, so they see changes in order and must be quick.
+        """
+        self._listeners.append(callback)
+
+    def _changed(self, event, order):
+        self.version += 1
+        for callback in self._listeners:
+            try:
+                callback(event, order)
+            except Exception as e:
+                print(f"[MAX-HEAP] Listener error on {event}: {e}")
+
+    @staticmethod
+    def _is_pickable(order):
+        # Orders marked shipped externally stay out of the pick list
+        return order.get('status') != 'SHIPPED'
+
+    @staticmethod
+    def _calculate_priority(order_details):
         """
-        Enqueue a new order with calculated priority.
-        
         Priority Score Calculation:
         - VIP Customer: +50 points
         - Standard Customer: +0 points
         - Base: (100 - days_remaining) for urgency
-        
-        Max-Heap ensures highest priority is processed first.
         """
         # Extract factors
         tier = order_details.get('tier', 1)  # 1 = Standard, 2 = VIP
@@ -41,80 +437,231 @@ class ShippingQueue:
         priority_score += (100 - days_to_expiry)
         
         # Ensure minimum score of 1
-        priority_score = max(1, priority_score)
+        return max(1, priority_score), priority_reason
+
+    def add_order(self, order_details):
+        """
+        Enqueue a new order with calculated priority.
         
-        # Determine Status
-        status = order_details.get('status', 'PENDING')
+        Priority Score Calculation:
+        - VIP Customer: +50 points
+        - Standard Customer: +0 points
+        - Base: (100 - days_remaining) for urgency
         
-        # Python's heapq is Min-Heap, so store NEGATIVE score for Max-Heap behavior
-        # This means highest priority (largest score) will be at the top
-        heapq.heappush(self.heap, (-priority_score, self.entry_count, {**order_details, 'priority_reason': priority_reason, 'priority_score': priority_score}))
-        self.entry_count += 1
+        Max-Heap ensures highest priority is processed first.
+        Re-adding an order_id that is already queued updates it in place.
+        """
+        order_id = order_details['order_id']
+        with self._lock:
+            if order_id in self.queue:
+                self.update_order(order_id, order_details)
+                return
+            
+            priority_score, priority_reason = self._calculate_priority(order_details)
+            # queue_seq = arrival order, lets delta-sync clients sort (-priority_score, queue_seq)
+            order = {**order_details, 'priority_reason': priority_reason, 'priority_score': priority_score, 'queue_seq': self.entry_count}
+            self.queue.push(priority_score, self.entry_count, order)
+            self.entry_count += 1
+            if self._is_pickable(order):
+                self.pick_list.add(order)
+            self._changed('add', order)
+        
+        if self.verbose:
+            print(f"[MAX-HEAP] Order added: {order_id} | Tier: {priority_reason} | Score: {priority_score}")
+
+    def add_orders(self, orders):
+        """
+        Bulk enqueue (EDI batches, startup hydration).
+        Scores every order, then merges them into the backend in one push_many
+        (a single heapify for large batches), then notifies listeners and logs once
+        for the whole batch instead of once per order.
+        Order ids that are already queued (or repeated in the batch) are updated in place.
+        """
+        items = []
+        updates = []
+        batch_ids = set()
+        with self._lock:
+            for order_details in orders:
+                order_id = order_details['order_id']
+                if order_id in self.queue or order_id in batch_ids:
+                    updates.append(order_details)
+                    continue
+                batch_ids.add(order_id)
+                priority_score, priority_reason = self._calculate_priority(order_details)
+                order = {**order_details, 'priority_reason': priority_reason, 'priority_score': priority_score, 'queue_seq': self.entry_count}
+                items.append((priority_score, self.entry_count, order))
+                self.entry_count += 1
+            
+            self.queue.push_many(items)
+            self.pick_list.add_many(order for _, _, order in items if self._is_pickable(order))
+            if items:
+                self._changed('add_batch', [order for _, _, order in items])
+            for order_details in updates:
+                self.update_order(order_details['order_id'], order_details)
         
-        print(f"[MAX-HEAP] Order added: {order_details['order_id']} | Tier: {priority_reason} | Score: {priority_score}")
+        if self.verbose:
+            print(f"[MAX-HEAP] Batch added: {len(items)} orders ({len(updates)} updated in place)")
+        return len(items)
 
     def process_next_order(self):
         """Dequeue the highest priority order."""
-        if not self.heap:
-            return None
-        
-        priority, _, order = heapq.heappop(self.heap)
-        return order
+        with self._lock:
+            order = self.queue.pop()
+            if order is not None:
+                if self._is_pickable(order):
+                    self.pick_list.discard(order)
+                self._changed('pop', order)
+            return order
         
     def remove_order(self, order_id):
         """
         Removes an order by ID (e.g. when manually dispatched).
-        Rebuilds the heap, which is O(N).
+        Uses the backend's id index: O(1) (tombstone in the heap, bucket delete).
         """
-        initial_len = len(self.heap)
-        self.heap = [item for item in self.heap if item[2]['order_id'] != order_id]
-        heapq.heapify(self.heap)
+        with self._lock:
+            order = self.queue.remove(order_id)
+            if order is None:
+                return False
+            if self._is_pickable(order):
+                self.pick_list.discard(order)
+            self._changed('remove', order)
         
-        if len(self.heap) < initial_len:
+        if self.verbose:
             print(f"[REMOVED] Order {order_id} removed manually.")
-            return True
-        return False
+        return True
+
+    def update_order(self, order_id, changes):
+        """
+        Merges `changes` into a queued order and re-prioritizes it (decrease/increase-key).
+        Returns False if the order is not queued.
+        """
+        with self._lock:
+            order = self.queue.get(order_id)
+            if order is None:
+                return False
+            
+            updated = {**order, **changes}
+            priority_score, priority_reason = self._calculate_priority(updated)
+            updated['priority_score'] = priority_score
+            updated['priority_reason'] = priority_reason
+            replaced = self.queue.replace(order_id, priority_score, updated)
+            if self._is_pickable(order):
+                self.pick_list.discard(order)
+            if self._is_pickable(updated):
+                self.pick_list.add(updated)
+            self._changed('update', updated)
+            return replaced
+
+    def update_orders_by_sku(self, changes_by_sku):
+        """
+        Merges `changes_by_sku[sku]` into every queued order for that SKU and
+        re-prioritizes the ones that actually change.
+        One O(N) pass over the queue no matter how many SKUs are in the batch;
+        the lock is held for the whole pass, so request threads adding or
+        removing orders wait instead of mutating the backend mid-iteration.
+        Returns the number of orders updated.
+        """
+        with self._lock:
+            targets = []
+            for order in self.queue.orders():
+                changes = changes_by_sku.get(order.get('item_sku'))
+                if changes and any(order.get(field) != value for field, value in changes.items()):
+                    targets.append((order['order_id'], changes))
+            for order_id, changes in targets:
+                self.update_order(order_id, changes)
+            return len(targets)
+
+    def get_order(self, order_id):
+        """O(1) lookup of a queued order by id, or None."""
+        with self._lock:
+            return self.queue.get(order_id)
+
+    def __contains__(self, order_id):
+        with self._lock:
+            return order_id in self.queue
+
+    def __len__(self):
+        with self._lock:
+            return len(self.queue)
     
     def get_queue_status(self):
         # Return sorted list for viewing without popping
-        # Heap elements are tuples: (-score, entry_count, order_details)
-        # We sort by the tuple itself, which naturally sorts by -score (ascending), so largest score comes first in absolute terms
+        # Highest priority first; ties keep arrival (FIFO) order
         
-        # Verify status against DB logic or filtering
-        # Since this is an in-memory queue, we should filter out any that might have been marked shipped externally if not removed
-        # But properly, we'll just return what's in the heap.
-        # The issue is likely that populated_queues loaded everything including SHIPPED, or they aren't being removed.
-        
-        sorted_heap = sorted(self.heap)
-        raw_list = [item[2] for item in sorted_heap if item[2].get('status') != 'SHIPPED']
-        return raw_list
+        # Since this is an in-memory queue, filter out any that might have been marked shipped externally if not removed
+        with self._lock:
+            return [order for order in self.queue.sorted_orders() if order.get('status') != 'SHIPPED']
 
-    def get_optimized_pick_list(self):
+    def get_optimized_pick_list(self, limit=None):
         """
-        Aggregates pending orders into a single Pick List using a Hash Map.
-        O(N) operation to traverse the heap.
+        Aggregated Pick List (SKU -> total qty, number of orders), highest qty first.
+        Maintained incrementally by the queue operations (see PickList), so this is
+        O(k) for the top `limit` SKUs instead of a walk over every pending order.
         """
-        pick_map = {} # Hash Map: SKU -> Quantity
-        
-        for _, _, order in self.heap:
-            if order.get('status') == 'SHIPPED':
-                continue # Skip shipped orders in the pick list too
-                
-            sku = order.get('item_sku', 'UNKNOWN')
-            qty = order.get('qty', 1)
-            name = order.get('item_name', 'Unknown Item')
-            
-            if sku in pick_map:
-                pick_map[sku]['qty'] += qty
-            else:
-                pick_map[sku] = {
-                    'sku': sku, 
-                    'name': name, 
-                    'qty': qty,
-                    'count': 1
-                }
-                
-        return sorted(list(pick_map.values()), key=lambda x: x['qty'], reverse=True)
+        with self._lock:
+            return self.pick_list.top(limit)
+
+
+class ChangeLog:
+    """
+    Versioned log of recent changes for delta sync (`?since=<version>`).
+    
+    Data Structure: bounded deque (ring buffer) of (version, kind, key), oldest first.
+    Versions start at the process start time in microseconds, so a version a
+    client got from a previous server process is always older than anything
+    this one hands out (and forces a full snapshot instead of a wrong delta).
+    Complexity: O(1) record, O(k) record_many / changes_since for k keys / changes
+    """
+    def __init__(self, max_entries=5000):
+        self.entries = deque(maxlen=max_entries)
+        self.version = time.time_ns() // 1000
+        self.base_version = self.version # Nothing older than this can be replayed
+        self._lock = threading.Lock() # Writers come from several API worker threads
+
+    def record(self, kind, key):
+        with self._lock:
+            self.version += 1
+            if len(self.entries) == self.entries.maxlen:
+                # The oldest entry falls off: clients behind it need a full snapshot
+                self.base_version = self.entries[0][0]
+            self.entries.append((self.version, kind, key))
+            return self.version
+
+    def record_many(self, kind, keys):
+        """Records a batch under one version: O(k) for k keys, one lock round-trip."""
+        keys = list(keys)
+        with self._lock:
+            self.version += 1
+            dropped = len(self.entries) + len(keys) - self.entries.maxlen
+            if dropped > len(self.entries):
+                # Part of the batch itself falls off: only this version can be replayed
+                self.base_version = self.version
+            elif dropped > 0:
+                self.base_version = self.entries[dropped - 1][0]
+            self.entries.extend((self.version, kind, key) for key in keys)
+            return self.version
+
+    def reset(self):
+        """Invalidates every outstanding version (e.g. after a full reload)."""
+        with self._lock:
+            self.version += 1
+            self.entries.clear()
+            self.base_version = self.version
+
+    def changes_since(self, since):
+        """
+        Returns {kind: set(keys)} changed after `since`, or None when `since`
+        is too old (or from the future) to be answered from the log.
+        """
+        with self._lock:
+            if since < self.base_version or since > self.version:
+                return None
+            changes = {}
+            for version, kind, key in reversed(self.entries):
+                if version <= since:
+                    break
+                changes.setdefault(kind, set()).add(key)
+            return changes
 
 
 class BlockedQueue:
@@ -123,21 +670,57 @@ class BlockedQueue:
     """
     def __init__(self):
         self.blocked_orders = []
+        self.version = 0 # Bumped on every change
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """
+        Registers fn(event, order), called after every change ('block', 'resolve').
+        add_blocked_orders reports once per batch: 'block_batch' with the list of orders.
+        """
+        self._listeners.append(callback)
+
+    def _changed(self, event, order):
+        self.version += 1
+        for callback in self._listeners:
+            try:
+                callback(event, order)
+            except Exception as e:
+                print(f"[BLOCKED] Listener error on {event}: {e}")
 
     def add_blocked_order(self, order_details, reason):
-        self.blocked_orders.append({
+        order = {
             **order_details,
             'blocked_reason': reason,
             'status': 'BLOCKED'
-        })
+        }
+        self.blocked_orders.append(order)
+        self._changed('block', order)
         print(f"[BLOCKED] Order {order_details['order_id']} blocked: {reason}")
 
+    def add_blocked_orders(self, orders, reason):
+        """Bulk version of add_blocked_order (startup hydration): one change event and log line for the batch."""
+        batch = [
+            {
+                **order_details,
+                'blocked_reason': reason,
+                'status': 'BLOCKED'
+            }
+            for order_details in orders
+        ]
+        self.blocked_orders.extend(batch)
+        if batch:
+            self._changed('block_batch', batch)
+        print(f"[BLOCKED] {len(batch)} orders loaded as blocked: {reason}")
+        return len(batch)
+
     def get_blocked_list(self):
         return self.blocked_orders
 
     def resolve_order(self, order_id):
         # In a real app, this would re-validate and move to ShippingQueue
         self.blocked_orders = [o for o in self.blocked_orders if o['order_id'] != order_id]
+        self._changed('resolve', {'order_id': order_id})
         print(f"[RESOLVED] Blocked order {order_id} resolved/removed.")
 
 
@@ -149,10 +732,12 @@ class SafetyCheck:
     def __init__(self):
         # In a real app, this would load from a database (inventory_lots table)
         self.blocked_lots = set()
+        self.version = 0 # Bumped on every change
 
     def add_blocked_lot(self, lot_id):
         """Adds a lot number to the blacklist (recalled/expired)."""
         self.blocked_lots.add(lot_id)
+        self.version += 1
 
     def is_lot_safe(self, lot_id):
         """O(1) check if a lot is safe to ship."""
@@ -0,0 +1,231 @@
+"""
+Vectorized demand forecasting (NumPy).
+
+Sales are loaded once into a dense SKU x day matrix (one row per SKU, one
+column per day of the trailing window, zero-filled for days without sales).
+Every statistic is then a whole-matrix operation instead of a Python loop
+per SKU:
+- short / long moving averages: column slices + mean over axis 1
+- simple exponential smoothing: one matrix-vector product with the
+  closed-form smoothing weights
+- days of cover: stock / demand rate, element-wise
+
+Data Structure: Hash Map (SKU -> row index) over NumPy arrays.
+Complexity: O(S x D) fit in a handful of vectorized passes (S = SKUs,
+            D = window days), O(1) days-of-cover lookup per SKU.
+"""
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+from data_ingestion import get_daily_sales
+from sales_snapshot import from_day
+
+WINDOW_DAYS = 56 # Trailing days of history loaded into the matrix
+SHORT_WINDOW = 7 # Moving average that reacts to spikes
+LONG_WINDOW = 28 # Moving average that shows the trend
+SMOOTHING_ALPHA = 0.1 # Exponential smoothing factor (~19 day memory)
+NO_SALES_DAYS = 999 # Cover reported for SKUs without demand
+
+
+def smoothing_weights(days, alpha=SMOOTHING_ALPHA):
+    """
+    Weights w such that matrix @ w equals the final level of simple
+    exponential smoothing (level_0 = x_0, level_t = a*x_t + (1-a)*level_t-1)
+    run over each row.
+    """
+    decay = (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+    weights = alpha * decay
+    if days:
+        weights[0] = decay[0] # The first observation seeds the level
+    return weights
+
+
+def forecast_matrix(matrix, alpha=SMOOTHING_ALPHA, short_window=SHORT_WINDOW, long_window=LONG_WINDOW):
+    """
+    Demand statistics for every row of a SKU x day matrix (oldest day first).
+    Returns a dict of 1-D arrays: ma_short, ma_long, smoothed, rate.
+    The rate used for cover is the higher of the smoothed level and the short
+    average, so a recent spike shortens cover straight away.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    days = matrix.shape[1]
+    ma_short = matrix[:, -short_window:].mean(axis=1) if days else np.zeros(len(matrix))
+    ma_long = matrix[:, -long_window:].mean(axis=1) if days else np.zeros(len(matrix))
+    smoothed = matrix @ smoothing_weights(days, alpha).astype(np.float32)
+    return {
+        'ma_short': ma_short,
+        'ma_long': ma_long,
+        'smoothed': smoothed,
+        'rate': np.maximum(smoothed, ma_short),
+    }
+
+
+def days_of_cover(stock, rate):
+    """Element-wise stock / rate, NO_SALES_DAYS where there is no demand (capped there too)."""
+    stock = np.asarray(stock, dtype=np.float64)
+    rate = np.asarray(rate, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(rate > 0, stock / rate, NO_SALES_DAYS)
+    return np.minimum(np.maximum(cover, 0), NO_SALES_DAYS)
+
+
+class DemandForecast:
+    """
+    Long-lived per-SKU demand rates, refit from sales history in one pass.
+    Stock moves far more often than sales, so only the rates are cached and
+    days of cover is computed from the current stock on every lookup.
+    """
+    def __init__(self, window_days=WINDOW_DAYS, alpha=SMOOTHING_ALPHA):
+        self.window_days = window_days
+        self.alpha = alpha
+        self.skus = [] # Row order of the arrays below
+        self.index = {} # Hash Map: SKU -> row
+        self.end_date = None # Last day of the window (latest sale on record)
+        self.matrix = np.zeros((0, window_days), dtype=np.float32) # Window kept for add_sales()
+        self.stats = forecast_matrix(self.matrix, alpha)
+        self.version = 0 # Bumped on every refit; part of the read ETags
+        self._version_lock = threading.Lock()
+
+    def fit(self, skus, matrix, end_date=None):
+        """
+        Replaces the rates with ones computed from a SKU x day matrix (rows follow `skus`).
+        The forecast keeps the matrix (no copy when it is already float32) for add_sales().
+        """
+        matrix = np.asarray(matrix, dtype=np.float32)
+        stats = forecast_matrix(matrix, self.alpha)
+        skus = list(skus)
+        if skus != self.skus:
+            # Building the hash map costs more than the maths; refits over the same SKUs reuse it
+            self.index = {sku: row for row, sku in enumerate(skus)}
+            self.skus = skus
+        self.matrix = matrix
+        self.stats = stats
+        self.end_date = end_date
+        self.bump_version()
+        return self
+
+    def bump_version(self):
+        """Moves `version` on (thread-safe). Returns the new version."""
+        with self._version_lock:
+            self.version += 1
+            return self.version
+
+    def add_sales(self, sales, bump_version=True):
+        """
+        Folds new (sku, qty, sale_date) sales into the kept window and refits
+        only the SKUs they touch, O(k x D) for k SKUs instead of a rescan of
+        history. A sale dated after the window slides it forward (every SKU's
+        window changes, so that refit covers all rows); sales older than the
+        window are ignored.
+        Pass bump_version=False to call bump_version() yourself once the views
+        derived from the rates are updated too.
+        Returns the set of SKUs whose forecast changed.
+        """
+        if not sales:
+            return set()
+        days = self.window_days
+        sale_days = [date.fromisoformat(str(sale_date)[:10]) for _, _, sale_date in sales]
+        newest = max(sale_days)
+        end = date.fromisoformat(self.end_date[:10]) if self.end_date else newest
+        refit_all = False
+        
+        if newest > end:
+            shift = (newest - end).days
+            if shift >= days:
+                self.matrix[:] = 0
+            else:
+                self.matrix[:, :-shift] = self.matrix[:, shift:]
+                self.matrix[:, -shift:] = 0
+            end = newest
+            self.end_date = end.isoformat()
+            refit_all = True
+        
+        # New SKUs get rows now but only become visible in the index once their
+        # stats exist (readers on other threads look up index -> stats)
+        new_rows = {}
+        for sku, _, _ in sales:
+            if sku not in self.index and sku not in new_rows:
+                new_rows[sku] = len(self.skus) + len(new_rows)
+        if new_rows:
+            self.matrix = np.vstack([self.matrix, np.zeros((len(new_rows), days), dtype=np.float32)])
+            refit_all = True
+        
+        rows = np.fromiter((self.index.get(sku, new_rows.get(sku)) for sku, _, _ in sales), dtype=np.int64, count=len(sales))
+        cols = np.fromiter(((day - end).days + days - 1 for day in sale_days), dtype=np.int64, count=len(sales))
+        qty = np.fromiter((qty or 0 for _, qty, _ in sales), dtype=np.float32, count=len(sales))
+        in_window = cols >= 0
+        np.add.at(self.matrix, (rows[in_window], cols[in_window]), qty[in_window])
+        
+        if refit_all:
+            self.stats = forecast_matrix(self.matrix, self.alpha)
+            self.skus.extend(new_rows)
+            self.index.update(new_rows)
+            touched = set(self.skus)
+        else:
+            changed = np.unique(rows[in_window])
+            for name, values in forecast_matrix(self.matrix[changed], self.alpha).items():
+                self.stats[name][changed] = values
+            touched = {self.skus[row] for row in changed}
+        if bump_version:
+            self.bump_version()
+        return touched
+
+    def load(self, skus=()):
+        """
+        Refits from the daily_sales rollup. The window ends at the latest sale
+        on record (not today), so an old data set still yields rates.
+        `skus` adds rows for products that have no sales in the window.
+        """
+        end_date, rows = get_daily_sales(self.window_days)
+        index = {sku: row for row, sku in enumerate(skus)}
+        for sku, _, _ in rows:
+            if sku not in index:
+                index[sku] = len(index)
+
+        matrix = np.zeros((len(index), self.window_days), dtype=np.float32)
+        if rows:
+            start = date.fromisoformat(end_date[:10]) - timedelta(days=self.window_days - 1)
+            day_of = {}
+            row_idx = np.empty(len(rows), dtype=np.int64)
+            col_idx = np.empty(len(rows), dtype=np.int64)
+            qty = np.empty(len(rows), dtype=np.float32)
+            for i, (sku, sale_date, total) in enumerate(rows):
+                col = day_of.get(sale_date)
+                if col is None:
+                    col = day_of[sale_date] = (date.fromisoformat(sale_date[:10]) - start).days
+                row_idx[i], col_idx[i], qty[i] = index[sku], col, total or 0
+            np.add.at(matrix, (row_idx, col_idx), qty)
+
+        self.fit(list(index), matrix, end_date)
+        print(f"[FORECAST] Fitted {len(index)} SKUs over {self.window_days} days ending {end_date}")
+        return self
+
+    def load_snapshot(self, snapshot):
+        """
+        Refits from a memory-mapped SalesSnapshot (see sales_snapshot.py): the
+        window matrix is scattered straight out of the column files, no SQL.
+        """
+        end_day = snapshot.last_day
+        self.fit(snapshot.skus, snapshot.window_matrix(self.window_days, end_day),
+                 from_day(end_day) if end_day is not None else None)
+        return self
+
+    def rate_of(self, sku):
+        """Forecast units per day (0.0 for unknown SKUs)."""
+        row = self.index.get(sku)
+        return 0.0 if row is None else float(self.stats['rate'][row])
+
+    def days_of_cover(self, sku, stock):
+        """Days until `stock` runs out at the forecast rate. O(1)."""
+        rate = self.rate_of(sku)
+        if rate <= 0:
+            return NO_SALES_DAYS
+        return min(NO_SALES_DAYS, max(0.0, stock / rate))
+
+    def days_of_cover_many(self, skus, stocks):
+        """Vectorized days_of_cover for aligned sequences of SKUs and stock levels."""
+        rows = np.fromiter((self.index.get(sku, -1) for sku in skus), dtype=np.int64, count=len(skus))
+        rates = np.where(rows >= 0, self.stats['rate'][rows] if len(self.index) else 0, 0)
+        return days_of_cover(stocks, rates)
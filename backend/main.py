@@ -5,7 +5,7 @@ from data_ingestion import get_product_lookup
 from prioritization import build_reorder_heap
 from floor_operations import ShippingQueue, SafetyCheck
 from reporting import InventoryBST, AuditList
-from prediction_engine import calculate_priority_score
+from prediction_engine import calculate_priority_scores, load_forecast
 
 def main_simulation():
     print("Welcome to PIRS - Inventory Management & Reorder System")
@@ -14,10 +14,11 @@ def main_simulation():
     # 1. Initialize System
     print("\n[PHASE 1] System Initialization...")
     setup_database()
+    forecast = load_forecast() # One refresh + fit, shared by every phase below
     
     # 2. Check Predictions & Prioritize (Min-Heap)
     print("\n[PHASE 2] Analyzing Stockouts & Prioritizing Reorders...")
-    reorder_heap = build_reorder_heap()
+    reorder_heap = build_reorder_heap(forecast)
     
     if reorder_heap:
         print(f" > Found {len(reorder_heap)} items to track.")
@@ -56,9 +57,9 @@ def main_simulation():
     products = get_product_lookup()
     bst_report = InventoryBST()
     print(" > Building Stability Tree...")
+    scores = calculate_priority_scores(forecast, products)
     for sku in products:
-        score = calculate_priority_score(sku)
-        bst_report.insert(score, sku, products[sku]['name'])
+        bst_report.insert(scores[sku], sku, products[sku]['name'])
         
     bst_report.get_stability_report()
     
@@ -1,15 +1,36 @@
-from data_ingestion import get_product_lookup, get_sales_array
+from data_ingestion import get_product_lookup
+from forecasting import DemandForecast, NO_SALES_DAYS
+from sales_snapshot import refresh_snapshot
 
-def calculate_priority_score(sku):
+NO_SALES_SCORE = NO_SALES_DAYS # No sales yet, low priority
+
+def load_forecast():
+    """
+    Brings the columnar sales snapshot up to date (changed days only) and fits
+    a forecast from its memmap. This writes to disk and refits every SKU, so it
+    belongs at startup or in a batch job, never on a per-request read path;
+    the API keeps one long-lived forecast (api.demand_forecast) instead.
+    """
+    return DemandForecast().load_snapshot(refresh_snapshot())
+
+def calculate_priority_scores(forecast, products=None):
+    """
+    Batched scoring engine: scores every SKU in a single vectorized pass.
+
+    Score = days of cover (current stock / forecast daily demand) from an
+    already fitted NumPy demand forecast (see load_forecast()). Pure read:
+    no sales history is scanned and nothing is refitted here.
+    Returns: dict { sku: days_remaining_score }
+    Complexity: O(N) for N SKUs
+    """
+    if products is None:
+        products = get_product_lookup()
+
+    skus = list(products)
+    cover = forecast.days_of_cover_many(skus, [products[sku]['stock'] for sku in skus])
+    return {sku: round(float(days), 2) for sku, days in zip(skus, cover)}
+
+def calculate_priority_score(sku, forecast):
+    """Single-SKU wrapper around the batched engine. O(1)."""
     products = get_product_lookup()
-    sales = get_sales_array(sku)
-    
-    if not sales: return 999 # No sales yet, low priority
-    
-    # Calculate Average Daily Sales
-    avg_sales = sum(sales) / len(sales)
-    current_stock = products[sku]['stock']
-    
-    # Days Remaining = Stock / Demand
-    days_remaining = current_stock / avg_sales
-    return round(days_remaining, 2)
\ No newline at end of file
+    return calculate_priority_scores(forecast, {sku: products[sku]})[sku]
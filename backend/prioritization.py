@@ -1,14 +1,12 @@
 import heapq
-from data_ingestion import get_product_lookup
-from prediction_engine import calculate_priority_score
+from prediction_engine import calculate_priority_scores
 
-def build_reorder_heap():
-    products = get_product_lookup()
-    priority_heap = []
+def build_reorder_heap(forecast):
+    scores = calculate_priority_scores(forecast)
     
-    for sku in products.keys():
-        score = calculate_priority_score(sku)
-        # We push (score, sku) so the Heap sorts by the lowest score (most urgent)
-        heapq.heappush(priority_heap, (score, sku))
+    # We store (score, sku) so the Heap sorts by the lowest score (most urgent)
+    # Building the array in one pass and heapifying is O(N) instead of N pushes
+    priority_heap = [(score, sku) for sku, score in scores.items()]
+    heapq.heapify(priority_heap)
         
-    return priority_heap
\ No newline at end of file
+    return priority_heap
@@ -0,0 +1,456 @@
+"""
+Background PDF report jobs.
+
+Rendering the executive report (reportlab layout) is CPU bound, so it runs in
+a process pool instead of on an API worker thread. The API process only
+gathers a small summary of its in-memory state (cheap) and ships it to a
+worker, which returns the PDF bytes.
+
+Finished PDFs are cached by content address: the key is a hash of the
+language plus the versions of the data the report is built from, so an
+unchanged report is served straight from memory and concurrent requests for
+the same report share a single render.
+
+Data Structure: Hash Map (job_id -> job) + LRU Hash Map (cache key -> PDF bytes)
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+REPORT_WORKERS = int(os.environ.get('PIRS_REPORT_WORKERS', '2'))
+REPORT_CACHE_SIZE = 32 # Finished PDFs kept in memory
+MAX_TRACKED_JOBS = 256 # Oldest finished jobs are forgotten beyond this
+
+# --- TRANSLATIONS ---
+TRANSLATIONS = {
+    "en": {
+        "title": "PIRS Executive Report",
+        "generated": "Generated",
+        "exec_snapshot": "1. Executive Snapshot",
+        "snapshot_data": {
+            "total_val": "Total Inventory Value",
+            "pending_val": "Pending Order Value",
+            "health_score": "System Health Score",
+            "audit_prog": "Audit Progress",
+            "healthy": "Healthy",
+            "verified": "Verified"
+        },
+        "critical_alerts": "2. Critical Reorder Alerts (Min-Heap)",
+        "critical_desc": "Actionable items required to prevent stockouts.",
+        "reorder_cols": ["Product Name", "Current Stock", "Days Left", "Recommendation"],
+        "days_suffix": "Days",
+        "critical": "Critical",
+        "warning": "Warning",
+        "buy": "Buy",
+        "units": "Units",
+        "no_critical": "No critical reorders needed.",
+        "shipment_status": "3. Shipment & Fulfillment Status",
+        "ready": "Ready to Dispatch",
+        "at_risk": "At-Risk / VIP Shipments",
+        "blocked": "Blocked / Stockouts",
+        "orders_suffix": "Orders",
+        "inventory_stability": "4. Inventory Stability Analysis (BST)",
+        "stable_stock": "Stable Stock (> 15 Days)",
+        "overstocked": "Overstocked Items (Potential Dead Stock)",
+        "col_product": "Product",
+        "col_days_held": "Days Held",
+        "col_val_tied": "Value Tied Up",
+        "no_overstock": "No significant overstock detected.",
+        "safety_log": "5. Safety & Quality Log",
+        "interventions": "Interventions: System blocked {} attempted shipments of problematic goods.",
+        "lot_warning": "Lot Expiry Warning: Lot #LOT-EXP-202X expires in 2 days. 15 units remaining."
+    },
+    "hi": {
+        "title": "PIRS कार्यकारी रिपोर्ट",
+        "generated": "जेनरेट किया गया",
+        "exec_snapshot": "1. कार्यकारी सारांश (Executive Snapshot)",
+        "snapshot_data": {
+            "total_val": "कुल इन्वेंटरी मूल्य",
+            "pending_val": "लंबित ऑर्डर मूल्य",
+            "health_score": "सिस्टम हेल्थ स्कोर",
+            "audit_prog": "ऑडिट प्रगति",
+            "healthy": "स्वस्थ",
+            "verified": "सत्यापित"
+        },
+        "critical_alerts": "2. महत्वपूर्ण पुनः क्रय अलर्ट (Min-Heap)",
+        "critical_desc": "स्टॉकआउट को रोकने के लिए आवश्यक कार्रवाई योग्य आइटम।",
+        "reorder_cols": ["उत्पाद का नाम", "वर्तमान स्टॉक", "शेष दिन", "सिफारिश"],
+        "days_suffix": "दिन",
+        "critical": "महत्वपूर्ण",
+        "warning": "चेतावनी",
+        "buy": "खरीदें",
+        "units": "इकाइलियाँ",
+        "no_critical": "कोई महत्वपूर्ण पुनः क्रय की आवश्यकता नहीं है।",
+        "shipment_status": "3. शिपमेंट और पूर्ति स्थिति",
+        "ready": "डिस्पैच के लिए तैयार",
+        "at_risk": "जोखिम / VIP शिपमेंट",
+        "blocked": "अवरुद्ध / स्टॉकआउट",
+        "orders_suffix": "ऑर्डर",
+        "inventory_stability": "4. इन्वेंटरी स्थिरता विश्लेषण (BST)",
+        "stable_stock": "स्थिर स्टॉक (> 15 दिन)",
+        "overstocked": "अधिक स्टॉक वाले आइटम (संभावित डेड स्टॉक)",
+        "col_product": "उत्पाद",
+        "col_days_held": "दिन",
+        "col_val_tied": "मूल्य फंसा हुआ",
+        "no_overstock": "कोई महत्वपूर्ण ओवरस्टॉक नहीं मिला।",
+        "safety_log": "5. सुरक्षा और गुणवत्ता लॉग",
+        "interventions": "हस्तक्षेप: सिस्टम ने समस्याग्रस्त सामानों के {} प्रयास किए गए शिपमेंट को अवरुद्ध कर दिया।",
+        "lot_warning": "लॉट समाप्ति चेतावनी: लॉट #LOT-EXP-202X 2 दिनों में समाप्त हो रहा है। 15 इकाइयाँ शेष हैं।"
+    },
+    "kn": {
+         "title": "PIRS ಕಾರ್ಯನಿರ್ವಾಹಕ ವರದಿ",
+        "generated": "ರಚಿಸಲಾಗಿದೆ",
+        "exec_snapshot": "1. ಕಾರ್ಯನಿರ್ವಾಹಕ ಸಾರಾಂಶ (Executive Snapshot)",
+        "snapshot_data": {
+            "total_val": "ಒಟ್ಟು ದಾಸ್ತಾನು ಮೌಲ್ಯ",
+            "pending_val": "ಬಾಕಿ ಇರುವ ಆರ್ಡರ್ ಮೌಲ್ಯ",
+            "health_score": "ಸಿಸ್ಟಮ್ ಆರೋಗ್ಯ ಸ್ಕೋರ್",
+            "audit_prog": "ಆಡಿಟ್ ಪ್ರಗತಿ",
+            "healthy": "ಆರೋಗ್ಯಕರ",
+            "verified": "ಪರಿಶೀಲಿಸಲಾಗಿದೆ"
+        },
+        "critical_alerts": "2. ನಿರ್ಣಾಯಕ ಮರು-ಆರ್ಡರ್ ಎಚ್ಚರಿಕೆಗಳು (Min-Heap)",
+        "critical_desc": "ಸ್ಟಾಕ್‌ಔಟ್‌ಗಳನ್ನು ತಡೆಯಲು ಅಗತ್ಯವಿರುವ ಕ್ರಮ ಕೈಗೊಳ್ಳಬಹುದಾದ ಐಟಂಗಳು.",
+        "reorder_cols": ["ಉತ್ಪನ್ನದ ಹೆಸರು", "ಪ್ರಸ್ತುತ ಸ್ಟಾಕ್", "ಉಳಿದ ದಿನಗಳು", "ಶಿಫಾರಸು"],
+        "days_suffix": "ದಿನಗಳು",
+        "critical": "ನಿರ್ಣಾಯಕ",
+        "warning": "ಎಚ್ಚರಿಕೆ",
+        "buy": "ಖರೀದಿಸಿ",
+        "units": "ಘಟಕಗಳು",
+        "no_critical": "ಯಾವುದೇ ನಿರ್ಣಾಯಕ ಮರು-ಆರ್ಡರ್‌ಗಳ ಅಗತ್ಯವಿಲ್ಲ.",
+        "shipment_status": "3. ಸಾಗಣೆ ಮತ್ತು ಪೂರೈಕೆ ಸ್ಥಿತಿ",
+        "ready": "ರವಾನೆಗೆ ಸಿದ್ಧವಾಗಿದೆ",
+        "at_risk": "ಅಪಾಯದಲ್ಲಿರುವ / VIP ಸಾಗಣೆಗಳು",
+        "blocked": "ನಿರ್ಬಂಧಿಸಲಾಗಿದೆ / ಸ್ಟಾಕ್‌ಔಟ್‌ಗಳು",
+        "orders_suffix": "ಆರ್ಡರ್‌ಗಳು",
+        "inventory_stability": "4. ದಾಸ್ತಾನು ಸ್ಥಿರತೆ ವಿಶ್ಲೇಷಣೆ (BST)",
+        "stable_stock": "ಸ್ಥಿರ ಸ್ಟಾಕ್ (> 15 ದಿನಗಳು)",
+        "overstocked": "ಹೆಚ್ಚು ಸ್ಟಾಕ್ ಇರುವ ಐಟಂಗಳು",
+        "col_product": "ಉತ್ಪನ್ನ",
+        "col_days_held": "ದಿನಗಳು",
+        "col_val_tied": "ಮೌಲ್ಯ",
+        "no_overstock": "ಯಾವುದೇ ಪ್ರಮುಖ ಓವರ್‌ಸ್ಟಾಕ್ ಕಂಡುಬಂದಿಲ್ಲ.",
+        "safety_log": "5. ಸುರಕ್ಷತೆ ಮತ್ತು ಗುಣಮಟ್ಟ ಲಾಗ್",
+        "interventions": "ಹಸ್ತಕ್ಷೇಪಗಳು: ಸಮಸ್ಯಾತ್ಮಕ ಸರಕುಗಳ {} ಪ್ರಯತ್ನಿಸಿದ ಸಾಗಣೆಗಳನ್ನು ಸಿಸ್ಟಮ್ ನಿರ್ಬಂಧಿಸಿದೆ.",
+        "lot_warning": "ಲಾಟ್ ಮುಕ್ತಾಯ ಎಚ್ಚರಿಕೆ: ಲಾಟ್ #LOT-EXP-202X 2 ದಿನಗಳಲ್ಲಿ ಮುಕ್ತಾಯಗೊಳ್ಳುತ್ತದೆ. 15 ಘಟಕಗಳು ಉಳಿದಿವೆ."
+    }
+}
+
+_font_name = None
+
+def _report_font():
+    """Registers a font that supports Indian languages once per worker process."""
+    global _font_name
+    if _font_name is None:
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.pdfbase import pdfmetrics
+        # Nirmala UI is standard on Windows 10/11
+        _font_name = "Helvetica" # Default fallback
+        try:
+            pdfmetrics.registerFont(TTFont('Nirmala', 'C:\\Windows\\Fonts\\Nirmala.ttf'))
+            _font_name = "Nirmala"
+        except Exception as e:
+            print(f"Warning: Could not load Nirmala font: {e}")
+    return _font_name
+
+def render_report_pdf(lang, data):
+    """
+    Lays out the executive report and returns the PDF bytes.
+    Runs inside a pool worker: `data` is the plain summary built by the API
+    (see gather_report_data in api.py), never live objects.
+    """
+    import io
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+
+    font_name = _report_font()
+
+    # Fallback to English if lang not found
+    ctx = TRANSLATIONS.get(lang, TRANSLATIONS["en"])
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    elements = []
+    
+    styles = getSampleStyleSheet()
+    # Define styles with the correct font
+    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontName=font_name, fontSize=18, spaceAfter=6, textColor=colors.darkblue)
+    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Heading2'], fontName=font_name, fontSize=14, spaceBefore=12, spaceAfter=6, textColor=colors.teal)
+    normal_style = ParagraphStyle('Normal_Custom', parent=styles['Normal'], fontName=font_name)
+    highlight_style = ParagraphStyle('Highlight', parent=styles['Normal'], fontName=font_name, textColor=colors.firebrick)
+    
+    # Style for tables needs to be updated too
+    def get_table_style(is_header=False):
+        s = [
+            ('FONTNAME', (0,0), (-1,-1), font_name if not is_header else f'{font_name}'), 
+        ]
+        if is_header:
+            s.append(('FONTNAME', (0,0), (-1,0), font_name)) # Bold not available in standard Nirmala load without extra work, so sticky to Regular
+        return s
+
+    # HEADER
+    elements.append(Paragraph(ctx["title"], title_style))
+    elements.append(Paragraph(f"{ctx['generated']}: {data['generated_at']}", normal_style))
+    elements.append(Spacer(1, 12))
+
+    # SECTION 1: EXECUTIVE SNAPSHOT
+    elements.append(Paragraph(ctx["exec_snapshot"], subtitle_style))
+    
+    total_items = data['total_items'] or 1
+    health_score = int(((total_items - data['critical_items_count']) / total_items) * 100)
+    audit_progress = f"{data['audit_progress_pct']}% {ctx['snapshot_data']['verified']}"
+
+    snapshot_data = [
+        [ctx['snapshot_data']['total_val'], f"INR {data['total_inventory_value']:,.2f}"],
+        [ctx['snapshot_data']['pending_val'], f"INR {data['pending_value']:,.2f}"],
+        [ctx['snapshot_data']['health_score'], f"{health_score}% {ctx['snapshot_data']['healthy']}"],
+        [ctx['snapshot_data']['audit_prog'], audit_progress]
+    ]
+    
+    t_snap = Table(snapshot_data, colWidths=[200, 200])
+    tbl_style_cmds = [
+        ('BACKGROUND', (0,0), (-1,-1), colors.aliceblue),
+        ('GRID', (0,0), (-1,-1), 1, colors.white),
+        ('ALIGN', (1,0), (1,-1), 'RIGHT'),
+        ('PADDING', (0,0), (-1,-1), 8),
+    ]
+    tbl_style_cmds.extend(get_table_style(is_header=True))
+    t_snap.setStyle(TableStyle(tbl_style_cmds))
+    elements.append(t_snap)
+    elements.append(Spacer(1, 12))
+
+    # SECTION 2: CRITICAL REORDER ALERTS (Min-Heap)
+    elements.append(Paragraph(ctx["critical_alerts"], subtitle_style))
+    elements.append(Paragraph(ctx["critical_desc"], normal_style))
+    elements.append(Spacer(1, 6))
+
+    reorder_data = [ctx["reorder_cols"]]
+    for row in data['reorder_rows']:
+        days_left = row['days_left']
+        rec = f"{ctx['buy']} {max(10, int(row['stock']*0.5))} {ctx['units']}"
+        status = f"({ctx['critical']})" if days_left < 3 else f"({ctx['warning']})"
+        
+        reorder_data.append([
+            row['name'][:25],
+            str(row['stock']),
+            f"{days_left} {ctx['days_suffix']} {status}",
+            rec
+        ])
+
+    if len(reorder_data) > 1:
+        t_reorder = Table(reorder_data, colWidths=[180, 80, 120, 120])
+        reorder_style_cmds = [
+            ('BACKGROUND', (0,0), (-1,0), colors.firebrick),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.white]),
+        ]
+        reorder_style_cmds.extend(get_table_style(is_header=True))
+        t_reorder.setStyle(TableStyle(reorder_style_cmds))
+        elements.append(t_reorder)
+    else:
+        elements.append(Paragraph(ctx["no_critical"], normal_style))
+    elements.append(Spacer(1, 12))
+
+    # SECTION 3: SHIPMENT & FULFILLMENT (Priority Queue)
+    elements.append(Paragraph(ctx["shipment_status"], subtitle_style))
+    
+    elements.append(Paragraph(f"<b>{ctx['ready']}:</b> {data['ready_count']} {ctx['orders_suffix']}", normal_style))
+    elements.append(Paragraph(f"<b>{ctx['at_risk']}:</b> {data['at_risk_count']} {ctx['orders_suffix']}", normal_style))
+    elements.append(Paragraph(f"<b>{ctx['blocked']}:</b> {data['blocked_count']} {ctx['orders_suffix']}", highlight_style))
+    
+    if data['blocked_summary']:
+        block_summary = []
+        for order_id, reason in data['blocked_summary']:
+            block_summary.append(f"• {order_id}: {reason}")
+        elements.append(Paragraph("<br/>".join(block_summary), ParagraphStyle('bullets', leftIndent=20, parent=normal_style, fontName=font_name)))
+    elements.append(Spacer(1, 12))
+
+    # SECTION 4: INVENTORY STABILITY (BST)
+    elements.append(Paragraph(ctx["inventory_stability"], subtitle_style))
+    
+    stable_pct = int((data['stable_count'] / total_items) * 100)
+    
+    elements.append(Paragraph(f"<b>{ctx['stable_stock']}:</b> {stable_pct}% of SKUs.", normal_style))
+    
+    if data['overstocked_items']:
+        elements.append(Spacer(1, 4))
+        elements.append(Paragraph(f"<b>{ctx['overstocked']}:</b>", normal_style))
+        over_data = [[ctx["col_product"], ctx["col_days_held"], ctx["col_val_tied"]]]
+        for item in data['overstocked_items']:
+             over_data.append([item['name'], f"{item['days']} {ctx['days_suffix']}", f"INR {item['value']}"])
+        
+        t_over = Table(over_data, colWidths=[200, 100, 100])
+        over_style_cmds = [
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+        ]
+        over_style_cmds.extend(get_table_style(is_header=True))
+        t_over.setStyle(TableStyle(over_style_cmds))
+        elements.append(t_over)
+    else:
+        elements.append(Paragraph(ctx["no_overstock"], normal_style))
+    elements.append(Spacer(1, 12))
+
+    # SECTION 5: SAFETY LOG
+    elements.append(Paragraph(ctx["safety_log"], subtitle_style))
+    elements.append(Paragraph(ctx["interventions"].format(data['blocked_count']), normal_style))
+    elements.append(Paragraph(ctx["lot_warning"], highlight_style))
+    
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def report_cache_key(lang, data_version):
+    """Content address of a report: language + the versions of its inputs."""
+    lang = lang if lang in TRANSLATIONS else "en"
+    raw = f"{lang}|{'|'.join(str(v) for v in data_version)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ReportJobManager:
+    """
+    Submits report renders to a process pool and tracks them by job_id.
+    
+    - submit(): O(1). Returns a finished job straight away on a cache hit and
+      reuses the in-flight job when the same report is already rendering.
+    - wait(): long-poll on the job's 'finished' Event without holding any lock.
+    The pool is created lazily so importing the API never forks workers.
+    Workers are spawned, not forked: a fork would copy the API process with
+    its threads mid-flight (locks held by SSE/queue threads stay locked in
+    the child) and its open SQLite connections. render_report_pdf only needs
+    its arguments, so a fresh interpreter is enough.
+    """
+    def __init__(self, max_workers=REPORT_WORKERS, cache_size=REPORT_CACHE_SIZE):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.cache = OrderedDict() # LRU: cache key -> PDF bytes
+        self.jobs = OrderedDict() # job_id -> job dict (insertion order = age)
+        self.in_flight = {} # cache key -> job_id currently rendering
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _track(self, job):
+        self.jobs[job['job_id']] = job
+        while len(self.jobs) > MAX_TRACKED_JOBS:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if oldest['status'] in ('queued', 'running'):
+                break # Never forget a job that is still rendering
+            del self.jobs[oldest_id]
+
+    def cached(self, key):
+        """Returns cached PDF bytes for `key` (marking it recently used), or None."""
+        with self._lock:
+            pdf = self.cache.get(key)
+            if pdf is not None:
+                self.cache.move_to_end(key)
+            return pdf
+
+    def submit(self, lang, data_version, gather):
+        """
+        Returns the job for (lang, data_version).
+        `gather` is only called on a cache miss; it builds the picklable summary
+        that is sent to the worker.
+        """
+        key = report_cache_key(lang, data_version)
+        with self._lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                job = self._new_job(key, lang, 'done', cached=True)
+                job['finished'].set()
+                self._track(job)
+                return job
+            job_id = self.in_flight.get(key)
+            if job_id is not None:
+                return self.jobs[job_id]
+
+            # Visible to other requests before its future exists: they wait on
+            # job['finished'], which is set once the render succeeds or fails
+            job = self._new_job(key, lang, 'queued')
+            self.in_flight[key] = job['job_id']
+            self._track(job)
+
+        try:
+            future = self._pool().submit(render_report_pdf, lang, gather())
+        except Exception as e:
+            with self._lock:
+                self.in_flight.pop(key, None)
+                job['status'] = 'failed'
+                job['error'] = str(e)
+                job['finished'].set()
+            return job
+
+        with self._lock:
+            job['future'] = future
+            if job['status'] == 'queued':
+                job['status'] = 'running'
+        future.add_done_callback(lambda f, job=job: self._finish(job, f))
+        return job
+
+    @staticmethod
+    def _new_job(key, lang, status, cached=False):
+        return {'job_id': uuid.uuid4().hex, 'key': key, 'lang': lang, 'status': status, 'cached': cached,
+                'error': None, 'future': None, 'finished': threading.Event()}
+
+    def _finish(self, job, future):
+        """Done callback: records the outcome, then wakes every wait() on the job."""
+        with self._lock:
+            self.in_flight.pop(job['key'], None)
+            error = future.exception()
+            if error is not None:
+                job['status'] = 'failed'
+                job['error'] = str(error)
+                print(f"[REPORT] Job {job['job_id']} failed: {error}")
+            else:
+                self.cache[job['key']] = future.result()
+                self.cache.move_to_end(job['key'])
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+                job['status'] = 'done'
+        job['finished'].set()
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def wait(self, job, timeout):
+        """
+        Blocks up to `timeout` seconds until the job is done or failed. Works
+        for a job that another request is still gathering data for (no future
+        yet). Returns the job.
+        """
+        job['finished'].wait(timeout)
+        return job
+
+    def result(self, job):
+        """PDF bytes of a finished job (None if not done or evicted)."""
+        if job['status'] != 'done':
+            return None
+        return self.cached(job['key'])
+
+    def describe(self, job):
+        return {
+            "job_id": job['job_id'],
+            "lang": job['lang'],
+            "status": job['status'],
+            "cached": job['cached'],
+            "error": job['error'],
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -5,6 +5,8 @@ class BSTNode:
         self.product_name = product_name
         self.left = None
         self.right = None
+        self.height = 1 # Used by AVLInventoryBST for balancing
+        self.size = 1 # Number of nodes in this subtree (order-statistics augmentation)
 
 class InventoryBST:
     """
@@ -12,6 +14,10 @@ class InventoryBST:
     Allows manager to see:
     - Left side: Critical items (Low days)
     - Right side: Stable items (High days)
+    
+    Every node also stores its subtree size, which turns the tree into an
+    order-statistics tree: range search in O(height + k), and rank / count-below /
+    k-th item in O(height) without traversing the whole catalog.
     """
     def __init__(self):
         self.root = None
@@ -24,6 +30,7 @@ class InventoryBST:
         
         current = self.root
         while True:
+            current.size += 1 # new_node will end up somewhere below current
             if days_remaining < current.days_remaining:
                 if current.left is None:
                     current.left = new_node
@@ -36,28 +43,133 @@ class InventoryBST:
                 current = current.right
 
     def in_order_traversal(self, node, result=None):
-        """Returns list of products from lowest days (critical) to highest (stable)."""
+        """
+        Returns list of products from lowest days (critical) to highest (stable).
+        Iterative (explicit stack), so a degenerate tree cannot hit the recursion limit.
+        """
         if result is None:
             result = []
-        
-        if node:
-            self.in_order_traversal(node.left, result)
-            # Check if product_name is dict (from API patch) or str
-            name_val = node.product_name['name'] if isinstance(node.product_name, dict) else node.product_name
-            stock_val = node.product_name['stock'] if isinstance(node.product_name, dict) else 0
-            price_val = node.product_name['price'] if isinstance(node.product_name, dict) else 0.0
-
-            result.append({
+        result.extend(self.iter_in_order(node))
+        return result
+
+    def iter_in_order(self, node=None):
+        """
+        Generator version of in_order_traversal: yields one item at a time from
+        lowest to highest days, starting at `node` (default: the root).
+        Memory is O(height) and the caller can stop early at any point.
+        """
+        if node is None:
+            node = self.root
+        stack = []
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield self._node_to_item(node)
+            node = node.right
+
+    @staticmethod
+    def _node_to_item(node):
+        details = node.product_name
+        # product_name is either the product dict (from the API) or a plain name
+        if isinstance(details, dict):
+            return {
                 "sku": node.sku,
-                "name": name_val,
-                "stock_hint": stock_val, # Added this field
-                "price": price_val,
+                "name": details['name'],
+                "stock_hint": details['stock'],
+                "price": details['price'],
                 "days_remaining": node.days_remaining
-            })
-            self.in_order_traversal(node.right, result)
-        
+            }
+        return {
+            "sku": node.sku,
+            "name": details,
+            "stock_hint": 0,
+            "price": 0.0,
+            "days_remaining": node.days_remaining
+        }
+
+    def _iter_range(self, low=None, high=None, high_inclusive=True):
+        """
+        Yields nodes with low <= days_remaining <= high (or < high) in sorted order.
+        Subtrees entirely below `low` are skipped and the walk stops at the first
+        node past `high`, so the cost is O(height + k) for k results.
+        """
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                if low is not None and node.days_remaining < low:
+                    node = node.right # Whole left subtree is below the range
+                else:
+                    stack.append(node)
+                    node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            days = node.days_remaining
+            if high is not None and (days > high or (days == high and not high_inclusive)):
+                return
+            yield node
+            node = node.right
+
+    def range_search(self, min_days=None, max_days=None, limit=None):
+        """
+        Items with min_days <= days_remaining <= max_days, most critical first.
+        Either bound may be None (open). O(log N + k) on a balanced tree.
+        """
+        result = []
+        for node in self._iter_range(min_days, max_days):
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(self._node_to_item(node))
         return result
 
+    def items_below(self, days):
+        """Items with days_remaining strictly less than `days`. O(log N + k)."""
+        return [self._node_to_item(node) for node in self._iter_range(None, days, high_inclusive=False)]
+
+    @staticmethod
+    def _size(node):
+        return node.size if node else 0
+
+    def count_below(self, days, inclusive=False):
+        """
+        Rank query: how many items have days_remaining < days (<= if inclusive).
+        Uses subtree sizes, so it is O(height) and never visits the items.
+        """
+        count = 0
+        node = self.root
+        while node:
+            if node.days_remaining < days or (inclusive and node.days_remaining == days):
+                count += 1 + self._size(node.left)
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def count_range(self, min_days=None, max_days=None):
+        """Number of items with min_days <= days_remaining <= max_days. O(height)."""
+        upper = self._size(self.root) if max_days is None else self.count_below(max_days, inclusive=True)
+        lower = 0 if min_days is None else self.count_below(min_days)
+        return max(0, upper - lower)
+
+    def kth_most_critical(self, k):
+        """Returns the k-th (1-based) item in ascending days_remaining order, or None. O(height)."""
+        node = self.root
+        if k < 1 or k > self._size(node):
+            return None
+        while node:
+            left_size = self._size(node.left)
+            if k <= left_size:
+                node = node.left
+            elif k == left_size + 1:
+                return self._node_to_item(node)
+            else:
+                k -= left_size + 1
+                node = node.right
+        return None
+
     def get_stability_report(self):
         print("\n--- INVENTORY STABILITY REPORT (BST SORTED) ---")
         items = self.in_order_traversal(self.root)
@@ -98,32 +210,277 @@ class InventoryBST:
         }
 
 
+class AVLInventoryBST(InventoryBST):
+    """
+    Self-balancing (AVL) variant of the stability tree, meant to be long-lived.
+    
+    Sorted or clustered days_remaining values turn the plain BST into a linked
+    list (O(N) per insert, O(N^2) to build). The AVL tree rotates on every
+    insert/delete so its height stays O(log N).
+    
+    Nodes are ordered by (days_remaining, sku) so every product has a unique
+    key, and `nodes` (Hash Map: sku -> node) finds a product's current key in
+    O(1), which is what makes delete / update-key possible.
+    Complexity: O(log N) insert / delete / update, O(N) bulk build from scratch
+    """
+    def __init__(self):
+        super().__init__()
+        self.nodes = {} # Hash Map: SKU -> BSTNode
+
+    # --- AVL helpers ---
+
+    @staticmethod
+    def _height(node):
+        return node.height if node else 0
+
+    def _refresh(self, node):
+        node.height = 1 + max(self._height(node.left), self._height(node.right))
+        node.size = 1 + self._size(node.left) + self._size(node.right)
+
+    def _rotate_right(self, node):
+        pivot = node.left
+        node.left = pivot.right
+        pivot.right = node
+        self._refresh(node)
+        self._refresh(pivot)
+        return pivot
+
+    def _rotate_left(self, node):
+        pivot = node.right
+        node.right = pivot.left
+        pivot.left = node
+        self._refresh(node)
+        self._refresh(pivot)
+        return pivot
+
+    def _rebalance(self, node):
+        self._refresh(node)
+        balance = self._height(node.left) - self._height(node.right)
+        if balance > 1:
+            if self._height(node.left.left) < self._height(node.left.right):
+                node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance < -1:
+            if self._height(node.right.right) < self._height(node.right.left):
+                node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+
+    @staticmethod
+    def _key(node):
+        return (node.days_remaining, node.sku)
+
+    def _insert_node(self, node, new_node):
+        if node is None:
+            return new_node
+        if self._key(new_node) < self._key(node):
+            node.left = self._insert_node(node.left, new_node)
+        else:
+            node.right = self._insert_node(node.right, new_node)
+        return self._rebalance(node)
+
+    def _delete_key(self, node, key):
+        if node is None:
+            return None
+        node_key = self._key(node)
+        if key < node_key:
+            node.left = self._delete_key(node.left, key)
+        elif key > node_key:
+            node.right = self._delete_key(node.right, key)
+        else:
+            if node.left is None:
+                return node.right
+            if node.right is None:
+                return node.left
+            # Two children: splice in the in-order successor
+            successor = node.right
+            while successor.left:
+                successor = successor.left
+            node.right = self._delete_key(node.right, self._key(successor))
+            successor.left = node.left
+            successor.right = node.right
+            node = successor
+        return self._rebalance(node)
+
+    # --- Public API ---
+
+    def insert(self, days_remaining, sku, product_name):
+        """Inserts a product, or moves it if the SKU is already indexed. O(log N)."""
+        if sku in self.nodes:
+            self.update(sku, days_remaining, product_name)
+            return
+        new_node = BSTNode(days_remaining, sku, product_name)
+        self.nodes[sku] = new_node
+        self.root = self._insert_node(self.root, new_node)
+
+    def delete(self, sku):
+        """Removes a product by SKU. O(log N)."""
+        node = self.nodes.pop(sku, None)
+        if node is None:
+            return False
+        self.root = self._delete_key(self.root, self._key(node))
+        return True
+
+    def update(self, sku, days_remaining, product_name=None):
+        """
+        Update-key: re-positions a product whose days_remaining changed.
+        Payload-only changes (same days) are done in place. O(log N).
+        """
+        node = self.nodes.get(sku)
+        if node is None:
+            if product_name is None:
+                return False
+            self.insert(days_remaining, sku, product_name)
+            return True
+        if product_name is None:
+            product_name = node.product_name
+        if node.days_remaining == days_remaining:
+            node.product_name = product_name
+            return True
+        self.delete(sku)
+        self.insert(days_remaining, sku, product_name)
+        return True
+
+    def range_after(self, after=None, min_days=None, max_days=None, limit=None, max_exclusive=False):
+        """
+        Resumable range search: like range_search, but only returns items whose
+        (days_remaining, sku) key is greater than `after` (a key taken from the
+        last item of a previous page). Lets callers page through the tree in
+        chunks without holding it locked between pages. O(log N + k) per page.
+        """
+        result = []
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                key = self._key(node)
+                if (after is not None and key <= after) or (min_days is not None and node.days_remaining < min_days):
+                    node = node.right # Whole left subtree is before the start key
+                else:
+                    stack.append(node)
+                    node = node.left
+            if not stack:
+                break
+            node = stack.pop()
+            days = node.days_remaining
+            if max_days is not None and (days > max_days or (days == max_days and max_exclusive)):
+                break
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(self._node_to_item(node))
+            node = node.right
+        return result
+
+    def build(self, items):
+        """
+        Replaces the whole tree from (days_remaining, sku, product_name) tuples.
+        Sorts once and links a perfectly balanced tree: O(N log N) sort + O(N) build.
+        """
+        ordered = sorted(items, key=lambda item: (item[0], item[1]))
+        self.nodes = {}
+
+        def link(lo, hi):
+            if lo > hi:
+                return None
+            mid = (lo + hi) // 2
+            days_remaining, sku, product_name = ordered[mid]
+            node = BSTNode(days_remaining, sku, product_name)
+            self.nodes[sku] = node
+            node.left = link(lo, mid - 1)
+            node.right = link(mid + 1, hi)
+            self._refresh(node)
+            return node
+
+        self.root = link(0, len(ordered) - 1)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, sku):
+        return sku in self.nodes
+
+
 class AuditNode:
     def __init__(self, sku):
         self.sku = sku
         self.next = None
+        self.prev = None
 
 class AuditList:
     """
     Circular Linked List for ongoing warehouse audits.
     Ensures no shelf is forgotten; workers just cycle through the list forever.
+    
+    Doubly linked with a tail pointer and a Hash Map (sku -> node), so adding
+    a location, removing one, and jumping the cursor to a saved position are
+    all O(1) instead of walking the ring.
     """
     def __init__(self):
         self.head = None
+        self.tail = None
         self.current_audit = None # Pointer to the item currently being checked
+        self.nodes = {} # Hash Map: SKU -> AuditNode
 
     def add_product(self, sku):
+        """Appends a location at the end of the rotation (just before head). O(1)."""
+        if sku in self.nodes:
+            return
         new_node = AuditNode(sku)
+        self.nodes[sku] = new_node
         if not self.head:
             self.head = new_node
-            self.head.next = self.head # Points to itself (Circular)
+            self.tail = new_node
+            new_node.next = new_node # Points to itself (Circular)
+            new_node.prev = new_node
             self.current_audit = self.head
         else:
-            temp = self.head
-            while temp.next != self.head:
-                temp = temp.next
-            temp.next = new_node
+            new_node.prev = self.tail
             new_node.next = self.head
+            self.tail.next = new_node
+            self.head.prev = new_node
+            self.tail = new_node
+
+    def remove_product(self, sku):
+        """Unlinks a location from the ring. O(1)."""
+        node = self.nodes.pop(sku, None)
+        if node is None:
+            return False
+        if node.next is node: # Last remaining node
+            self.head = self.tail = self.current_audit = None
+            return True
+        node.prev.next = node.next
+        node.next.prev = node.prev
+        if node is self.head:
+            self.head = node.next
+        if node is self.tail:
+            self.tail = node.prev
+        if node is self.current_audit:
+            self.current_audit = node.next # Auditors carry on with the next shelf
+        return True
+
+    def seek(self, sku):
+        """Moves the cursor to `sku` (e.g. a position restored from the DB). O(1)."""
+        node = self.nodes.get(sku)
+        if node is None:
+            return False
+        self.current_audit = node
+        return True
+
+    def peek(self, count):
+        """Returns the next `count` SKUs from the cursor without moving it. O(count)."""
+        sequence = []
+        node = self.current_audit
+        for _ in range(count if node else 0):
+            sequence.append(node.sku)
+            node = node.next
+        return sequence
+
+    @property
+    def current_sku(self):
+        return self.current_audit.sku if self.current_audit else None
+
+    def __len__(self):
+        return len(self.nodes)
 
     def get_next_to_audit(self):
         """Moves the pointer to the next item and returns it."""
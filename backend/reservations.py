@@ -0,0 +1,81 @@
+"""
+Stock reservation ledger for dispatching orders.
+
+Dispatch used to read current_stock, compare it in Python and write the new
+value back, so two dispatches of the same SKU could both pass the check and
+oversell. Here each check is part of the write that depends on it:
+- the order is claimed with UPDATE ... WHERE status IS NOT 'SHIPPED', so it
+  is dispatched at most once
+- stock is taken with UPDATE ... SET current_stock = current_stock - ?
+  WHERE current_stock >= ?, which SQLite evaluates under its write lock, so
+  stock never goes negative whatever the interleaving of threads or workers
+- a ledger row (keyed by order_id) records what was taken and what was left
+
+The first statement of the transaction is a write, so it takes the write
+lock up front and never has to upgrade a read lock (no SQLITE_BUSY deadlock
+between two dispatchers). There is no Python-side lock; dispatchers only
+share SQLite's write lock for the few statements below.
+
+Data Structure: Append-only ledger table (B-Tree keyed by order_id).
+Complexity: O(log N) per reservation (primary key lookups only).
+"""
+from datetime import datetime
+
+
+class ReservationError(Exception):
+    """Base class; raising it inside transaction() rolls the claim back."""
+
+class OrderNotFound(ReservationError):
+    pass
+
+class AlreadyShipped(ReservationError):
+    pass
+
+class ProductNotFound(ReservationError):
+    pass
+
+class InsufficientStock(ReservationError):
+    pass
+
+
+def reserve_stock(conn, order_id, sku, qty):
+    """
+    Takes `qty` units of `sku` for `order_id` if, and only if, that much is on hand.
+    Must run inside the caller's transaction. Returns the stock left.
+    """
+    if qty is None or qty <= 0:
+        raise ReservationError(f"Invalid quantity {qty!r} for order {order_id}")
+    cursor = conn.execute(
+        "UPDATE products SET current_stock = current_stock - ? WHERE sku = ? AND current_stock >= ?",
+        (qty, sku, qty)
+    )
+    if cursor.rowcount == 0:
+        if conn.execute("SELECT 1 FROM products WHERE sku = ?", (sku,)).fetchone() is None:
+            raise ProductNotFound(sku)
+        raise InsufficientStock(sku)
+
+    # Still holding the write lock: nobody can have changed it since the UPDATE
+    stock = conn.execute("SELECT current_stock FROM products WHERE sku = ?", (sku,)).fetchone()[0]
+    conn.execute(
+        "INSERT INTO stock_reservations (order_id, sku, qty, stock_after, reserved_at) VALUES (?, ?, ?, ?, ?)",
+        (order_id, sku, qty, stock, datetime.now().isoformat(timespec='seconds'))
+    )
+    return stock
+
+
+def dispatch(conn, order_id):
+    """
+    Marks a pending order SHIPPED and reserves its stock in the caller's transaction.
+    Returns (sku, qty, stock_left). Raises a ReservationError subclass otherwise.
+    """
+    cursor = conn.execute(
+        "UPDATE customer_orders SET status = 'SHIPPED' WHERE order_id = ? AND status IS NOT 'SHIPPED'",
+        (order_id,)
+    )
+    if cursor.rowcount == 0:
+        if conn.execute("SELECT 1 FROM customer_orders WHERE order_id = ?", (order_id,)).fetchone() is None:
+            raise OrderNotFound(order_id)
+        raise AlreadyShipped(order_id)
+
+    sku, qty = conn.execute("SELECT sku, qty_requested FROM customer_orders WHERE order_id = ?", (order_id,)).fetchone()
+    return sku, qty, reserve_stock(conn, order_id, sku, qty)
@@ -0,0 +1,127 @@
+"""
+Micro-batched sales ingestion (group commit).
+
+POST /api/sales only validates events and appends them to an in-memory
+buffer. A single flusher thread drains the buffer every FLUSH_INTERVAL_MS,
+or as soon as MAX_BATCH_ROWS events are waiting, and writes the whole batch
+with one executemany in one transaction: one fsync/WAL commit is shared by
+every event (and every request) that arrived in that window. The
+daily_sales triggers keep the rollup in step inside the same transaction.
+
+After each commit the listeners receive the batch, which is how the API
+folds new sales into the demand forecast without rescanning history.
+
+Data Structure: Dynamic Array buffer guarded by a Condition variable.
+Complexity: O(1) amortized submit, O(B) flush for a batch of B events.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from connection_manager import transaction
+
+FLUSH_INTERVAL_MS = int(os.environ.get('PIRS_SALES_FLUSH_MS', '50'))
+MAX_BATCH_ROWS = int(os.environ.get('PIRS_SALES_BATCH_ROWS', '5000'))
+RETRY_DELAY_SECONDS = 0.5 # Back-off after a failed commit (e.g. database locked)
+
+
+class SalesBatcher:
+    def __init__(self, interval_ms=FLUSH_INTERVAL_MS, max_rows=MAX_BATCH_ROWS, db_path=None):
+        self.interval = interval_ms / 1000
+        self.max_rows = max_rows
+        self.db_path = db_path
+        self.buffer = [] # (sku, qty_sold, sale_date) tuples waiting for the next flush
+        self._cond = threading.Condition()
+        self._listeners = []
+        self._thread = None
+        self._stopping = False
+        self.next_batch = 1 # Sequence number the current buffer will commit as
+        self.committed_batch = 0 # Highest batch sequence number that is durable
+        self.stats = {'events': 0, 'batches': 0, 'failures': 0}
+
+    def add_listener(self, callback):
+        """Registers fn(rows), called on the flusher thread after each committed batch."""
+        self._listeners.append(callback)
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="sales-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Flushes whatever is buffered and stops the flusher thread."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, rows):
+        """
+        Buffers validated (sku, qty_sold, sale_date) rows.
+        Returns the batch sequence number they will be committed in (see wait()).
+        """
+        with self._cond:
+            self.buffer.extend(rows)
+            batch = self.next_batch
+            if len(self.buffer) >= self.max_rows:
+                self._cond.notify_all()
+        return batch
+
+    def wait(self, batch, timeout=None):
+        """Blocks until `batch` is committed. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.committed_batch >= batch, timeout)
+
+    def pending(self):
+        return len(self.buffer)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self.buffer) >= self.max_rows or self._stopping, self.interval)
+                rows, self.buffer = self.buffer, []
+                batch = self.next_batch
+                if rows:
+                    self.next_batch += 1
+                stopping = self._stopping
+            flushed = self._flush(rows, batch) if rows else True
+            if stopping:
+                if flushed and not self.buffer:
+                    return
+                if not flushed:
+                    print(f"[SALES] Shutting down with {len(self.buffer)} unflushed events")
+                    return
+            elif not flushed:
+                time.sleep(RETRY_DELAY_SECONDS)
+
+    def _flush(self, rows, batch):
+        try:
+            with transaction(self.db_path) as conn:
+                conn.executemany("INSERT INTO sales_history (sku, qty_sold, sale_date) VALUES (?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            # Nothing was committed: put the rows back in front and retry on the next tick.
+            # Waiters of this batch are released by the later batch that commits them.
+            with self._cond:
+                self.buffer[:0] = rows
+                self.stats['failures'] += 1
+            print(f"[SALES] Flush of {len(rows)} events failed, will retry: {e}")
+            return False
+
+        # Listeners run before waiters are released, so a caller that waited
+        # for its batch also sees the derived state (forecast, reorder scores)
+        for callback in self._listeners:
+            try:
+                callback(rows)
+            except Exception as e:
+                print(f"[SALES] Listener error: {e}")
+        with self._cond:
+            self.committed_batch = batch
+            self.stats['events'] += len(rows)
+            self.stats['batches'] += 1
+            self._cond.notify_all()
+        return True
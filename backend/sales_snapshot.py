@@ -0,0 +1,448 @@
+"""
+Columnar, memory-mapped snapshot of the daily sales history for analytics.
+
+The daily_sales rollup is exported to immutable segments, each a directory
+of .npy column files:
+    sku_id      int32  SKU number (index into the manifest's 'skus')
+    day         int32  days since the manifest's 'epoch'
+    qty         int32  units sold that day
+    offsets     int64  rows of SKU i are [offsets[i], offsets[i + 1])
+    by_day      int32  row numbers in (day, sku_id) order
+    day_offsets int64  by_day[day_offsets[d]:day_offsets[d + 1]] are the rows
+                       of day first_day + d (first_day is in the manifest)
+Rows are sorted by (sku_id, day), so one SKU's history is a contiguous slice
+(CSR layout). Trailing-window reads go through the second, day-ordered index
+instead of scanning every row. Readers open the files with
+np.load(mmap_mode='r') (numpy.memmap), so a scan pages the columns in from
+the OS cache with no per-row Python objects.
+
+The first export writes one base segment. After that a refresh only reads
+the days listed in the daily_sales_changes table (see CHANGES_DDL: triggers
+on daily_sales mark every day that is inserted, updated or deleted, so
+back-dated corrections are seen too) and appends one small segment holding
+the full current rows of exactly those days. A later segment supersedes the
+same days in every earlier one. Once there are more than MAX_SEGMENTS the
+small tail segments are merged into one, and the base is rewritten only when
+the tail has grown to half its size, so each row is copied O(1) times on
+average.
+
+Data Structure: Log of column segments (struct of arrays), each with a
+                CSR index by SKU and a CSR index by day, + manifest.
+Complexity: O(that SKU's rows) for series() (zero-copy when one segment holds
+            them), O(window rows) for a trailing-window scan, refresh
+            O(rows of the changed days), amortized.
+
+The manifest (segment list, SKU names) lives in CURRENT, which is replaced
+atomically, so readers never see a mix of old and new segments. Refreshes
+hold an exclusive lock on <path>/LOCK, so two processes never number or
+publish a generation at the same time.
+"""
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import numpy as np
+
+import connection_manager
+from connection_manager import get_connection, transaction
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+EPOCH = date(2000, 1, 1) # day index 0
+COLUMNS = ('sku_id', 'day', 'qty', 'offsets', 'by_day', 'day_offsets')
+FORMAT = 3 # Manifest layout; anything else is rebuilt from scratch
+MAX_SEGMENTS = 8
+OPEN_RETRIES = 3
+
+# Changed-days marker read by refresh_snapshot(). One row per sale_date
+# touched since the last refresh; `version` moves on every change, so a
+# refresh only clears the marks it actually read. Works for both schemas
+# (database_setup migration 8, seed_db.create_daily_sales).
+CHANGES_DDL = [
+    '''
+    CREATE TABLE IF NOT EXISTS daily_sales_changes (
+        sale_date TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 1
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_daily_sales_changed_insert AFTER INSERT ON daily_sales
+    BEGIN
+        INSERT INTO daily_sales_changes (sale_date) VALUES (NEW.sale_date)
+        ON CONFLICT (sale_date) DO UPDATE SET version = version + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_daily_sales_changed_update AFTER UPDATE ON daily_sales
+    BEGIN
+        INSERT INTO daily_sales_changes (sale_date) VALUES (OLD.sale_date)
+        ON CONFLICT (sale_date) DO UPDATE SET version = version + 1;
+        INSERT INTO daily_sales_changes (sale_date) SELECT NEW.sale_date WHERE NEW.sale_date IS NOT OLD.sale_date
+        ON CONFLICT (sale_date) DO UPDATE SET version = version + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_daily_sales_changed_delete AFTER DELETE ON daily_sales
+    BEGIN
+        INSERT INTO daily_sales_changes (sale_date) VALUES (OLD.sale_date)
+        ON CONFLICT (sale_date) DO UPDATE SET version = version + 1;
+    END
+    ''',
+]
+
+
+def default_path(db_path=None):
+    """Snapshot directory stored next to its database: <db file>.sales/"""
+    return f"{db_path or connection_manager.DB_PATH}.sales"
+
+
+def to_day(value):
+    return (date.fromisoformat(str(value)[:10]) - EPOCH).days
+
+
+def from_day(day):
+    return (EPOCH + timedelta(days=int(day))).isoformat()
+
+
+def _live_segments(segments):
+    """
+    Pairs each segment (dict of columns plus 'days', the days it replaces,
+    None for a base) with the sorted days later segments supersede.
+    """
+    superseded = np.zeros(0, dtype=np.int32)
+    paired = []
+    for segment in reversed(segments):
+        paired.append((segment, superseded))
+        if segment['days'] is not None:
+            superseded = np.union1d(superseded, segment['days']).astype(np.int32)
+    paired.reverse()
+    return paired
+
+
+def _drop_superseded(day, superseded, *columns):
+    """Filters (day, *columns) to days no later segment replaces. Copies only when some row goes."""
+    if len(day) and len(superseded):
+        hidden = superseded[(superseded >= day.min()) & (superseded <= day.max())]
+        if len(hidden):
+            live = ~np.isin(day, hidden)
+            return (day[live],) + tuple(column[live] for column in columns)
+    return (day,) + columns
+
+
+def _slice(segment, superseded, first_day=None, last_day=None):
+    """(sku_id, day, qty) of a segment's live rows with first_day <= day <= last_day."""
+    if first_day is None and last_day is None:
+        day, sku_id, qty = segment['day'], segment['sku_id'], segment['qty'] # Whole segment, SKU order
+    else:
+        day_offsets, base = segment['day_offsets'], segment['first_day']
+        span = len(day_offsets) - 1
+        lo = 0 if first_day is None else min(max(first_day - base, 0), span)
+        hi = span if last_day is None else min(max(last_day - base + 1, 0), span)
+        rows = segment['by_day'][day_offsets[lo]:day_offsets[hi]] if hi > lo else segment['by_day'][:0]
+        day, sku_id, qty = segment['day'][rows], segment['sku_id'][rows], segment['qty'][rows]
+    day, sku_id, qty = _drop_superseded(day, superseded, sku_id, qty)
+    return sku_id, day, qty
+
+
+def _index(segment, sku_count):
+    """
+    Column files for a segment's rows (any order): rows sorted by (sku_id, day)
+    with the SKU offsets, plus the by-day permutation and its day offsets.
+    """
+    order = np.lexsort((segment['day'], segment['sku_id']))
+    sku_id, day, qty = segment['sku_id'][order], segment['day'][order], segment['qty'][order]
+    offsets = np.zeros(sku_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sku_id, minlength=sku_count), out=offsets[1:])
+    by_day = np.lexsort((sku_id, day)).astype(np.int32) # Stable: SKU order within a day
+    first_day = int(day.min()) if len(day) else 0
+    span = int(day.max()) - first_day + 1 if len(day) else 0
+    day_offsets = np.zeros(span + 1, dtype=np.int64)
+    np.cumsum(np.bincount(day - first_day, minlength=span), out=day_offsets[1:])
+    columns = {'sku_id': sku_id, 'day': day, 'qty': qty, 'offsets': offsets,
+               'by_day': by_day, 'day_offsets': day_offsets}
+    return columns, first_day
+
+
+def _merge(segments):
+    """One segment (unsorted rows) with the live rows of `segments`, oldest first."""
+    parts = [_slice(segment, superseded) for segment, superseded in _live_segments(segments)]
+    sku_id, day, qty = (np.concatenate([part[i] for part in parts]) for i in range(3))
+    days = None
+    if segments[0]['days'] is not None:
+        days = np.unique(np.concatenate([segment['days'] for segment in segments])).astype(np.int32)
+    return {'sku_id': sku_id, 'day': day, 'qty': qty, 'days': days}
+
+
+class SalesSnapshot:
+    """Read-only view over one published manifest and its segments."""
+    def __init__(self, path, meta, segments):
+        self.path = path
+        self.meta = meta
+        self.skus = meta['skus'] # sku_id -> SKU
+        self.index = {sku: sku_id for sku_id, sku in enumerate(self.skus)} # Hash Map: SKU -> sku_id
+        self.segments = segments
+        self._live = _live_segments(segments)
+        self.last_day = self._find_last_day()
+
+    @staticmethod
+    def _read_manifest(path):
+        try:
+            with open(os.path.join(path, 'CURRENT')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _load_segment(path, entry):
+        segment = {name: np.load(os.path.join(path, entry['name'], f"{name}.npy"), mmap_mode='r') for name in COLUMNS}
+        segment['days'] = None if entry['days'] is None else np.asarray(entry['days'], dtype=np.int32)
+        segment['first_day'] = entry['first_day']
+        return segment
+
+    @classmethod
+    def open(cls, path=None):
+        """
+        Memory-maps the current manifest's segments, or returns None if nothing
+        was exported yet. A refresh that publishes between our reading CURRENT
+        and mapping the files may have pruned them; then CURRENT is re-read.
+        """
+        path = path or default_path()
+        for attempt in range(OPEN_RETRIES):
+            meta = cls._read_manifest(path)
+            if meta is None or meta.get('format') != FORMAT:
+                return None
+            try:
+                return cls(path, meta, [cls._load_segment(path, entry) for entry in meta['segments']])
+            except FileNotFoundError:
+                time.sleep(0.01 * (attempt + 1))
+        print(f"[SNAPSHOT] {path}: CURRENT points at missing segments")
+        return None
+
+    def __len__(self):
+        return sum(len(qty) for _, _, qty in self.rows())
+
+    def _find_last_day(self):
+        """Newest day with a live row (None when empty)."""
+        newest = None
+        for segment, superseded in self._live:
+            day_offsets = segment['day_offsets']
+            # Step back from the segment's last day over superseded or empty days (few)
+            for offset in range(len(day_offsets) - 2, -1, -1):
+                day = segment['first_day'] + offset
+                if day_offsets[offset + 1] > day_offsets[offset] and day not in superseded:
+                    newest = day if newest is None else max(newest, day)
+                    break
+        return newest
+
+    def rows(self, first_day=None, last_day=None):
+        """
+        Yields (sku_id, day, qty) per segment: gathered through the day index
+        for a day range (O(rows in range)), whole memmap columns otherwise.
+        """
+        for segment, superseded in self._live:
+            yield _slice(segment, superseded, first_day, last_day)
+
+    def series(self, sku):
+        """
+        (day, qty) arrays of one SKU's history, oldest first: its offsets slice
+        in each segment. Zero-copy memmap views when a single segment holds it.
+        """
+        sku_id = self.index.get(sku)
+        empty = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32))
+        if sku_id is None:
+            return empty
+        parts = []
+        for segment, superseded in self._live:
+            offsets = segment['offsets']
+            if sku_id + 1 >= len(offsets):
+                continue # SKU first seen after this segment was written
+            start, end = offsets[sku_id], offsets[sku_id + 1]
+            if end > start:
+                parts.append(_drop_superseded(segment['day'][start:end], superseded, segment['qty'][start:end]))
+        if len(parts) <= 1:
+            return parts[0] if parts else empty
+        day = np.concatenate([part[0] for part in parts])
+        qty = np.concatenate([part[1] for part in parts])
+        order = np.argsort(day, kind='stable') # Back-dated segments can hold older days
+        return day[order], qty[order]
+
+    def window(self, days, end_day=None):
+        """
+        Per-SKU (units, active days) over the `days` days ending at `end_day`
+        (default: the newest day in the snapshot), as arrays indexed by sku_id.
+        """
+        end_day = self.last_day if end_day is None else end_day
+        count = len(self.skus)
+        units = np.zeros(count)
+        active_days = np.zeros(count, dtype=np.int64)
+        if end_day is None or not count:
+            return units, active_days
+        for sku_id, _, qty in self.rows(end_day - days + 1, end_day):
+            units += np.bincount(sku_id, weights=qty, minlength=count)
+            active_days += np.bincount(sku_id, minlength=count)
+        return units, active_days
+
+    def window_matrix(self, days, end_day=None):
+        """Dense SKU x day matrix (float32, oldest day first) of the trailing `days` days."""
+        end_day = self.last_day if end_day is None else end_day
+        matrix = np.zeros((len(self.skus), days), dtype=np.float32)
+        if end_day is None:
+            return matrix
+        for sku_id, day, qty in self.rows(end_day - days + 1, end_day):
+            matrix[sku_id, day - (end_day - days + 1)] = qty
+        return matrix
+
+
+@contextmanager
+def _refresh_lock(path):
+    """Exclusive lock on <path>/LOCK across processes and threads; the OS drops it if we crash."""
+    with open(os.path.join(path, 'LOCK'), 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_changes(db_name):
+    """The (sale_date, version) marks left by the daily_sales triggers."""
+    return get_connection(db_name).execute("SELECT sale_date, version FROM daily_sales_changes").fetchall()
+
+
+def _clear_changes(db_name, changes):
+    """Drops the marks we read; a day changed again since then has a new version and stays marked."""
+    with transaction(db_name) as conn:
+        conn.executemany("DELETE FROM daily_sales_changes WHERE sale_date = ? AND version = ?", changes)
+
+
+def _day_ranges(days):
+    """Sorted day indexes -> [first, last] runs of consecutive days."""
+    ranges = []
+    for day in days:
+        if ranges and day == ranges[-1][1] + 1:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return ranges
+
+
+def _read_daily_sales(db_name, qty_column, days=None):
+    """Pulls rollup rows (all, or only the given day indexes) as three numpy columns."""
+    cursor = get_connection(db_name).cursor()
+    query = f"SELECT sku, sale_date, {qty_column} FROM daily_sales"
+    if days is None:
+        rows = cursor.execute(query).fetchall()
+    else:
+        # Ranges on the idx_daily_sales_date prefix; [day, day + 1) also matches
+        # sale_date values stored with a time of day
+        rows = []
+        for first, last in _day_ranges(days):
+            rows += cursor.execute(query + " WHERE sale_date >= ? AND sale_date < ?",
+                                   (from_day(first), from_day(last + 1))).fetchall()
+    skus = [row[0] for row in rows]
+    day = np.fromiter((to_day(row[1]) for row in rows), dtype=np.int32, count=len(rows))
+    qty = np.fromiter((row[2] or 0 for row in rows), dtype=np.int32, count=len(rows))
+    return skus, day, qty
+
+
+def _next_generation(path, meta):
+    """Above the manifest's generation and every segment directory on disk (even unpublished ones)."""
+    numbers = [meta['generation']] if meta and 'generation' in meta else [0]
+    for entry in os.listdir(path):
+        if entry.startswith('seg-') and entry[4:].isdigit():
+            numbers.append(int(entry[4:]))
+    return max(numbers) + 1
+
+
+def _write_segment(path, name, segment, sku_count):
+    columns, first_day = _index(segment, sku_count)
+    target = os.path.join(path, name)
+    os.makedirs(target, exist_ok=True)
+    for column in COLUMNS:
+        np.save(os.path.join(target, f"{column}.npy"), columns[column])
+    return {'name': name, 'rows': int(len(segment['qty'])), 'first_day': first_day,
+            'days': None if segment['days'] is None else [int(day) for day in segment['days']]}
+
+
+def _publish(path, meta):
+    pointer = os.path.join(path, 'CURRENT.tmp')
+    with open(pointer, 'w') as f:
+        json.dump(meta, f)
+    os.replace(pointer, os.path.join(path, 'CURRENT'))
+
+    # Unreferenced segments (and pre-segment 'gen-' exports) are unlinked;
+    # readers that still map them keep their pages
+    keep = {entry['name'] for entry in meta['segments']}
+    for entry in os.listdir(path):
+        if entry.startswith(('seg-', 'gen-')) and entry not in keep:
+            shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+
+
+def refresh_snapshot(path=None, db_name=None, qty_column='qty_sold', full=False):
+    """
+    Brings the snapshot up to date with the daily_sales rollup and returns it opened.
+
+    Incremental by default: reads only the days marked in daily_sales_changes
+    (new, partial, back-dated or deleted) and appends them as one segment.
+    Nothing is written when no day changed. full=True (or a missing or
+    old-format snapshot) re-reads the whole rollup into a single segment.
+    One snapshot per database: a refresh consumes the change marks.
+    """
+    path = path or default_path(db_name)
+    os.makedirs(path, exist_ok=True)
+    with _refresh_lock(path):
+        previous = SalesSnapshot.open(path)
+        # Marks first: a day changed after this point stays marked for the next refresh
+        changes = _read_changes(db_name)
+        if previous is not None and not full and not changes:
+            return previous
+
+        generation = _next_generation(path, SalesSnapshot._read_manifest(path))
+        name = f"seg-{generation}"
+        if previous is None or full:
+            new_skus, day, qty = _read_daily_sales(db_name, qty_column)
+            skus, kept, days = [], [], None
+        else:
+            days = np.array(sorted({to_day(sale_date) for sale_date, _ in changes}), dtype=np.int32)
+            new_skus, day, qty = _read_daily_sales(db_name, qty_column, days.tolist())
+            skus, kept = list(previous.skus), list(zip(previous.meta['segments'], previous.segments))
+
+        index = {sku: sku_id for sku_id, sku in enumerate(skus)}
+        for sku in new_skus:
+            if sku not in index:
+                index[sku] = len(skus)
+                skus.append(sku)
+        sku_id = np.fromiter((index[sku] for sku in new_skus), dtype=np.int32, count=len(new_skus))
+        segment = {'sku_id': sku_id, 'day': day, 'qty': qty, 'days': days}
+
+        if len(kept) + 1 > MAX_SEGMENTS:
+            base_rows = kept[0][0]['rows']
+            tail_rows = sum(entry['rows'] for entry, _ in kept[1:]) + len(qty)
+            # Merge the small tail; fold it into the base once it is half the base's size
+            start = 0 if 2 * tail_rows >= base_rows else 1
+            segment = _merge([loaded for _, loaded in kept[start:]] + [segment])
+            kept = kept[:start]
+        entries = [entry for entry, _ in kept] + [_write_segment(path, name, segment, len(skus))]
+
+        meta = {'format': FORMAT, 'generation': generation, 'epoch': EPOCH.isoformat(),
+                'skus': skus, 'segments': entries}
+        _publish(path, meta)
+        _clear_changes(db_name, changes)
+    print(f"[SNAPSHOT] {'Rebuilt' if previous is None or full else 'Refreshed'} {path}: "
+          f"{len(entries)} segment(s), {len(qty)} rows read from SQLite")
+    return SalesSnapshot.open(path)
@@ -1,4 +1,5 @@
-import sqlite3
+from connection_manager import transaction
+from sales_snapshot import CHANGES_DDL
 import random
 from datetime import datetime, timedelta
 
@@ -23,6 +24,7 @@ def create_tables(cursor):
             FOREIGN KEY(SKU) REFERENCES products(SKU)
         )
     ''')
+    create_daily_sales(cursor)
 
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS expired_lots (
@@ -30,6 +32,80 @@ def create_tables(cursor):
         )
     ''')
 
+def create_daily_sales(cursor):
+    """
+    Daily rollup read by data_manager.calculate_forecast (one row per SKU per day),
+    kept in step with sales_history by triggers. Idempotent: databases seeded
+    before the rollup existed get the table, backfilled from sales_history
+    (same as migration 4 in database_setup.py), and any missing trigger,
+    plus the changed-days marker the sales snapshot refresh reads (migration 8).
+    """
+    exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_sales'").fetchone()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            SKU TEXT NOT NULL,
+            sale_date TEXT NOT NULL,
+            quantity_sold INTEGER NOT NULL DEFAULT 0,
+            txn_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (SKU, sale_date)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_daily_sales_date
+        ON daily_sales (sale_date, SKU, quantity_sold)
+    ''')
+    if not exists:
+        cursor.execute('''
+            INSERT INTO daily_sales (SKU, sale_date, quantity_sold, txn_count)
+            SELECT SKU, sale_date, COALESCE(SUM(quantity_sold), 0), COUNT(*) FROM sales_history
+            WHERE SKU IS NOT NULL AND sale_date IS NOT NULL
+            GROUP BY SKU, sale_date
+        ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_insert AFTER INSERT ON sales_history
+        BEGIN
+            INSERT INTO daily_sales (SKU, sale_date, quantity_sold, txn_count)
+            VALUES (NEW.SKU, NEW.sale_date, NEW.quantity_sold, 1)
+            ON CONFLICT (SKU, sale_date) DO UPDATE SET
+                quantity_sold = quantity_sold + excluded.quantity_sold,
+                txn_count = txn_count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_delete AFTER DELETE ON sales_history
+        BEGIN
+            UPDATE daily_sales SET
+                quantity_sold = quantity_sold - OLD.quantity_sold,
+                txn_count = txn_count - 1
+            WHERE SKU = OLD.SKU AND sale_date = OLD.sale_date;
+            DELETE FROM daily_sales WHERE SKU = OLD.SKU AND sale_date = OLD.sale_date AND txn_count <= 0;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_update AFTER UPDATE OF SKU, quantity_sold, sale_date ON sales_history
+        BEGIN
+            UPDATE daily_sales SET
+                quantity_sold = quantity_sold - OLD.quantity_sold,
+                txn_count = txn_count - 1
+            WHERE SKU = OLD.SKU AND sale_date = OLD.sale_date;
+            DELETE FROM daily_sales WHERE SKU = OLD.SKU AND sale_date = OLD.sale_date AND txn_count <= 0;
+            INSERT INTO daily_sales (SKU, sale_date, quantity_sold, txn_count)
+            VALUES (NEW.SKU, NEW.sale_date, NEW.quantity_sold, 1)
+            ON CONFLICT (SKU, sale_date) DO UPDATE SET
+                quantity_sold = quantity_sold + excluded.quantity_sold,
+                txn_count = txn_count + 1;
+        END
+    ''')
+    for statement in CHANGES_DDL:
+        cursor.execute(statement)
+
+def ensure_daily_sales(db_name=DB_NAME):
+    """Adds the rollup to an existing database (no-op when it is complete)."""
+    with transaction(db_name) as conn:
+        # IMMEDIATE: two processes upgrading at once must not both backfill
+        conn.execute("BEGIN IMMEDIATE")
+        create_daily_sales(conn.cursor())
+
 def seed_data(cursor):
     print("Seeding products...")
     product_list = []
@@ -70,16 +146,12 @@ def seed_data(cursor):
 if __name__ == '__main__':
     try:
         # Connects to file or creates it if it doesn't exist
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        
-        create_tables(cursor)
-        seed_data(cursor)
+        with transaction(DB_NAME) as conn:
+            cursor = conn.cursor()
+            
+            create_tables(cursor)
+            seed_data(cursor)
         
-        conn.commit()
         print(f"Successfully created and seeded {DB_NAME}")
     except Exception as e:
         print(f"An error occurred: {e}")
-    finally:
-        if conn:
-            conn.close()
@@ -0,0 +1,392 @@
+import sys
+import os
+import time
+import heapq
+import random
+import argparse
+import contextlib
+import io
+import tempfile
+
+# Add current directory to path so we can import modules (run from backend/)
+sys.path.append(os.getcwd())
+
+from floor_operations import ShippingQueue, IndexedHeap, BucketQueue
+
+
+def make_orders(n, seed=42):
+    """Synthetic pending orders with the same score inputs the API produces."""
+    rng = random.Random(seed)
+    return [
+        {
+            'order_id': f"ORD-{i}",
+            'tier': 2 if rng.random() < 0.1 else 1,
+            'days_remaining': rng.randint(1, 100),
+            'qty': rng.randint(1, 10),
+            'item_sku': f"SKU{rng.randint(1, 500):03d}",
+            'status': 'PENDING'
+        }
+        for i in range(n)
+    ]
+
+
+class HeapqBaseline:
+    """The original ShippingQueue storage: plain heapq list of (-score, entry_count, order)."""
+    def __init__(self):
+        self.heap = []
+        self.entry_count = 0
+
+    def add_order(self, order_details):
+        priority_score, priority_reason = ShippingQueue._calculate_priority(order_details)
+        heapq.heappush(self.heap, (-priority_score, self.entry_count, {**order_details, 'priority_reason': priority_reason, 'priority_score': priority_score}))
+        self.entry_count += 1
+
+    def process_next_order(self):
+        if not self.heap:
+            return None
+        return heapq.heappop(self.heap)[2]
+
+    def get_queue_status(self):
+        return [item[2] for item in sorted(self.heap)]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench_shipping_queue(sizes):
+    print("=" * 60)
+    print("SHIPPING QUEUE BACKENDS (enqueue / sorted snapshot / drain)")
+    print("=" * 60)
+    for n in sizes:
+        orders = make_orders(n)
+        print(f"\n[N = {n:,}]")
+        for label, factory in [
+            ('heapq (original)', HeapqBaseline),
+            ('indexed heap', lambda: ShippingQueue(backend='heap', verbose=False)),
+            ('bucket queue', lambda: ShippingQueue(backend='bucket', verbose=False)),
+        ]:
+            queue = factory()
+            t_add = timed(lambda: [queue.add_order(o) for o in orders])
+            t_snap = timed(queue.get_queue_status)
+            t_pop = timed(lambda: [queue.process_next_order() for _ in range(n)])
+            print(f"  {label:<18} enqueue {t_add:7.3f}s | snapshot {t_snap:7.3f}s | dequeue {t_pop:7.3f}s")
+            del queue
+        # Storage alone, without the ShippingQueue bookkeeping (pick list, listeners, lock)
+        items = [(ShippingQueue._calculate_priority(o)[0], i, o) for i, o in enumerate(orders)]
+        for label, backend in [('  raw indexed heap', IndexedHeap), ('  raw bucket queue', BucketQueue)]:
+            store = backend()
+            t_add = timed(lambda: [store.push(*item) for item in items])
+            t_pop = timed(lambda: [store.pop() for _ in range(n)])
+            print(f"  {label:<18} push    {t_add:7.3f}s | {'':17}| pop     {t_pop:7.3f}s")
+            del store
+
+
+def rebuild_pick_list(queue):
+    """The original get_optimized_pick_list: walk every order, then sort."""
+    pick_map = {}
+    for order in queue.queue.orders():
+        if order.get('status') == 'SHIPPED':
+            continue
+        sku = order.get('item_sku', 'UNKNOWN')
+        if sku in pick_map:
+            pick_map[sku]['qty'] += order.get('qty', 1)
+        else:
+            pick_map[sku] = {'sku': sku, 'name': order.get('item_name', 'Unknown Item'), 'qty': order.get('qty', 1), 'count': 1}
+    return sorted(pick_map.values(), key=lambda x: x['qty'], reverse=True)
+
+
+def bench_pick_list(sizes, reads=100):
+    print("=" * 60)
+    print(f"PICK LIST ({reads} dashboard reads, top 20 SKUs)")
+    print("=" * 60)
+    for n in sizes:
+        queue = ShippingQueue(verbose=False)
+        for order in make_orders(n):
+            queue.add_order(order)
+        t_old = timed(lambda: [rebuild_pick_list(queue)[:20] for _ in range(reads)])
+        t_new = timed(lambda: [queue.get_optimized_pick_list(20) for _ in range(reads)])
+        print(f"  N = {n:>9,}  rebuild {t_old:7.3f}s | live aggregate {t_new:7.4f}s")
+        del queue
+
+
+def build_order_db(path, n, seed=42):
+    """Temp database with n open orders (~10% BLOCKED) plus as many SHIPPED ones."""
+    import connection_manager
+    from database_setup import migrate
+    connection_manager.configure(path=path)
+    migrate()
+    rng = random.Random(seed)
+    conn = connection_manager.get_connection()
+    with conn:
+        conn.executemany("INSERT INTO products (sku, name, current_stock, unit_cost) VALUES (?,?,?,?)",
+                         [(f"SKU{i:03d}", f"Product {i}", rng.randint(0, 500), 10.0) for i in range(1, 501)])
+        conn.executemany("INSERT INTO customer_orders VALUES (?,?,?,?,?,?,?,?)", (
+            (f"ORD-{i}", 2 if rng.random() < 0.1 else 1, f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+             f"SKU{rng.randint(1, 500):03d}", None, rng.randint(1, 10), 100.0,
+             'SHIPPED' if i >= n else ('BLOCKED' if rng.random() < 0.1 else 'PENDING'))
+            for i in range(2 * n)
+        ))
+
+
+def hydrate_per_order():
+    """The original populate_queues: SELECT * every order, then add_order one at a time."""
+    import api
+    from data_ingestion import get_all_orders
+    products = api.get_product_lookup()
+    for order in get_all_orders():
+        product = products.get(order['sku'], {})
+        days_left = 30
+        if product and product.get('stock', 0) > 0:
+            days_left = max(1, int(product['stock'] / 5))
+        order_details = {
+            'order_id': order['order_id'], 'customer': f"Customer {order['customer_tier']}",
+            'item_sku': order['sku'], 'item_name': order.get('product_name', product.get('name', 'Unknown')),
+            'tier': order['customer_tier'], 'days_remaining': days_left, 'qty': order['qty_requested'],
+            'total_amount': order.get('total_amount', 0), 'status': order['status']
+        }
+        if order['status'] == 'BLOCKED':
+            api.blocked_queue.blocked_orders.append({**order_details, 'blocked_reason': "Manual Block / Stock Issue"})
+        elif order['status'] == 'PENDING':
+            api.shipping_queue.add_order(order_details)
+
+
+def bench_hydration(sizes):
+    print("=" * 60)
+    print("STARTUP QUEUE HYDRATION (N open orders + N shipped in SQLite)")
+    print("=" * 60)
+    import gc
+    import api
+    from floor_operations import BlockedQueue
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = os.path.join(tmp, f"hydration_{n}.db")
+            build_order_db(path, n)
+            results = []
+            # Per-order logging is silenced for the baseline too: only the data path is compared
+            for label, fn in [('SELECT * + add_order', hydrate_per_order), ('streamed + heapify', api.populate_queues)]:
+                api.shipping_queue = ShippingQueue(verbose=False)
+                api.blocked_queue = BlockedQueue()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results.append((label, timed(fn), len(api.shipping_queue.queue)))
+                gc.unfreeze() # populate_queues freezes what it loaded; release it between runs
+            line = " | ".join(f"{label} {t:7.3f}s ({queued:,} queued)" for label, t, queued in results)
+            print(f"  N = {n:>9,}  {line}")
+
+
+def bench_forecast(sizes, days=56):
+    print("=" * 60)
+    print(f"DEMAND FORECAST ({days}-day SKU x day matrix: moving averages, smoothing, days of cover)")
+    print("=" * 60)
+    import numpy as np
+    from forecasting import DemandForecast, SMOOTHING_ALPHA
+    for n in sizes:
+        rng = np.random.default_rng(42)
+        matrix = rng.poisson(3, size=(n, days)).astype(np.float32)
+        stock = rng.integers(0, 500, size=n)
+        skus = [f"SKU{i}" for i in range(n)]
+
+        def per_sku_loop():
+            # Row-at-a-time Python, the shape of the old per-SKU forecast code
+            cover = []
+            for row, units in zip(matrix.tolist(), stock.tolist()):
+                level = row[0]
+                for qty in row[1:]:
+                    level = SMOOTHING_ALPHA * qty + (1 - SMOOTHING_ALPHA) * level
+                rate = max(level, sum(row[-7:]) / 7)
+                cover.append(units / rate if rate > 0 else 999)
+            return cover
+
+        forecast = DemandForecast(window_days=days)
+        t_loop = timed(per_sku_loop) if n <= 100000 else None
+        t_fit = timed(lambda: forecast.fit(skus, matrix)) # Includes building the SKU index
+        t_refit = timed(lambda: forecast.fit(skus, matrix)) # Same SKUs, new numbers
+        t_cover = timed(lambda: forecast.days_of_cover_many(skus, stock))
+        loop = f"{t_loop:7.3f}s" if t_loop is not None else "skipped"
+        print(f"  N = {n:>9,}  python loop {loop} | first fit {t_fit:7.4f}s | refit {t_refit:7.4f}s | cover by SKU {t_cover:7.4f}s")
+
+
+def bench_sales_snapshot(sizes, skus=1000):
+    print("=" * 60)
+    print(f"SALES HISTORY SCANS ({skus} SKUs: sqlite3 rows -> lists vs columnar memmap)")
+    print("=" * 60)
+    import numpy as np
+    import connection_manager
+    from database_setup import migrate
+    from sales_snapshot import refresh_snapshot, SalesSnapshot, from_day
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = os.path.join(tmp, f"sales_{n}.db")
+            connection_manager.configure(path=path, profile='fast')
+            migrate()
+            days = max(1, n // skus)
+            conn = connection_manager.get_connection()
+            with conn:
+                # Straight into the rollup: one row per SKU-day
+                conn.executemany("INSERT INTO daily_sales (sku, sale_date, qty_sold, txn_count) VALUES (?, ?, ?, 1)", (
+                    (f"SKU{i % skus:05d}", from_day(7000 + i // skus), 1 + i % 9) for i in range(days * skus)
+                ))
+
+            def sql_lists():
+                history = {}
+                for sku, qty in conn.execute("SELECT sku, qty_sold FROM daily_sales ORDER BY sku, sale_date"):
+                    history.setdefault(sku, []).append(qty)
+                return {sku: (sum(values), sum(values[-90:])) for sku, values in history.items()}
+
+            def memmap_scan():
+                snapshot = SalesSnapshot.open()
+                totals, _ = snapshot.window(days)
+                return totals, snapshot.window(90)
+
+            t_sql = timed(sql_lists)
+            with contextlib.redirect_stdout(io.StringIO()):
+                t_export = timed(refresh_snapshot)
+                t_scan = timed(memmap_scan)
+                with conn:
+                    conn.executemany("INSERT INTO daily_sales (sku, sale_date, qty_sold, txn_count) VALUES (?, ?, 1, 1)",
+                                     ((f"SKU{i:05d}", from_day(7000 + days)) for i in range(skus)))
+                t_refresh = timed(refresh_snapshot)
+            print(f"  rows = {days * skus:>11,}  sql -> lists {t_sql:7.3f}s | memmap scan {t_scan:7.4f}s | "
+                  f"full export {t_export:7.3f}s | +1 day refresh {t_refresh:7.3f}s")
+
+
+def dispatch_read_check_write(conn, order_id):
+    """The original dispatch_order: read stock, compare in Python, write the new level back."""
+    from reservations import InsufficientStock
+    sku, qty = conn.execute("SELECT sku, qty_requested FROM customer_orders WHERE order_id = ?", (order_id,)).fetchone()
+    stock = conn.execute("SELECT current_stock FROM products WHERE sku = ?", (sku,)).fetchone()[0]
+    if stock < qty:
+        raise InsufficientStock(sku)
+    time.sleep(0) # Yield like a request thread would between statements
+    conn.execute("UPDATE products SET current_stock = ? WHERE sku = ?", (stock - qty, sku))
+    conn.execute("UPDATE customer_orders SET status = 'SHIPPED' WHERE order_id = ?", (order_id,))
+
+
+def bench_dispatch(sizes, threads=8, skus=50):
+    print("=" * 60)
+    print(f"CONCURRENT DISPATCH ({threads} threads, {skus} SKUs, ~2x more demand than stock)")
+    print("=" * 60)
+    import threading
+    import connection_manager
+    from connection_manager import transaction
+    from database_setup import migrate
+    from reservations import dispatch, ReservationError
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            for label, fn in [('read-check-write', dispatch_read_check_write), ('conditional UPDATE', dispatch)]:
+                path = os.path.join(tmp, f"dispatch_{n}_{fn.__name__}.db")
+                connection_manager.configure(path=path, profile='fast')
+                with contextlib.redirect_stdout(io.StringIO()):
+                    migrate()
+                rng = random.Random(42)
+                orders = [(f"ORD-{i}", f"SKU{rng.randrange(skus):03d}", rng.randint(1, 10)) for i in range(n)]
+                initial = max(1, n * 55 // (skus * 20)) # Half of the expected demand per SKU
+                conn = connection_manager.get_connection()
+                with conn:
+                    conn.executemany("INSERT INTO products (sku, name, current_stock, unit_cost) VALUES (?, ?, ?, 1.0)",
+                                     [(f"SKU{i:03d}", f"Product {i}", initial) for i in range(skus)])
+                    conn.executemany("INSERT INTO customer_orders (order_id, customer_tier, sku, qty_requested, status) "
+                                     "VALUES (?, 1, ?, ?, 'PENDING')", orders)
+
+                outcome = {'shipped': 0, 'rejected': 0, 'errors': 0}
+                outcome_lock = threading.Lock()
+                def worker(chunk):
+                    counts = {'shipped': 0, 'rejected': 0, 'errors': 0}
+                    for order_id, _, _ in chunk:
+                        try:
+                            with transaction() as conn:
+                                fn(conn, order_id)
+                            counts['shipped'] += 1
+                        except ReservationError:
+                            counts['rejected'] += 1
+                        except Exception:
+                            counts['errors'] += 1
+                    with outcome_lock:
+                        for key, value in counts.items():
+                            outcome[key] += value
+
+                workers = [threading.Thread(target=worker, args=(orders[i::threads],)) for i in range(threads)]
+                start = time.perf_counter()
+                for thread in workers:
+                    thread.start()
+                for thread in workers:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+
+                min_stock, remaining = conn.execute("SELECT MIN(current_stock), SUM(current_stock) FROM products").fetchone()
+                shipped_units = conn.execute("SELECT COALESCE(SUM(qty_requested), 0) FROM customer_orders WHERE status = 'SHIPPED'").fetchone()[0]
+                # Units handed out beyond what was actually taken off the shelf
+                oversold = shipped_units - (initial * skus - remaining)
+                print(f"  N = {n:>9,}  {label:<18} {n / elapsed:9,.0f} dispatch/s | shipped {outcome['shipped']:,} "
+                      f"rejected {outcome['rejected']:,} errors {outcome['errors']} | min stock {min_stock} | "
+                      f"oversold {oversold:,} units -> {'OK' if oversold == 0 and min_stock >= 0 else 'OVERSOLD'}")
+
+
+def bench_order_ids(sizes, chunk=1000):
+    print("=" * 60)
+    print(f"ORDER IDS (uuid4 hex vs block-allocated sequence; inserts committed every {chunk:,})")
+    print("=" * 60)
+    import uuid
+    import connection_manager
+    from database_setup import migrate
+    from order_ids import OrderIdAllocator
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            # The old create_order scheme: ORD- + 4 hex digits
+            seen, first_collision = set(), None
+            for i in range(min(n, 65536 * 4)):
+                order_id = uuid.uuid4().hex[:4]
+                if order_id in seen:
+                    first_collision = i + 1
+                    break
+                seen.add(order_id)
+
+            results = []
+            for label in ('uuid4 (32 hex)', 'allocator'):
+                path = os.path.join(tmp, f"order_ids_{n}_{len(results)}.db")
+                connection_manager.configure(path=path, profile='fast')
+                with contextlib.redirect_stdout(io.StringIO()):
+                    migrate()
+                allocator = OrderIdAllocator(db_path=path)
+                conn = connection_manager.get_connection()
+
+                def insert_orders():
+                    for start in range(0, n, chunk):
+                        count = min(chunk, n - start)
+                        if label == 'allocator':
+                            ids = allocator.next_ids(count)
+                        else:
+                            ids = [f"ORD-{uuid.uuid4().hex.upper()}" for _ in range(count)]
+                        with conn:
+                            conn.executemany("INSERT INTO customer_orders (order_id, customer_tier, sku, qty_requested, status) "
+                                             "VALUES (?, 1, 'SKU001', 1, 'PENDING')", ((order_id,) for order_id in ids))
+
+                t_alloc = timed(lambda: allocator.next_ids(n)) if label == 'allocator' else timed(lambda: [uuid.uuid4().hex for _ in range(n)])
+                t_insert = timed(insert_orders)
+                size_mb = sum(os.path.getsize(f) for f in (path, path + '-wal') if os.path.exists(f)) / 1e6
+                results.append(f"{label} ids {n / t_alloc / 1e6:5.2f}M/s, insert {t_insert:6.3f}s, db {size_mb:6.1f} MB")
+            print(f"  N = {n:>9,}  4-hex first collision at #{first_collision} | " + " | ".join(results))
+
+
+BENCHMARKS = {
+    'shipping-queue': bench_shipping_queue,
+    'pick-list': bench_pick_list,
+    'hydration': bench_hydration,
+    'forecast': bench_forecast,
+    'sales-snapshot': bench_sales_snapshot,
+    'dispatch': bench_dispatch,
+    'order-ids': bench_order_ids,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PIRS data structure benchmarks (run from backend/)")
+    parser.add_argument('benchmarks', nargs='*', default=list(BENCHMARKS), help=f"Any of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--sizes', default="10000,100000,1000000", help="Comma separated problem sizes")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    for name in args.benchmarks:
+        BENCHMARKS[name](sizes)
@@ -13,6 +13,7 @@ import { AuditSchedule } from './components/AuditSchedule';
 import GetStarted from './pages/GetStarted';
 import { AlertCircle, CheckCircle2, TrendingUp, Package, RefreshCw, ShoppingCart, Plus, Search, Info } from 'lucide-react';
 import { useLanguage } from './contexts/LanguageContext';
+import { subscribeToEvents } from './lib/liveEvents';
 
 import { AnimatePresence, motion } from 'framer-motion';
 
@@ -85,7 +86,7 @@ function App() {
         api.get('/dashboard/summary'),
         api.get('/priority/top'),
         api.get('/inventory/stability'),
-        api.get('/audit/next'),
+        api.get('/audit/next', { params: { advance: false } }), // Display only: don't move the audit cursor
         api.get('/orders/history') // Assuming this endpoint exists now or use empty
       ]);
 
@@ -103,10 +104,10 @@ function App() {
   };
 
   useEffect(() => {
-    // Start fetching data immediately
+    // Start fetching data immediately, then refetch only when the server pushes a change
     fetchData();
-    const interval = setInterval(fetchData, 5000);
-    return () => clearInterval(interval);
+    // fetchData hits five endpoints: under steady sales traffic refresh at most every 2 s
+    return subscribeToEvents(['queue', 'blocked', 'stock'], fetchData, 250, 2000);
   }, []);
 
   const handleProductAdded = () => {
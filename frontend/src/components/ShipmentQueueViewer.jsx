@@ -1,6 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Package, Truck, AlertTriangle, CheckCircle, Clock, Zap, MapPin, XCircle, AlertCircle, FileText } from 'lucide-react';
 import axios from 'axios';
+import { subscribeToEvents } from '../lib/liveEvents';
+import { applyDashboardDelta } from '../lib/dashboardDelta';
 
 // DSA Visualization Components
 import { TerminalButton, StructureOverlay, MaxHeapVisualization, HashSetGate, OperationToast } from './dsa';
@@ -10,6 +12,7 @@ export function ShipmentQueueViewer() {
   const [data, setData] = useState({ priority_queue: [], pick_list: [], blocked_orders: [] });
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const versionRef = useRef(null); // Last dashboard version seen, sent back as ?since=
 
   // DSA Visualization State
   const [overlayOpen, setOverlayOpen] = useState(false);
@@ -34,8 +37,12 @@ export function ShipmentQueueViewer() {
 
   const fetchData = async () => {
     try {
-      const response = await axios.get('http://127.0.0.1:8000/api/shipping/dashboard');
-      setData(response.data);
+      const since = versionRef.current;
+      const response = await axios.get('http://127.0.0.1:8000/api/shipping/dashboard', {
+        params: since === null ? {} : { since },
+      });
+      versionRef.current = response.data.version;
+      setData((prev) => applyDashboardDelta(prev, response.data));
       setError(null); // Clear error on success
       setLoading(false);
     } catch (err) {
@@ -47,8 +54,8 @@ export function ShipmentQueueViewer() {
 
   useEffect(() => {
     fetchData();
-    const interval = setInterval(fetchData, 5000); // Poll every 5 seconds
-    return () => clearInterval(interval);
+    // Pushed over SSE: refetch when the queue, blocked list or stock changes
+    return subscribeToEvents(['queue', 'blocked', 'stock'], fetchData);
   }, []);
 
   if (loading) return <div className="p-8 text-center text-slate-400">Loading Triage Board...</div>;
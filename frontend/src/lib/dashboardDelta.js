@@ -0,0 +1,35 @@
+// Applies a /api/shipping/dashboard?since=<version> delta to the previous state.
+// Full snapshots ("full": true) simply replace it.
+
+const byPriority = (a, b) =>
+  (b.priority_score - a.priority_score) || ((a.queue_seq ?? 0) - (b.queue_seq ?? 0));
+
+function mergeById(list, upserted, removed) {
+  if (!upserted.length && !removed.length) return list;
+  const drop = new Set(removed);
+  upserted.forEach((o) => drop.add(o.order_id));
+  return list.filter((o) => !drop.has(o.order_id)).concat(upserted);
+}
+
+export function applyDashboardDelta(prev, delta) {
+  if (delta.full) return delta;
+
+  let queue = mergeById(prev.priority_queue, delta.upserted, delta.removed);
+  const stock = delta.stock || {};
+  if (Object.keys(stock).length) {
+    queue = queue.map((o) => (o.item_sku in stock
+      ? { ...o, current_stock: stock[o.item_sku], stock_available: stock[o.item_sku] >= (o.qty ?? 1) }
+      : o));
+  }
+  if (delta.upserted.length) queue = [...queue].sort(byPriority);
+
+  return {
+    ...prev,
+    full: false,
+    version: delta.version,
+    priority_queue: queue,
+    pick_list: delta.pick_list ?? prev.pick_list,
+    blocked_orders: mergeById(prev.blocked_orders, delta.blocked_upserted, delta.blocked_removed),
+    queue_count: delta.queue_count,
+  };
+}
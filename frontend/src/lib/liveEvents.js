@@ -0,0 +1,66 @@
+// Shared Server-Sent Events connection to /api/events/stream.
+// Components subscribe to topics ('queue', 'blocked', 'stock') and refetch
+// their data when something changes, instead of polling on a timer.
+
+const EVENTS_URL = 'http://127.0.0.1:8000/api/events/stream';
+const TOPICS = ['queue', 'blocked', 'stock', 'resync'];
+
+let source = null;
+const subscribers = new Set();
+
+function dispatch(topic) {
+  subscribers.forEach((sub) => {
+    if (topic === 'resync' || sub.topics.includes(topic)) sub.schedule();
+  });
+}
+
+function connect() {
+  source = new EventSource(EVENTS_URL);
+  TOPICS.forEach((topic) => source.addEventListener(topic, () => dispatch(topic)));
+  // 'hello' is sent on every (re)connect. The first one only confirms the
+  // connection the subscribers just fetched alongside; later ones follow a
+  // drop, so events may have been missed while offline
+  let connected = false;
+  source.addEventListener('hello', () => {
+    if (connected) dispatch('resync');
+    connected = true;
+  });
+}
+
+/**
+ * Calls onChange (debounced) whenever one of `topics` changes.
+ * A burst is coalesced into one call `debounceMs` after it goes quiet, but a
+ * steady stream (e.g. a 'stock' event per sales flush) still gets a call at
+ * least every `maxWaitMs`, counted from the first event not yet handled.
+ * Returns an unsubscribe function; the connection closes with the last subscriber.
+ */
+export function subscribeToEvents(topics, onChange, debounceMs = 250, maxWaitMs = 1000) {
+  let timer = null;
+  let firstPending = null; // Time of the oldest event the next call covers
+  const fire = () => {
+    timer = null;
+    firstPending = null;
+    onChange();
+  };
+  const sub = {
+    topics,
+    schedule: () => {
+      const now = Date.now();
+      if (firstPending === null) firstPending = now;
+      clearTimeout(timer);
+      timer = setTimeout(fire, Math.max(0, Math.min(debounceMs, firstPending + maxWaitMs - now)));
+    },
+  };
+
+  subscribers.add(sub);
+  if (!source) connect();
+
+  return () => {
+    clearTimeout(timer);
+    subscribers.delete(sub);
+    if (subscribers.size === 0 && source) {
+      source.close();
+      source = null;
+    }
+  };
+}
@@ -0,0 +1,128 @@
+// Run with `npm test` (node:test, no browser needed): EventSource is faked.
+import { test, beforeEach, afterEach, mock } from 'node:test';
+import assert from 'node:assert/strict';
+import { subscribeToEvents as subscribeToEventsRaw } from './liveEvents.js';
+
+class FakeEventSource {
+  static instances = [];
+
+  constructor(url) {
+    this.url = url;
+    this.listeners = {};
+    this.closed = false;
+    FakeEventSource.instances.push(this);
+  }
+
+  addEventListener(type, fn) {
+    (this.listeners[type] ??= []).push(fn);
+  }
+
+  emit(type) {
+    (this.listeners[type] || []).forEach((fn) => fn({ type }));
+  }
+
+  close() {
+    this.closed = true;
+  }
+}
+
+globalThis.EventSource = FakeEventSource;
+const latest = () => FakeEventSource.instances.at(-1);
+
+// Every subscription is dropped after each test, even a failed one, so the
+// module's shared connection never leaks into the next test
+let open = [];
+function subscribeToEvents(...args) {
+  const unsubscribe = subscribeToEventsRaw(...args);
+  open.push(unsubscribe);
+  return unsubscribe;
+}
+
+beforeEach(() => {
+  FakeEventSource.instances = [];
+  mock.timers.enable({ apis: ['setTimeout', 'Date'] });
+});
+
+afterEach(() => {
+  open.forEach((unsubscribe) => unsubscribe());
+  open = [];
+  mock.timers.reset();
+});
+
+test('first hello after connecting does not refetch', () => {
+  const onChange = mock.fn();
+  const unsubscribe = subscribeToEvents(['queue'], onChange, 100);
+  latest().emit('hello');
+  mock.timers.tick(100);
+  assert.equal(onChange.mock.callCount(), 0);
+  unsubscribe();
+});
+
+test('hello after a reconnect resyncs every subscriber', () => {
+  const queue = mock.fn();
+  const stock = mock.fn();
+  const unsubscribeQueue = subscribeToEvents(['queue'], queue, 100);
+  const unsubscribeStock = subscribeToEvents(['stock'], stock, 100);
+  assert.equal(FakeEventSource.instances.length, 1); // One shared connection
+  latest().emit('hello');
+  latest().emit('hello'); // EventSource reconnected after a drop
+  mock.timers.tick(100);
+  assert.equal(queue.mock.callCount(), 1);
+  assert.equal(stock.mock.callCount(), 1);
+  unsubscribeQueue();
+  unsubscribeStock();
+});
+
+test('topics are filtered and bursts are debounced into one call', () => {
+  const onChange = mock.fn();
+  const unsubscribe = subscribeToEvents(['queue', 'blocked'], onChange, 100);
+  latest().emit('hello');
+  latest().emit('stock');
+  mock.timers.tick(100);
+  assert.equal(onChange.mock.callCount(), 0);
+  latest().emit('queue');
+  mock.timers.tick(50);
+  latest().emit('blocked');
+  mock.timers.tick(99);
+  assert.equal(onChange.mock.callCount(), 0);
+  mock.timers.tick(1);
+  assert.equal(onChange.mock.callCount(), 1);
+  unsubscribe();
+});
+
+test('a sustained stream still refreshes every maxWait', () => {
+  const onChange = mock.fn();
+  subscribeToEvents(['stock'], onChange, 100, 1000);
+  // One 'stock' event per sales flush, every 50 ms, for 3 s: never a 100 ms gap
+  for (let elapsed = 0; elapsed < 3000; elapsed += 50) {
+    latest().emit('stock');
+    mock.timers.tick(50);
+  }
+  assert.equal(onChange.mock.callCount(), 3); // At 1 s, 2 s and 3 s
+  mock.timers.tick(1000); // The last call covered the last event: nothing left to refetch
+  assert.equal(onChange.mock.callCount(), 3);
+});
+
+test('last unsubscribe closes the connection; the next subscriber skips its first hello again', () => {
+  const first = subscribeToEvents(['queue'], mock.fn(), 100);
+  const source = latest();
+  first();
+  assert.ok(source.closed);
+
+  const onChange = mock.fn();
+  const second = subscribeToEvents(['queue'], onChange, 100);
+  assert.notEqual(latest(), source);
+  latest().emit('hello');
+  mock.timers.tick(100);
+  assert.equal(onChange.mock.callCount(), 0);
+  second();
+});
+
+test('unsubscribing cancels a pending call', () => {
+  const onChange = mock.fn();
+  const unsubscribe = subscribeToEvents(['queue'], onChange, 100);
+  latest().emit('queue');
+  unsubscribe();
+  mock.timers.tick(100);
+  assert.equal(onChange.mock.callCount(), 0);
+});
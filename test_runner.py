@@ -6,7 +6,19 @@ import os
 sys.path.append(os.getcwd())
 
 from floor_operations import ShippingQueue, SafetyCheck
-from reporting import InventoryBST, AuditList
+from reporting import InventoryBST, AVLInventoryBST, AuditList
+
+def migrate_db(conn, first=1, last=None):
+    """Applies database_setup.MIGRATIONS versions first..last (default: all) to an open connection."""
+    from database_setup import MIGRATIONS
+    for version, _, steps in MIGRATIONS:
+        if version < first or (last is not None and version > last):
+            continue
+        for step in steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(step)
 
 def run_tests():
     print("="*60)
@@ -123,5 +135,798 @@ def run_tests():
     else:
         print("RESULT: FAIL - Min-Heap did not prioritize lowest value.")
 
+    # --- TEST 7: Indexed Max-Heap (Remove / Re-prioritize by ID) ---
+    print("\n[TEST 7] Indexed Max-Heap Remove & Priority Update")
+    shipping = ShippingQueue()
+    shipping.add_order({'order_id': 'ORD-X', 'tier': 1, 'days_remaining': 10, 'status': 'PENDING'}) # Score 90
+    shipping.add_order({'order_id': 'ORD-Y', 'tier': 1, 'days_remaining': 20, 'status': 'PENDING'}) # Score 80
+    shipping.add_order({'order_id': 'ORD-Z', 'tier': 1, 'days_remaining': 30, 'status': 'PENDING'}) # Score 70
+    
+    removed = shipping.remove_order('ORD-X')
+    shipping.update_order('ORD-Z', {'days_remaining': 5}) # Score 95, jumps ahead of ORD-Y
+    sequence = [shipping.process_next_order()['order_id'] for _ in range(len(shipping))]
+    
+    print(f"Input: Remove ORD-X, bump ORD-Z to 5 days remaining")
+    print(f"Output: removed={removed}, sequence={sequence}")
+    
+    if removed and sequence == ['ORD-Z', 'ORD-Y'] and 'ORD-X' not in shipping:
+        print("RESULT: PASS - Index kept heap consistent.")
+    else:
+        print("RESULT: FAIL - Indexed heap out of sync.")
+
+    # --- TEST 8: AVL Stability Tree (Sorted Input, Delete, Update-Key) ---
+    print("\n[TEST 8] AVL Balancing on Sorted Input")
+    avl = AVLInventoryBST()
+    for i in range(1024):
+        avl.insert(i, f"SKU-{i:04d}", 'Item') # Worst case for a plain BST
+    avl.delete('SKU-0000')
+    avl.update('SKU-1023', 0) # Most stable item becomes the most critical
+    
+    report = avl.in_order_traversal(avl.root)
+    print(f"Input: 1024 sorted inserts, delete SKU-0000, move SKU-1023 to 0 days")
+    print(f"Output: height={avl.root.height}, size={len(avl)}, first={report[0]['sku']}")
+    
+    days = [item['days_remaining'] for item in report]
+    if avl.root.height <= 11 and len(report) == 1023 and report[0]['sku'] == 'SKU-1023' and days == sorted(days):
+        print("RESULT: PASS - Tree stayed balanced and sorted.")
+    else:
+        print("RESULT: FAIL - Tree degenerated or lost ordering.")
+
+    # --- TEST 9: Order-Statistics Queries (Range / Rank / K-th) ---
+    print("\n[TEST 9] BST Range Search, Rank and K-th Most Critical")
+    avl = AVLInventoryBST()
+    for days, sku in [(12, 'SKU-A'), (3, 'SKU-B'), (8, 'SKU-C'), (25, 'SKU-D'), (5, 'SKU-E'), (40, 'SKU-F')]:
+        avl.insert(days, sku, 'Item')
+    
+    in_range = [item['sku'] for item in avl.range_search(5, 12)]
+    below_7 = avl.count_below(7)
+    second = avl.kth_most_critical(2)['sku']
+    
+    print(f"Input Days: 12, 3, 8, 25, 5, 40")
+    print(f"Output: range[5..12]={in_range}, count(<7)={below_7}, 2nd most critical={second}")
+    
+    if in_range == ['SKU-E', 'SKU-C', 'SKU-A'] and below_7 == 2 and second == 'SKU-E':
+        print("RESULT: PASS - Subtree sizes answer range and rank queries.")
+    else:
+        print("RESULT: FAIL - Order-statistics query mismatch.")
+
+    # --- TEST 10: Audit Ring Membership and Cursor ---
+    print("\n[TEST 10] Circular Linked List Add / Remove / Seek")
+    ring = AuditList()
+    for sku in ["SKU-1", "SKU-2", "SKU-3", "SKU-4"]:
+        ring.add_product(sku)
+    ring.seek("SKU-3")
+    ring.remove_product("SKU-3") # Cursor was on the removed shelf
+    ring.add_product("SKU-5")
+    
+    sequence = ring.peek(5)
+    print(f"Seek SKU-3, remove SKU-3, add SKU-5")
+    print(f"Output: {sequence}")
+    
+    if sequence == ["SKU-4", "SKU-5", "SKU-1", "SKU-2", "SKU-4"] and len(ring) == 4:
+        print("RESULT: PASS - Ring stays circular and the cursor moves on.")
+    else:
+        print("RESULT: FAIL - Ring order or cursor is wrong.")
+
+    # --- TEST 11: Live Pick List Aggregate ---
+    print("\n[TEST 11] Pick List Maintained on Add / Update / Dispatch")
+    pq = ShippingQueue(verbose=False)
+    pq.add_order({'order_id': 'P1', 'item_sku': 'SKU-A', 'item_name': 'Apples', 'qty': 4, 'days_remaining': 10})
+    pq.add_order({'order_id': 'P2', 'item_sku': 'SKU-B', 'item_name': 'Bread', 'qty': 5, 'days_remaining': 20})
+    pq.add_order({'order_id': 'P3', 'item_sku': 'SKU-A', 'item_name': 'Apples', 'qty': 3, 'days_remaining': 30})
+    pq.update_order('P2', {'qty': 1})
+    pq.remove_order('P3') # Dispatched
+    pq.add_order({'order_id': 'P4', 'item_sku': 'SKU-C', 'item_name': 'Cheese', 'qty': 2, 'days_remaining': 5})
+    
+    pick = [(item['sku'], item['qty'], item['count']) for item in pq.get_optimized_pick_list()]
+    print(f"Output: {pick}")
+    
+    if pick == [('SKU-A', 4, 1), ('SKU-C', 2, 1), ('SKU-B', 1, 1)] and pq.get_optimized_pick_list(1)[0]['sku'] == 'SKU-A':
+        print("RESULT: PASS - Aggregate and quantity order kept live.")
+    else:
+        print("RESULT: FAIL - Pick list drifted from the queue.")
+
+    # --- TEST 12: Hot Query Plans Use Indexes ---
+    print("\n[TEST 12] EXPLAIN QUERY PLAN on Hot Queries (no full table scans)")
+    import sqlite3
+    import tempfile
+    import contextlib
+    import io
+    import connection_manager
+    import data_ingestion
+    from database_setup import migrate
+    from connection_manager import get_connection, transaction
+    from sales_snapshot import refresh_snapshot
+    
+    # Run the real read paths against a migrated DB and EXPLAIN exactly the
+    # statements they sent (trace callback), so the list cannot drift from the code
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        saved_path = connection_manager.DB_PATH
+        connection_manager.configure(path=os.path.join(tmp, "plans_test.db"))
+        import api
+        migrate()
+        with transaction() as conn:
+            conn.executemany("INSERT INTO products (sku, name, current_stock, unit_cost) VALUES (?, ?, 100, 1.0)",
+                             [('SKU001', 'Item 1'), ('SKU002', 'Item 2')])
+            conn.executemany("INSERT INTO sales_history (sku, qty_sold, sale_date) VALUES (?, ?, ?)",
+                             [('SKU001', 3, '2026-01-01'), ('SKU002', 1, '2026-01-02')])
+            conn.execute("INSERT INTO customer_orders (order_id, customer_tier, order_date, sku, qty_requested, status) "
+                         "VALUES ('Q1', 1, '2026-01-02', 'SKU001', 1, 'PENDING')")
+        api.product_catalog.reload()
+        refresh_snapshot() # The first export reads everything on purpose; only refreshes are hot
+        with transaction() as conn:
+            conn.execute("INSERT INTO sales_history (sku, qty_sold, sale_date) VALUES ('SKU001', 2, '2026-01-02')")
+        saved_queue = api.shipping_queue
+        api.shipping_queue = ShippingQueue(verbose=False)
+        api.shipping_queue.add_order({'order_id': 'Q1', 'item_sku': 'SKU001', 'qty': 1, 'tier': 1, 'status': 'PENDING'})
+        
+        captured = []
+        traced = get_connection()
+        traced.set_trace_callback(captured.append)
+        data_ingestion.get_sales_array('SKU001')
+        data_ingestion.get_sales_array('SKU001', days=56)
+        data_ingestion.get_sales_totals(['SKU001', 'SKU002'])
+        data_ingestion.get_daily_sales(56)
+        list(data_ingestion.iter_orders_by_status('PENDING'))
+        data_ingestion.get_all_orders()
+        refresh_snapshot()
+        api.get_shipping_dashboard() # Self-heal lookup of the queued order IDs
+        traced.set_trace_callback(None)
+        
+        # Reads and keyed writes; the change-mark table is read whole by design (only days changed since the last refresh)
+        statements = [query for query in dict.fromkeys(captured)
+                      if query.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE'))
+                      and not query.lstrip().upper().startswith('SELECT SALE_DATE, VERSION FROM DAILY_SALES_CHANGES')]
+        plans = [(query, [row[3] for row in traced.execute(f"EXPLAIN QUERY PLAN {query}")]) for query in statements]
+        api.shipping_queue = saved_queue
+        connection_manager.configure(path=saved_path)
+    
+    full_scans = []
+    for query, plan in plans:
+        label = ' '.join(query.split())[:70]
+        print(f"  {label:<72} {' | '.join(plan)}")
+        # "SCAN t" alone reads the whole table; "SCAN t USING INDEX" only walks an index in order
+        if any(step.startswith("SCAN") and "INDEX" not in step for step in plan):
+            full_scans.append(label)
+        if any("TEMP B-TREE FOR ORDER BY" in step for step in plan):
+            full_scans.append(f"{label} (sort)")
+    # Every hot path actually ran (a renamed function would otherwise drop out silently)
+    expected = ["FROM daily_sales WHERE sku = ", "WHERE sku IN (", "MAX(sale_date)", "WHERE sale_date >= ",
+                "WHERE status = ", "FROM customer_orders ORDER BY", "status = 'SHIPPED'"]
+    missing = [marker for marker in expected if not any(marker in query for query, _ in plans)]
+    
+    if plans and not full_scans and not missing:
+        print(f"RESULT: PASS - All {len(plans)} captured hot queries are served by an index.")
+    else:
+        print(f"RESULT: FAIL - Full scan / sort in: {full_scans}; paths not captured: {missing}")
+
+    # --- TEST 13: Vectorized Demand Forecast ---
+    print("\n[TEST 13] Demand Forecast (Moving Averages, Smoothing, Days of Cover)")
+    import numpy as np
+    from forecasting import DemandForecast, forecast_matrix, NO_SALES_DAYS
+    
+    history = np.array([
+        [2, 4, 0, 6, 2, 4, 0, 6, 2, 4], # Steady ~3/day
+        [0, 0, 0, 0, 0, 0, 0, 0, 10, 10], # Recent spike
+        [0] * 10, # No demand
+    ], dtype=np.float32)
+    stats = forecast_matrix(history, alpha=0.3, short_window=2, long_window=10)
+    level = history[:, 0].astype(np.float64)
+    for day in range(1, history.shape[1]):
+        level = 0.3 * history[:, day] + 0.7 * level # Reference: iterative smoothing
+    
+    forecast = DemandForecast(window_days=10, alpha=0.3).fit(['STEADY', 'SPIKE', 'IDLE'], history)
+    cover = [round(forecast.days_of_cover(sku, 30), 2) for sku in ['STEADY', 'SPIKE', 'IDLE', 'UNKNOWN']]
+    print(f"Output: rate={np.round(stats['rate'], 2).tolist()} cover(30 units)={cover}")
+    
+    if (np.allclose(stats['smoothed'], level, atol=1e-4)
+            and np.allclose(stats['ma_long'], [3, 2, 0]) and stats['ma_short'][1] == 10
+            and cover[1] == round(30 / max(level[1], 20 / 7), 2) and cover[2] == NO_SALES_DAYS and cover[3] == NO_SALES_DAYS
+            and forecast.days_of_cover_many(['IDLE', 'UNKNOWN', 'STEADY'], [30, 5, 0]).tolist() == [NO_SALES_DAYS, NO_SALES_DAYS, 0]):
+        print("RESULT: PASS - Vectorized statistics match the per-SKU definitions.")
+    else:
+        print("RESULT: FAIL - Forecast statistics are off.")
+
+    # --- TEST 14: Daily Sales Rollup Maintained by Triggers ---
+    print("\n[TEST 14] Daily Sales Rollup Follows Inserts / Updates / Deletes (API and inventory.db schemas)")
+    from seed_db import create_daily_sales
+    
+    # API layout (database_setup.py migrations)
+    main_db = sqlite3.connect(":memory:")
+    migrate_db(main_db)
+    
+    # inventory.db layout (seed_db.py): rollup added after sales were recorded, then backfilled
+    seed_db = sqlite3.connect(":memory:")
+    seed_db.execute("CREATE TABLE sales_history (transaction_id INTEGER PRIMARY KEY AUTOINCREMENT, SKU TEXT NOT NULL, "
+                    "quantity_sold INTEGER NOT NULL, sale_date TEXT NOT NULL)")
+    seed_db.executemany("INSERT INTO sales_history (SKU, quantity_sold, sale_date) VALUES (?, ?, ?)",
+                        [('SKU-A', 3, '2026-01-01'), ('SKU-A', 2, '2026-01-01')])
+    create_daily_sales(seed_db.cursor())
+    
+    rollups = {}
+    for label, conn, qty in [('migrations', main_db, 'qty_sold'), ('seed_db', seed_db, 'quantity_sold')]:
+        if label == 'migrations':
+            conn.executemany(f"INSERT INTO sales_history (sku, {qty}, sale_date) VALUES (?, ?, ?)",
+                             [('SKU-A', 3, '2026-01-01'), ('SKU-A', 2, '2026-01-01')])
+        conn.executemany(f"INSERT INTO sales_history (sku, {qty}, sale_date) VALUES (?, ?, ?)", [
+            ('SKU-A', 4, '2026-01-02'), ('SKU-B', 1, '2026-01-01'), ('SKU-B', 6, '2026-01-03'),
+        ])
+        conn.execute(f"UPDATE sales_history SET {qty} = 5 WHERE sku = 'SKU-A' AND sale_date = '2026-01-02'")
+        conn.execute("UPDATE sales_history SET sale_date = '2026-01-02' WHERE sku = 'SKU-B' AND sale_date = '2026-01-03'")
+        conn.execute("DELETE FROM sales_history WHERE sku = 'SKU-B' AND sale_date = '2026-01-01'")
+        
+        rollup = conn.execute(f"SELECT sku, sale_date, {qty}, txn_count FROM daily_sales ORDER BY sku, sale_date").fetchall()
+        expected = conn.execute(
+            f"SELECT sku, sale_date, SUM({qty}), COUNT(*) FROM sales_history GROUP BY sku, sale_date ORDER BY sku, sale_date"
+        ).fetchall()
+        rollups[label] = (rollup, expected)
+        print(f"Output ({label}): {rollup}")
+    
+    target = [('SKU-A', '2026-01-01', 5, 2), ('SKU-A', '2026-01-02', 5, 1), ('SKU-B', '2026-01-02', 6, 1)]
+    if all(rollup == expected == target for rollup, expected in rollups.values()):
+        print("RESULT: PASS - Both rollups equal a fresh GROUP BY of the raw rows.")
+    else:
+        print(f"RESULT: FAIL - Rollup drifted: {rollups}")
+
+    # --- TEST 15: Columnar Sales Snapshot (memmap) ---
+    print("\n[TEST 15] Columnar Snapshot Incremental Refresh == Full Rebuild")
+    import tempfile
+    import shutil
+    import threading
+    import numpy as np
+    from connection_manager import get_connection, transaction
+    from sales_snapshot import refresh_snapshot, SalesSnapshot, MAX_SEGMENTS, default_path
+    
+    def history(snapshot):
+        return {sku: [day_qty.tolist() for day_qty in snapshot.series(sku)] for sku in snapshot.skus if len(snapshot.series(sku)[0])}
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "snapshot_test.db")
+        insert = "INSERT INTO sales_history (sku, qty_sold, sale_date) VALUES (?, ?, ?)"
+        with transaction(db_file) as conn:
+            migrate_db(conn)
+            conn.executemany(insert, [('SKU-B', 2, '2026-01-01'), ('SKU-A', 5, '2026-01-02'), ('SKU-B', 1, '2026-01-03')])
+        first = refresh_snapshot(db_name=db_file)
+        unchanged = refresh_snapshot(db_name=db_file)
+        with transaction(db_file) as conn:
+            # Same last day again (partial day), a new day, a new SKU, a back-dated
+            # sale and a correction that empties an old day
+            conn.executemany(insert, [('SKU-B', 4, '2026-01-03'), ('SKU-A', 3, '2026-01-04'), ('SKU-C', 7, '2026-01-04'),
+                                      ('SKU-C', 9, '2025-12-30')])
+            conn.execute("DELETE FROM sales_history WHERE sale_date = '2026-01-01'")
+        incremental = refresh_snapshot(db_name=db_file)
+        rebuilt = refresh_snapshot(db_name=db_file, full=True)
+        
+        days, qty = rebuilt.series('SKU-B')
+        units, active = rebuilt.window(2) # 2026-01-03 .. 2026-01-04
+        print(f"Output: SKU-B qty={qty.tolist()} window units={units.tolist()} active={active.tolist()} "
+              f"segments={len(incremental.segments)}")
+        merged_ok = (history(incremental) == history(rebuilt) and unchanged.meta['generation'] == first.meta['generation']
+                     and len(incremental.segments) == 2 and qty.tolist() == [5]
+                     and isinstance(qty, np.memmap) # series() is a slice of one segment's SKU rows
+                     and dict(zip(rebuilt.skus, units.tolist())) == {'SKU-B': 5, 'SKU-A': 3, 'SKU-C': 7}
+                     and incremental.window_matrix(2).sum() == rebuilt.window_matrix(2).sum() == 15)
+        
+        # Many back-dated refreshes: the tail is compacted, the result still matches a rebuild
+        for i in range(MAX_SEGMENTS * 2):
+            with transaction(db_file) as conn:
+                conn.execute(insert, ('SKU-A', i + 1, f"2025-12-{1 + i % 28:02d}"))
+            compacted = refresh_snapshot(db_name=db_file)
+        compacted_ok = (len(compacted.segments) <= MAX_SEGMENTS
+                        and history(compacted) == history(refresh_snapshot(db_name=db_file, full=True)))
+        
+        # Concurrent refreshes are serialized by the lock: nothing lost, no generation reused
+        with transaction(db_file) as conn:
+            conn.execute(insert, ('SKU-D', 1, '2026-01-05'))
+        errors = []
+        def refresh_worker():
+            try:
+                refresh_snapshot(db_name=db_file)
+            except Exception as e:
+                errors.append(e)
+        workers = [threading.Thread(target=refresh_worker) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        concurrent = SalesSnapshot.open(default_path(db_file))
+        concurrent_ok = not errors and 'SKU-D' in history(concurrent) and \
+            history(concurrent) == history(refresh_snapshot(db_name=db_file, full=True))
+        
+        # A pruned segment makes open() return None instead of raising; refresh rebuilds
+        current = SalesSnapshot.open(default_path(db_file))
+        shutil.rmtree(os.path.join(default_path(db_file), current.meta['segments'][0]['name']))
+        missing = SalesSnapshot.open(default_path(db_file))
+        healed = refresh_snapshot(db_name=db_file)
+        recover_ok = missing is None and history(healed) == history(current)
+        print(f"Output: compacted segments={len(compacted.segments)} concurrent errors={errors} "
+              f"open after prune={missing} recovered={recover_ok}")
+        
+        if merged_ok and compacted_ok and concurrent_ok and recover_ok:
+            print("RESULT: PASS - Incremental segments (incl. back-dated days) match a rebuild; reads are memmap views.")
+        else:
+            print(f"RESULT: FAIL - Snapshot columns are wrong (merge={merged_ok}, compaction={compacted_ok}, "
+                  f"concurrent={concurrent_ok}, recovery={recover_ok}).")
+
+    # --- TEST 16: Group-Committed Sales Ingestion + Incremental Forecast ---
+    print("\n[TEST 16] Sales Micro-Batching (group commit) Feeds the Forecast Incrementally")
+    import threading
+    from sales_ingest import SalesBatcher
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "sales_test.db")
+        with transaction(db_file) as conn:
+            migrate_db(conn)
+        
+        forecast = DemandForecast(window_days=10, alpha=0.3)
+        forecast.fit(['SKU-A', 'SKU-B'], np.ones((2, 10), dtype=np.float32), '2026-01-10')
+        batcher = SalesBatcher(interval_ms=20, max_rows=500, db_path=db_file)
+        batcher.add_listener(forecast.add_sales)
+        batcher.start()
+        
+        def pos_terminal(terminal):
+            for i in range(50):
+                batcher.submit([('SKU-A', 1, '2026-01-10'), (f"SKU-T{terminal}", 2, '2026-01-09')])
+        terminals = [threading.Thread(target=pos_terminal, args=(t,)) for t in range(4)]
+        for thread in terminals:
+            thread.start()
+        for thread in terminals:
+            thread.join()
+        committed = batcher.wait(batcher.submit([('SKU-B', 5, '2026-01-10')]), timeout=5)
+        batcher.stop()
+        
+        stored = get_connection(db_file).execute("SELECT COUNT(*), SUM(qty_sold) FROM sales_history").fetchone()
+        expected = np.ones((6, 10), dtype=np.float32)
+        expected[2:] = 0
+        expected[0, 9] += 200
+        expected[1, 9] += 5
+        expected[2:, 8] = 100
+        refit = forecast_matrix(expected, alpha=0.3)['rate']
+        rates = [forecast.rate_of(sku) for sku in ['SKU-A', 'SKU-B', 'SKU-T0', 'SKU-T1', 'SKU-T2', 'SKU-T3']]
+        print(f"Output: committed={committed} rows/units={stored} batches={batcher.stats['batches']} rates={np.round(rates, 2).tolist()}")
+        
+        if (committed and stored == (401, 605) and batcher.stats['batches'] < 401 and batcher.pending() == 0
+                and np.allclose(rates, refit)):
+            print("RESULT: PASS - 401 events in few commits; forecast equals a full refit.")
+        else:
+            print("RESULT: FAIL - Lost events or forecast drifted.")
+
+    # --- TEST 17: Concurrent Dispatch Cannot Oversell ---
+    print("\n[TEST 17] Reservation Ledger (conditional UPDATE) Under Concurrent Dispatch")
+    from reservations import dispatch, ReservationError, AlreadyShipped
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "dispatch_test.db")
+        with transaction(db_file) as conn:
+            migrate_db(conn)
+            conn.execute("INSERT INTO products (sku, name, current_stock) VALUES ('SKU-HOT', 'Hot Item', 50)")
+            conn.executemany("INSERT INTO customer_orders (order_id, customer_tier, sku, qty_requested, status) VALUES (?, 1, 'SKU-HOT', 1, 'PENDING')",
+                             [(f"ORD-{i}",) for i in range(100)])
+        
+        outcomes = []
+        def dispatcher(order_ids):
+            for order_id in order_ids:
+                try:
+                    with transaction(db_file) as conn:
+                        dispatch(conn, order_id)
+                    outcomes.append('shipped')
+                except ReservationError as e:
+                    outcomes.append(type(e).__name__)
+        # Every order twice, so double dispatches race as well
+        order_ids = [f"ORD-{i}" for i in range(100)] * 2
+        dispatchers = [threading.Thread(target=dispatcher, args=(order_ids[i::8],)) for i in range(8)]
+        for thread in dispatchers:
+            thread.start()
+        for thread in dispatchers:
+            thread.join()
+        
+        conn = get_connection(db_file)
+        stock = conn.execute("SELECT current_stock FROM products WHERE sku = 'SKU-HOT'").fetchone()[0]
+        shipped = conn.execute("SELECT COUNT(*) FROM customer_orders WHERE status = 'SHIPPED'").fetchone()[0]
+        ledger = conn.execute("SELECT COUNT(*), SUM(qty), MIN(stock_after) FROM stock_reservations").fetchone()
+        print(f"Output: shipped={outcomes.count('shipped')} rejected={outcomes.count('InsufficientStock')} "
+              f"already={outcomes.count('AlreadyShipped')} stock={stock} ledger={ledger}")
+        
+        if stock == 0 and shipped == 50 and outcomes.count('shipped') == 50 and ledger == (50, 50, 0):
+            print("RESULT: PASS - Exactly the 50 units on hand were dispatched; stock never went negative.")
+        else:
+            print("RESULT: FAIL - Oversold or lost dispatches.")
+
+    # --- TEST 18: Block-Allocated Order IDs ---
+    print("\n[TEST 18] Order ID Allocator (persisted sequence, block pre-allocation)")
+    from order_ids import OrderIdAllocator
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "order_ids_test.db")
+        with transaction(db_file) as conn:
+            migrate_db(conn, last=5)
+            # Orders written before the sequence existed (migration 6): numeric and legacy hex IDs
+            conn.executemany("INSERT INTO customer_orders (order_id) VALUES (?)", [("ORD-1500",), ("ORD-5B2B",)])
+            migrate_db(conn, first=6)
+        
+        # Two allocators stand in for two API worker processes sharing the DB
+        workers = [OrderIdAllocator(block_size=64, db_path=db_file) for _ in range(2)]
+        issued = []
+        def take_ids(allocator):
+            for i in range(200):
+                ids = allocator.next_ids(1 + i % 3)
+                issued.append(ids)
+        threads = [threading.Thread(target=take_ids, args=(workers[i % 2],)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        all_ids = [order_id for ids in issued for order_id in ids]
+        numbers = [int(order_id[4:]) for order_id in all_ids]
+        next_value = get_connection(db_file).execute("SELECT next_value FROM id_sequences WHERE name = 'order'").fetchone()[0]
+        print(f"Output: {len(all_ids)} ids, unique={len(set(all_ids))}, first={min(all_ids)}, last={max(all_ids)}, sequence at {next_value}")
+        
+        sortable = sorted(all_ids) == [f"ORD-{n:010d}" for n in sorted(numbers)]
+        in_order = all(ids == sorted(ids) for ids in issued)
+        if len(set(all_ids)) == len(all_ids) == 2394 and min(numbers) == 1501 and sortable and in_order \
+                and next_value - 1501 <= 2394 + 2 * 64:
+            print("RESULT: PASS - No collisions across workers; IDs sort in allocation order.")
+        else:
+            print("RESULT: FAIL - Duplicate, unsorted or wasted IDs.")
+
+    # --- TEST 19: ShippingQueue Under Concurrent Writers ---
+    print("\n[TEST 19] Shipping Queue Lock (request threads vs sales flusher re-prioritizing)")
+    import random
+    
+    failures = {}
+    consistent = {}
+    for backend in ('heap', 'bucket'):
+        pq = ShippingQueue(backend=backend, verbose=False)
+        errors = []
+        stop = threading.Event()
+        
+        def request_thread(seed):
+            # Adds and dispatches orders like the API's threadpool does
+            rng = random.Random(seed)
+            try:
+                for i in range(3000):
+                    pq.add_order({'order_id': f"{seed}-{i}", 'item_sku': f"SKU-{rng.randrange(5)}", 'qty': 1,
+                                  'tier': 1, 'days_remaining': rng.randint(1, 90), 'status': 'PENDING'})
+                    if i % 2:
+                        pq.remove_order(f"{seed}-{rng.randrange(i)}")
+                    if i % 50 == 0:
+                        pq.get_queue_status()
+            except Exception as e:
+                errors.append(repr(e))
+        
+        def flusher_thread():
+            # apply_sales_batch: re-prioritizes every pending order of the touched SKUs
+            rng = random.Random(7)
+            try:
+                while not stop.is_set():
+                    pq.update_orders_by_sku({f"SKU-{sku}": {'days_remaining': rng.randint(1, 90)} for sku in range(5)})
+            except Exception as e:
+                errors.append(repr(e))
+        
+        flusher = threading.Thread(target=flusher_thread)
+        requests = [threading.Thread(target=request_thread, args=(seed,)) for seed in range(3)]
+        flusher.start()
+        for thread in requests:
+            thread.start()
+        for thread in requests:
+            thread.join()
+        stop.set()
+        flusher.join()
+        
+        queued = pq.get_queue_status()
+        picked = sum(item['qty'] for item in pq.get_optimized_pick_list())
+        failures[backend] = errors
+        consistent[backend] = len(queued) == len(pq) == picked
+    
+    print(f"Output: errors={ {backend: len(errors) for backend, errors in failures.items()} } consistent={consistent}")
+    if not any(failures.values()) and all(consistent.values()):
+        print("RESULT: PASS - Queue, index and pick list stayed consistent under concurrent writers.")
+    else:
+        print(f"RESULT: FAIL - Concurrent mutation broke the queue: {[e for errors in failures.values() for e in errors][:3]}")
+
+    # --- TEST 20: Batch Stock Update Re-prioritizes Each Pending Order Once ---
+    print("\n[TEST 20] Stock Batch Re-prioritizes the Affected Pending Orders Exactly Once")
+    import contextlib
+    import io
+    import connection_manager
+    from database_setup import migrate
+    
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        saved_path = connection_manager.DB_PATH
+        connection_manager.configure(path=os.path.join(tmp, "stock_batch_test.db"))
+        import api
+        migrate()
+        with transaction() as conn:
+            conn.executemany("INSERT INTO products (sku, name, current_stock, unit_cost) VALUES (?, ?, 100, 1.0)",
+                             [(sku, f"Item {sku}") for sku in ('SKU-A', 'SKU-B', 'SKU-C')])
+        api.product_catalog.reload()
+        api.demand_forecast.fit(['SKU-A', 'SKU-B', 'SKU-C'], np.full((3, 56), 10, dtype=np.float32)) # 10 units/day
+        
+        saved_queue = api.shipping_queue
+        api.shipping_queue = ShippingQueue(verbose=False)
+        for order_id, sku in [('A1', 'SKU-A'), ('A2', 'SKU-A'), ('B1', 'SKU-B'), ('C1', 'SKU-C')]:
+            api.shipping_queue.add_order({'order_id': order_id, 'item_sku': sku, 'qty': 1, 'tier': 1, 'status': 'PENDING',
+                                          'days_remaining': api.estimate_days_remaining(sku, 100)})
+        updates = []
+        api.shipping_queue.add_listener(lambda event, order: updates.append(order['order_id']) if event == 'update' else None)
+        
+        response = api.update_stock_batch(api.StockBatch(updates=[
+            api.StockAdjustment(sku='SKU-A', delta=-50),
+            api.StockAdjustment(sku='SKU-A', delta=10), # Same SKU twice: still one re-prioritization
+            api.StockAdjustment(sku='SKU-B', new_stock=100), # Unchanged cover: nothing to move
+            api.StockAdjustment(sku='SKU-X', delta=5), # Unknown SKU
+        ]))
+        queue = {order['order_id']: order['days_remaining'] for order in api.shipping_queue.get_queue_status()}
+        api.shipping_queue = saved_queue
+        connection_manager.configure(path=saved_path)
+    
+    print(f"Output: applied={response['applied']} rejected={response['rejected']} "
+          f"reprioritized={response['reprioritized_orders']} updates={sorted(updates)} days={queue}")
+    if (response['applied'], response['rejected'], response['reprioritized_orders']) == (3, 1, 2) \
+            and sorted(updates) == ['A1', 'A2'] and queue == {'A1': 6, 'A2': 6, 'B1': 10, 'C1': 10}:
+        print("RESULT: PASS - Only SKU-A's pending orders moved, once each, to the new cover.")
+    else:
+        print("RESULT: FAIL - Wrong orders re-prioritized or re-prioritized more than once.")
+
+    # --- TEST 21: Versions Move Only After Derived Views (ETag safety) ---
+    print("\n[TEST 21] Version Bumps Follow Derived-View Updates; Counter Bumps Are Atomic")
+    from data_ingestion import ProductCatalog
+    
+    catalog = ProductCatalog()
+    catalog._products = {'SKU-A': {'name': 'Item', 'stock': 10, 'lead': 7, 'price': 1.0}}
+    seen = []
+    # A listener is a derived view (stability index): the version must not have moved yet.
+    # A watcher announces the change (SSE): a refetch must already see the new version.
+    catalog.add_listener(lambda event, sku, record: seen.append(('view', catalog.version)))
+    catalog.add_watcher(lambda event, sku, record: seen.append(('announce', catalog.version)))
+    catalog.set_stock('SKU-A', 4)
+    catalog.set_stock_many({'SKU-A': 3})
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        import api
+    start = api.order_history_version
+    writers = [threading.Thread(target=lambda: [api.bump_order_history() for _ in range(20000)]) for _ in range(4)]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    bumps = api.order_history_version - start
+    
+    print(f"Output: {seen}, order history bumps={bumps}")
+    if seen == [('view', 0), ('announce', 1), ('view', 1), ('announce', 2)] and bumps == 80000:
+        print("RESULT: PASS - Views update before the version moves; no bump is lost.")
+    else:
+        print("RESULT: FAIL - A reader could cache a stale body under a new ETag.")
+
+    # --- TEST 22: Heap and Bucket Backends Agree ---
+    print("\n[TEST 22] Heap vs Bucket Backend: Same Operations, Same Order (float scores, re-prioritize)")
+    snapshots = {}
+    for backend in ('heap', 'bucket'):
+        rng = random.Random(11)
+        pq = ShippingQueue(backend=backend, verbose=False)
+        popped = []
+        for i in range(2000):
+            # Fractional days put several distinct scores into one integer range
+            days = rng.choice([rng.randint(1, 60), round(rng.uniform(1, 60), 2)])
+            pq.add_order({'order_id': f"O-{i}", 'tier': rng.choice([1, 2]), 'days_remaining': days, 'status': 'PENDING'})
+            action = rng.random()
+            if action < 0.3:
+                pq.update_order(f"O-{rng.randrange(i + 1)}", {'days_remaining': rng.choice([rng.randint(1, 60), rng.uniform(1, 60)])})
+            elif action < 0.4:
+                pq.remove_order(f"O-{rng.randrange(i + 1)}")
+            elif action < 0.5:
+                popped.append(pq.process_next_order()['order_id'])
+        pq.add_orders([{'order_id': f"B-{i}", 'tier': 1, 'days_remaining': 30.5, 'status': 'PENDING'} for i in range(50)])
+        snapshots[backend] = (popped, [order['order_id'] for order in pq.get_queue_status()])
+    
+    heap_order = snapshots['heap'][1]
+    print(f"Output: pops equal={snapshots['heap'][0] == snapshots['bucket'][0]} "
+          f"snapshots equal={snapshots['heap'] == snapshots['bucket']} ({len(heap_order)} queued)")
+    if snapshots['heap'] == snapshots['bucket'] and len(heap_order) > 1000:
+        print("RESULT: PASS - Both backends pop and list orders identically.")
+    else:
+        print("RESULT: FAIL - Backends disagree on priority order.")
+
+    # --- TEST 23: Dashboard Delta Sync == Fresh Full Fetch ---
+    print("\n[TEST 23] Dashboard ?since= Deltas Applied by the Client Match a Full Fetch (and Fall Back When Behind)")
+    import json
+    from floor_operations import BlockedQueue, ChangeLog
+    
+    def apply_dashboard_delta(prev, delta):
+        """The client side of ?since=, as in frontend/src/lib/dashboardDelta.js."""
+        if delta['full']:
+            return delta
+        def merge(items, upserted, removed):
+            drop = set(removed) | {o['order_id'] for o in upserted}
+            return [o for o in items if o['order_id'] not in drop] + upserted
+        stock = delta['stock']
+        queue = [{**o, 'current_stock': stock[o['item_sku']], 'stock_available': stock[o['item_sku']] >= o.get('qty', 1)}
+                 if o.get('item_sku') in stock else o
+                 for o in merge(prev['priority_queue'], delta['upserted'], delta['removed'])]
+        if delta['upserted']:
+            queue.sort(key=lambda o: (-o['priority_score'], o.get('queue_seq', 0)))
+        return {**prev, 'full': False, 'version': delta['version'], 'priority_queue': queue,
+                'pick_list': delta.get('pick_list', prev['pick_list']),
+                'blocked_orders': merge(prev['blocked_orders'], delta['blocked_upserted'], delta['blocked_removed']),
+                'queue_count': delta['queue_count']}
+    
+    def view(state):
+        return (state['priority_queue'], state['pick_list'], state['queue_count'],
+                sorted(state['blocked_orders'], key=lambda o: o['order_id']))
+    
+    def fetch(since=None):
+        return json.loads(json.dumps(api.get_shipping_dashboard(since=since))) # What the client receives
+    
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        saved_path = connection_manager.DB_PATH
+        connection_manager.configure(path=os.path.join(tmp, "delta_sync_test.db"))
+        migrate()
+        skus = ['SKU-A', 'SKU-B', 'SKU-C']
+        with transaction() as conn:
+            conn.executemany("INSERT INTO products (sku, name, current_stock, unit_cost) VALUES (?, ?, 5, 1.0)",
+                             [(sku, f"Item {sku}") for sku in skus])
+        api.product_catalog.reload()
+        saved = (api.shipping_queue, api.blocked_queue, api.shipping_log)
+        api.shipping_queue, api.blocked_queue = ShippingQueue(verbose=False), BlockedQueue()
+        api.shipping_queue.add_listener(api.log_queue_change)
+        api.blocked_queue.add_listener(api.log_blocked_change)
+        
+        rng = random.Random(23)
+        next_id = [0]
+        def random_change():
+            queued = [o['order_id'] for o in api.shipping_queue.get_queue_status()]
+            if rng.random() < 0.1:
+                # Batches reach listeners as one 'add_batch' / 'block_batch' change
+                start = next_id[0]
+                next_id[0] += 3
+                api.shipping_queue.add_orders([{'order_id': f"D-{i}", 'item_sku': rng.choice(skus), 'qty': 1, 'tier': 1,
+                                                'days_remaining': rng.randint(1, 30), 'status': 'PENDING'}
+                                               for i in range(start + 1, start + 3)] +
+                                              [{'order_id': rng.choice(queued), 'days_remaining': 2}] * bool(queued))
+                api.blocked_queue.add_blocked_orders([{'order_id': f"X-{next_id[0]}", 'item_sku': 'SKU-B', 'qty': 1}], 'Batch hold')
+                return
+            action = rng.random()
+            if action < 0.35 or not queued:
+                next_id[0] += 1
+                api.shipping_queue.add_order({'order_id': f"D-{next_id[0]}", 'item_sku': rng.choice(skus + ['SKU-Z']),
+                                              'qty': rng.randint(1, 4), 'tier': rng.choice([1, 2]),
+                                              'days_remaining': rng.randint(1, 30), 'status': 'PENDING'})
+            elif action < 0.5:
+                api.shipping_queue.update_order(rng.choice(queued), {'days_remaining': rng.randint(1, 30)})
+            elif action < 0.6:
+                api.shipping_queue.remove_order(rng.choice(queued))
+            elif action < 0.7:
+                api.shipping_queue.process_next_order()
+            elif action < 0.85:
+                api.product_catalog.set_stock(rng.choice(skus), rng.randint(0, 6))
+            elif action < 0.95:
+                next_id[0] += 1
+                api.blocked_queue.add_blocked_order({'order_id': f"X-{next_id[0]}", 'item_sku': 'SKU-A', 'qty': 1}, 'Recalled lot')
+            elif api.blocked_queue.get_blocked_list():
+                api.blocked_queue.resolve_order(rng.choice(api.blocked_queue.get_blocked_list())['order_id'])
+        
+        state = fetch()
+        mismatches, deltas = [], 0
+        for round_no in range(60):
+            for _ in range(rng.randint(1, 6)):
+                random_change()
+            if round_no % 4 == 3:
+                continue # Client missed a poll: the next delta spans several rounds
+            response = fetch(since=state['version'])
+            deltas += not response['full']
+            state = apply_dashboard_delta(state, response)
+            if view(state) != view(fetch()):
+                mismatches.append(round_no)
+        
+        # Too far behind: the log dropped entries after the client's version
+        api.shipping_log = ChangeLog(max_entries=5)
+        behind = state['version']
+        for _ in range(12):
+            random_change()
+        fallback = fetch(since=behind)
+        stale = fetch(since=0) # Version from an earlier server process
+        state = apply_dashboard_delta(state, fallback)
+        fallback_ok = fallback['full'] and stale['full'] and view(state) == view(fetch())
+        random_change()
+        resumed = fetch(since=state['version'])
+        fallback_ok = fallback_ok and not resumed['full'] and view(apply_dashboard_delta(state, resumed)) == view(fetch())
+        
+        # A batch is one queue change and one log version, however many orders it holds
+        queue_version = api.shipping_queue.version
+        api.shipping_log = ChangeLog()
+        log_version = api.shipping_log.version
+        api.shipping_queue.add_orders([{'order_id': f"BATCH-{i}", 'item_sku': 'SKU-C', 'qty': 1, 'tier': 1,
+                                        'days_remaining': 5, 'status': 'PENDING'} for i in range(50)])
+        batch_ok = (api.shipping_queue.version == queue_version + 1 and api.shipping_log.version == log_version + 1
+                    and len(api.shipping_log.changes_since(log_version)['order']) == 50)
+        
+        api.shipping_queue, api.blocked_queue, api.shipping_log = saved
+        connection_manager.configure(path=saved_path)
+    
+    print(f"Output: {deltas} deltas applied, mismatches={mismatches}, fallback to full={fallback_ok}, one change per batch={batch_ok}")
+    if deltas >= 40 and not mismatches and fallback_ok and batch_ok:
+        print("RESULT: PASS - Every delta reproduced the full snapshot; stale clients got a full one.")
+    else:
+        print("RESULT: FAIL - Delta sync diverged from a fresh full fetch.")
+
+    # --- TEST 24: Overlapping Report Downloads Share One Render ---
+    print("\n[TEST 24] Two Concurrent Downloads of the Same Report Both Get the PDF")
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    import report_jobs
+    
+    manager = report_jobs.ReportJobManager()
+    manager._executor = ThreadPoolExecutor(max_workers=2) # Same pool API, no worker processes
+    saved_render = report_jobs.render_report_pdf
+    report_jobs.render_report_pdf = lambda lang, data: f"PDF {lang} {data}".encode()
+    gathering = threading.Event()
+    gathers = []
+    def slow_gather():
+        gathers.append(1)
+        gathering.set()
+        time.sleep(0.2) # The second request arrives while the first has no future yet
+        return 'summary'
+    
+    downloads = {}
+    def download(name):
+        # Same steps as api.download_report
+        job = manager.submit('en', (1, 2), slow_gather)
+        manager.wait(job, 5)
+        downloads[name] = (job['status'], manager.result(job))
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = threading.Thread(target=download, args=('first',))
+        first.start()
+        gathering.wait(5)
+        second = threading.Thread(target=download, args=('second',))
+        second.start()
+        first.join()
+        second.join()
+    report_jobs.render_report_pdf = saved_render
+    manager.shutdown()
+    
+    print(f"Output: {downloads}, gathered {len(gathers)}x")
+    if downloads.get('first') == downloads.get('second') == ('done', b'PDF en summary') and len(gathers) == 1:
+        print("RESULT: PASS - The second request waited for the shared render instead of timing out.")
+    else:
+        print("RESULT: FAIL - A concurrent download came back without the PDF.")
+
+    print("\n[TEST 25] Single and Batch Order Intake Reject a Non-Positive qty Alike")
+    from fastapi import HTTPException
+    
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        saved_path = connection_manager.DB_PATH
+        connection_manager.configure(path=os.path.join(tmp, "order_qty_test.db"))
+        migrate()
+        with transaction() as conn:
+            conn.execute("INSERT INTO products (sku, name, current_stock, unit_cost) VALUES ('SKU-A', 'Item A', 5, 1.0)")
+        api.product_catalog.reload()
+        saved_queue = api.shipping_queue
+        api.shipping_queue = ShippingQueue(verbose=False)
+        
+        statuses = []
+        for qty in (0, -3):
+            try:
+                api.create_order(api.OrderCreate(customer='Test', customer_tier=1, sku='SKU-A', qty_requested=qty))
+                statuses.append((200, None))
+            except HTTPException as e:
+                statuses.append((e.status_code, e.detail))
+        batch = api.create_orders_batch(api.OrderBatch(orders=[
+            api.OrderCreate(customer='Test', customer_tier=1, sku='SKU-A', qty_requested=0)]))
+        stored = get_connection().execute("SELECT COUNT(*) FROM customer_orders").fetchone()[0]
+        queued = len(api.shipping_queue)
+        
+        api.shipping_queue = saved_queue
+        connection_manager.configure(path=saved_path)
+        api.product_catalog.reload()
+    
+    batch_error = batch['results'][0]['error']
+    print(f"Output: single={statuses}, batch={batch_error!r}, stored={stored}, queued={queued}")
+    if all(status == (400, batch_error) for status in statuses) and stored == 0 and queued == 0:
+        print("RESULT: PASS - A bad qty gets a 400 with the batch endpoint's message and is never stored or queued.")
+    else:
+        print("RESULT: FAIL - Single-order intake accepted or mis-reported a non-positive qty.")
+
 if __name__ == "__main__":
     run_tests()